@@ -4,10 +4,16 @@ import math
 from . import constants
 
 from .decorators import lazyproperty
+from .store import AtomStore
 
 class MagresAtom(object):
-  __slots__ = ["magres_atom",
-               "reference",
+  """
+    An atom, a view of one row of a :py:class:`magres.store.AtomStore`. An atom made from a single parsed record
+    has a store of its own until it joins a MagresAtoms.
+  """
+
+  __slots__ = ["_store",
+               "_row",
                "efg",
                "efg_nonlocal",
                "efg_local",
@@ -17,12 +23,16 @@ class MagresAtom(object):
                "isc_orbital_p",
                "isc_orbital_d",
                "ms",
-               "bonded",
-               "_isotope",]
+               "_bonded",
+               "_isotope",
+               "_owner",]
+
+  def __init__(self, magres_atom=None, store=None, row=0):
+    if store is None:
+      store = AtomStore([magres_atom])
 
-  def __init__(self, magres_atom):
-    self.magres_atom = magres_atom
-    self.reference = 0.0
+    self._store = store
+    self._row = row
 
   def __str__(self):
     if self.species != self.label:
@@ -43,41 +53,94 @@ class MagresAtom(object):
     dr = self.position - r
     return math.sqrt(numpy.dot(dr, dr))
 
+  @property
+  def magres_atom(self):
+    """
+      The parsed record of this atom. Change the atom through its properties, which keep the record in step.
+    """
+    return self._store.records[self._row]
+
+  @property
+  def store(self):
+    """
+      The :py:class:`magres.store.AtomStore` this atom is a row of.
+    """
+    return self._store
+
+  @property
+  def row(self):
+    """
+      This atom's row in its store.
+    """
+    return self._row
+
   @property
   def label(self):
     """
       This atom's label.
     """
-    return self.magres_atom['label']
+    return self._store.labels[self._store.label_codes[self._row]]
   
   @label.setter
   def label(self, value):
-    self.magres_atom['label'] = value
+    self._store.set_label(self._row, value)
 
   @property
   def species(self):
     """
       This atom's species.
     """
-    return self.magres_atom['species']
+    return self._store.species[self._store.species_codes[self._row]]
  
   @species.setter
   def species(self, value):
-    self.magres_atom['species'] = value
+    self._store.set_species(self._row, value)
 
   @property
   def index(self):
     """
       This atom's label index.
     """
-    return self.magres_atom['index']
+    return int(self._store.indices[self._row])
   
   @property
   def position(self):
     """
-      This atom's position in cartesian coordinates. Units are Angstroms.
+      This atom's position in cartesian coordinates, a read only view of its row of the store. Units are Angstroms.
+    """
+    return self._store.positions[self._row]
+
+  @position.setter
+  def position(self, value):
+    self._store.set_position(self._row, value)
+
+  @property
+  def reference(self):
+    """
+      The reference used for this atom's chemical shift.
     """
-    return numpy.array(self.magres_atom['position'])
+    return float(self._store.references[self._row])
+
+  @reference.setter
+  def reference(self, value):
+    self._store.references[self._row] = value
+
+  @property
+  def bonded(self):
+    """
+      The atoms bonded to this one. Unless they've been set, e.g. by MagresAtoms.calculate_bonds, they're found
+      from covalent radii by the MagresAtoms this atom belongs to, see MagresAtoms.bonds.
+    """
+    if hasattr(self, '_bonded'):
+      return self._bonded
+    elif hasattr(self, '_owner'):
+      return self._owner.bonded_to(self)
+    else:
+      raise AttributeError("bonded")
+
+  @bonded.setter
+  def bonded(self, value):
+    self._bonded = value
 
   @property
   def isotope(self):
@@ -96,6 +159,7 @@ class MagresAtom(object):
   def isotope(self, value):
     if (self.species, value) in constants.gamma:
       self._isotope = value
+      self._store.nmr_generation += 1
     else:
       raise ValueError("Unknown NMR isotope %d%s" % (value, self.species))
 
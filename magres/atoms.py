@@ -22,12 +22,17 @@ from numpy import (
     arctan2
 )
 from numpy.linalg import norm
-from .format import MagresFile
+from .format import MagresFile, open_magres
 from .efg import MagresAtomEfg
 from .isc import MagresAtomIsc
 from .ms import MagresAtomMs
 from .atom import MagresAtom, MagresAtomImage
+from .store import AtomStore
 from .view import ListPropertyView
+from .neighbours import NeighbourSearch, covalent_bonds
+from .lattice import ReducedLattice
+from .tables import stack_tensors, lookup, MsTable, EfgTable, IscMatrix
+from .decorators import clear_cache
 
 element_colours = {
     'H': ("#EEEEEE", "#000000"),
@@ -71,7 +76,8 @@ class MagresAtomsView(object):
       A container for a collection of atoms with an optional lattice.
     """
 
-    __slots__ = ["atoms", "lattice", "label_index", "species_index"]
+    __slots__ = ["atoms", "lattice", "label_index", "species_index", "_neighbours", "_reduced", "_positions",
+                 "_fractional", "_rows", "_generation", "_cache"]
 
     def __init__(self, atoms=None, lattice=None):
         if atoms is not None:
@@ -87,6 +93,8 @@ class MagresAtomsView(object):
         self.label_index = {}
         self.species_index = {}
 
+        self._reduced = None
+
         self._build_index()
 
     def __repr__(self):
@@ -109,6 +117,11 @@ class MagresAtomsView(object):
         self.label_index.clear()
         self.species_index.clear()
 
+        self._rows = None
+        self._generation = None
+        self._forget_positions()
+        clear_cache(self)
+
         for atom in self.atoms:
             if atom.label in self.label_index:
                 self.label_index[atom.label].append(atom)
@@ -120,6 +133,39 @@ class MagresAtomsView(object):
             else:
                 self.species_index[atom.species] = [atom]
 
+    def _forget_positions(self):
+        self._neighbours = None
+        self._positions = None
+        self._fractional = None
+
+    def _store_rows(self):
+        """
+          (store, rows) if every atom of this view is a row of the same :py:class:`magres.store.AtomStore`, and not
+          an image, else (None, None).
+        """
+
+        if self._rows is None:
+            stores = set(id(atom._store) if type(atom) == MagresAtom else None for atom in self.atoms)
+
+            if len(stores) == 1 and None not in stores:
+                self._rows = (self.atoms[0]._store, numpy.array([atom._row for atom in self.atoms], dtype=int))
+            else:
+                self._rows = (None, None)
+
+        return self._rows
+
+    def _check_moved(self):
+        """
+          Forget the positions and everything found from them if atoms of this view have moved since.
+        """
+
+        store, rows = self._store_rows()
+        generation = store.generation if store is not None else None
+
+        if generation != self._generation:
+            self._generation = generation
+            self._forget_positions()
+
     def filter(self, fn):
         """
           Filter atoms by some function fn.
@@ -159,8 +205,75 @@ class MagresAtomsView(object):
         return MagresAtomsView(rtn_atoms, self.lattice)
 
     def set_reference(self, reference):
-        for atom in self.atoms:
-            atom.reference = float(reference)
+        store, rows = self._store_rows()
+
+        if store is not None:
+            store.references[rows] = float(reference)
+        else:
+            for atom in self.atoms:
+                atom.reference = float(reference)
+
+    @property
+    def neighbours(self):
+        """
+          The :py:class:`magres.neighbours.NeighbourSearch` over the atoms of this view that aren't images, with the
+          index in self.atoms of each of them. Built when first needed.
+        """
+
+        self._check_moved()
+
+        if self._neighbours is None:
+            rows = numpy.array([i for i, atom in enumerate(self.atoms) if type(atom) == MagresAtom], dtype=int)
+            search = NeighbourSearch(self.positions()[rows], self.lattice, self.reduced_lattice)
+
+            self._neighbours = (search, rows)
+
+        return self._neighbours
+
+    def _query(self, centres, r):
+        """
+          Find the atoms and periodic images within r of each of an (M, 3) array of centres. Images already in the
+          view are only included as they are.
+
+          Returns (centre, row, position, distance) arrays sorted by centre, row and distance, where row is the
+          index of the atom in self.atoms.
+        """
+
+        centres = numpy.array(centres, dtype=float).reshape(-1, 3)
+        search, rows = self.neighbours
+
+        centre, atom, shift, distance = search.query(centres, r)
+
+        row = rows[atom]
+        positions = search.positions[atom]
+
+        if search.periodic:
+            positions = positions + numpy.dot(shift, search.lattice)
+
+        image_rows = numpy.array([i for i, atom in enumerate(self.atoms) if type(atom) == MagresAtomImage], dtype=int)
+
+        if len(image_rows):
+            image_positions = numpy.array([self.atoms[i].position for i in image_rows], dtype=float)
+            image_distance = norm(centres[:, None, :] - image_positions[None, :, :], axis=2)
+            image_centre, image = numpy.nonzero(image_distance <= r)
+
+            centre = numpy.concatenate([centre, image_centre])
+            row = numpy.concatenate([row, image_rows[image]])
+            positions = numpy.concatenate([positions, image_positions[image]])
+            distance = numpy.concatenate([distance, image_distance[image_centre, image]])
+
+            sort = numpy.lexsort((distance, row, centre))
+            centre, row, positions, distance = centre[sort], row[sort], positions[sort], distance[sort]
+
+        return centre, row, positions, distance
+
+    def _image(self, row, position):
+        atom = self.atoms[row]
+
+        if type(atom) == MagresAtomImage:
+            return atom
+        else:
+            return MagresAtomImage(atom, position)
 
     def within(self, pos, max_dr):
         """
@@ -172,40 +285,211 @@ class MagresAtomsView(object):
         if type(pos) is MagresAtom or type(pos) is MagresAtomImage:
             pos = pos.position
 
-        atoms = []
-
-        for atom in self.atoms:
-            if type(atom) == MagresAtom:
-                images = self._all_images_within(atom.position, pos, max_dr)
+        centre, row, positions, distance = self._query([pos], max_dr)
 
-                for image_dist, image_pos in images:
-                    if image_dist <= max_dr:
-                        atoms.append(MagresAtomImage(atom, image_pos))
-            elif type(atom) == MagresAtomImage:
-                if atom.dist(pos) <= max_dr:
-                    atoms.append(atom)
+        atoms = [self._image(i, position) for i, position in zip(row.tolist(), positions)]
 
         return MagresAtomsView(atoms, self.lattice)
 
+    # Maximum number of pairs whose image displacements are held in memory at once by distances and distance_matrix
+    max_tile_pairs = 1 << 15
+
+    @property
+    def reduced_lattice(self):
+        """
+          The :py:class:`magres.lattice.ReducedLattice` of the lattice, with its reduced basis, inverse and reciprocal
+          lattice, or None if there's no lattice. Computed once for each lattice.
+        """
+
+        if self.lattice is None:
+            return None
+
+        if self._reduced is None or self._reduced[0] is not self.lattice:
+            self._reduced = (self.lattice, ReducedLattice(self.lattice))
+
+        return self._reduced[1]
+
+    def minimum_image(self, dr):
+        """
+          The shortest periodic images of an (..., 3) array of displacements.
+        """
+
+        if self.lattice is None:
+            return numpy.asarray(dr, dtype=float)
+        else:
+            return self.reduced_lattice.minimum_image(dr)
+
     def least_mirror(self, a, b):
         """
           Give the closest periodic image of a to b given the current lattice.
         """
-        min = None
-        min_p = None
 
-        for i in range(-1, 2):
-            for j in range(-1, 2):
-                for k in range(-1, 2):
-                    ap = numpy.add(a, numpy.dot(self.lattice.T, (float(i), float(j), float(k))))
-                    r = numpy.subtract(ap, b)
-                    d = numpy.dot(r, r)
+        if self.lattice is None:
+            ap = numpy.asarray(a, dtype=float)
+        else:
+            dr = numpy.subtract(a, b)
+            shift = self.reduced_lattice.shifts(dr, self.minimum_image(dr))
+            ap = numpy.add(a, numpy.dot(shift, self.reduced_lattice.lattice))
+
+        r = numpy.subtract(ap, b)
+
+        return (math.sqrt(numpy.dot(r, r)), ap)
+
+    def rows(self, atoms):
+        """
+          The indices in this view of a list of atoms, or of the atoms of images.
+        """
+
+        index = dict((id(atom), i) for i, atom in enumerate(self.atoms))
+
+        return numpy.array([index[id(atom)] if id(atom) in index else index[id(atom.atom)] for atom in atoms],
+                           dtype=int)
+
+    def positions(self):
+        """
+          The positions of the atoms as a read only (N, 3) array, taken from the store of the atoms, see
+          :py:class:`magres.store.AtomStore`, and made again only when they move.
+        """
+
+        self._check_moved()
+
+        if self._positions is None:
+            store, rows = self._store_rows()
+
+            if store is not None and len(rows) == len(store) and (rows == numpy.arange(len(rows))).all():
+                self._positions = store.positions
+            elif store is not None:
+                self._positions = store.positions[rows]
+            else:
+                self._positions = numpy.array([atom.position for atom in self.atoms], dtype=float).reshape(-1, 3)
+
+            self._positions.flags.writeable = False
+
+        return self._positions
+
+    def fractional_positions(self):
+        """
+          The positions of the atoms in fractional coordinates of the lattice as a read only (N, 3) array, made once,
+          or None if there's no lattice.
+        """
+
+        if self.lattice is None:
+            return None
+
+        self._check_moved()
+
+        if self._fractional is None:
+            self._fractional = self.reduced_lattice.fractional(self.positions())
+            self._fractional.flags.writeable = False
+
+        return self._fractional
+
+    def distances(self, pairs, vectors=False):
+        """
+          The minimum image distances between pairs of atoms, an (M, 2) array of indices into this view. With
+          vectors=True, also returns the (M, 3) displacements from the first atom of each pair to the closest image
+          of the second.
+
+          >>> atoms.distances([[0, 1], [0, 2]])
+        """
+
+        pairs = numpy.asarray(pairs, dtype=int).reshape(-1, 2)
+
+        dr = self._displacements(pairs[:, 0], pairs[:, 1])
+        dist = numpy.sqrt((dr ** 2).sum(axis=1))
+
+        if vectors:
+            return dist, dr
+        else:
+            return dist
+
+    def _displacements(self, i, j):
+        """
+          The minimum image displacements from atoms i to atoms j, arrays of indices into this view, max_tile_pairs at
+          a time.
+        """
+
+        positions = self.positions()
+
+        dr = numpy.empty((len(i), 3))
+
+        for start in range(0, len(i), self.max_tile_pairs):
+            end = start + self.max_tile_pairs
+            dr[start:end] = self.minimum_image(positions[j[start:end]] - positions[i[start:end]])
+
+        return dr
+
+    def angles(self, triples, degrees=False):
+        """
+          The angles at the middle atom of each of an (M, 3) array of indices into this view, using the minimum image
+          displacements from the middle atom to the other two, as :py:meth:`angle`.
+
+          >>> atoms.angles([[0, 6, 1], [0, 6, 2]], degrees=True)
+        """
+
+        triples = numpy.asarray(triples, dtype=int).reshape(-1, 3)
 
-                    if min is None or d < min:
-                        min = d
-                        min_p = ap
+        dr1 = self._displacements(triples[:, 1], triples[:, 0])
+        dr2 = self._displacements(triples[:, 1], triples[:, 2])
 
-        return (math.sqrt(min), min_p)
+        cos = (dr1 * dr2).sum(axis=1) / numpy.sqrt((dr1 ** 2).sum(axis=1) * (dr2 ** 2).sum(axis=1))
+        angles = numpy.arccos(numpy.clip(cos, -1.0, 1.0))
+
+        if degrees:
+            return rad2deg(angles)
+        else:
+            return angles
+
+    def dihedrals(self, quads, degrees=False):
+        """
+          The dihedral angles of each of an (M, 4) array of indices into this view, using the minimum image
+          displacements along the chain of atoms, as :py:meth:`dihedral`.
+
+          >>> atoms.dihedrals([[0, 6, 7, 3], [1, 6, 7, 4]], degrees=True)
+        """
+
+        quads = numpy.asarray(quads, dtype=int).reshape(-1, 4)
+
+        dr12 = self._displacements(quads[:, 0], quads[:, 1])
+        dr23 = self._displacements(quads[:, 1], quads[:, 2])
+        dr34 = self._displacements(quads[:, 2], quads[:, 3])
+
+        dr23 = dr23 / numpy.sqrt((dr23 ** 2).sum(axis=1))[:, None]
+
+        norm1 = cross(dr12, dr23)
+        norm2 = cross(dr23, dr34)
+
+        # m, norm1 and dr23 form an orthogonal frame, |m| = |norm1|
+        m = cross(dr23, norm1)
+
+        dihedrals = arctan2((m * norm2).sum(axis=1), (norm1 * norm2).sum(axis=1))
+
+        if degrees:
+            return rad2deg(dihedrals)
+        else:
+            return dihedrals
+
+    def distance_matrix(self, vectors=False):
+        """
+          The (N, N) matrix of minimum image distances between every pair of atoms. With vectors=True, also returns
+          the (N, N, 3) displacements from atom i to the closest image of atom j. Computed a block of rows at a time.
+        """
+
+        positions = self.positions()
+        n = len(positions)
+
+        dr = numpy.empty((n, n, 3))
+        rows = max(1, self.max_tile_pairs // max(n, 1))
+
+        for start in range(0, n, rows):
+            dr[start:start + rows] = self.minimum_image(positions[None, :, :] - positions[start:start + rows, None, :])
+
+        dist = numpy.sqrt((dr ** 2).sum(axis=2))
+
+        if vectors:
+            return dist, dr
+        else:
+            return dist
 
     def dist(self, atom1, atom2):
         return self.least_mirror(atom1.position, atom2.position)[0]
@@ -250,46 +534,105 @@ class MagresAtomsView(object):
         else:
             return arctan2(y, x)
 
-    def _all_images_within(self, a, b, r):
+    def references(self):
         """
-          Give all images of a to b within distance r.
+          The chemical shift references of the atoms as an (N,) array.
         """
 
-        images = []
+        store, rows = self._store_rows()
 
-        for i in insideout():
-            any_j = False
+        if store is not None:
+            return store.references[rows]
+        else:
+            return numpy.array([atom.reference for atom in self.atoms], dtype=float)
 
-            for j in insideout():
-                any_k = False
+    def ms_table(self, tag='ms'):
+        """
+          The magnetic shielding parameters of every atom, found at once from the sigma tensors of tag, e.g. "ms",
+          as a :py:class:`magres.tables.MsTable` of arrays in the order of the atoms, NaN for atoms without one.
 
-                for k in insideout():
-                    R = numpy.dot(self.lattice.T, numpy.array([float(i), float(j), float(k)]))
+          >>> table = atoms.ms_table()
+          >>> table.iso, table.span, table.evals_mehring
+        """
 
-                    if numpy.dot(a + R - b, a + R - b) > r * r:
-                        if k < 0:
-                            break
-                        else:
-                            continue
+        sigma = stack_tensors([getattr(atom, tag).magres_ms['sigma'] if hasattr(atom, tag) else None
+                               for atom in self.atoms])
 
-                    any_k = True
-                    any_j = True
+        return MsTable(sigma, self.references())
 
-                    ap = numpy.add(a, R)
-                    dr = numpy.subtract(ap, b)
-                    d = numpy.dot(dr, dr)
+    def efg_table(self, tag='efg'):
+        """
+          The electric field gradient parameters of every atom, found at once from the V tensors of tag, e.g. "efg",
+          "efg_local" or "efg_nonlocal", and the quadrupole moment of each atom's isotope, as a
+          :py:class:`magres.tables.EfgTable` of arrays in the order of the atoms, NaN for atoms without a tensor.
+
+          >>> table = atoms.species('O').efg_table()
+          >>> table.Cq, table.eta, table.P_Q
+        """
 
-                    images.append((math.sqrt(d), ap))
+        V = stack_tensors([getattr(atom, tag).magres_efg['V'] if hasattr(atom, tag) else None for atom in self.atoms])
+        Q = lookup(constants.Q, [(atom.species, atom.isotope) for atom in self.atoms])
 
-                if not any_k and j < 0:
-                    break
+        return EfgTable(V, Q)
 
-            if not any_j and i < 0:
-                break
+    def isc_matrix(self, tag='isc'):
+        """
+          The couplings of tag, e.g. "isc" or "isc_fc", between the atoms of this view, as a
+          :py:class:`magres.tables.IscMatrix` indexed by the order of the atoms, with O(1) lookup of the coupling
+          between two atoms and K_iso, J and J_iso of every coupling. Couplings to atoms outside the view are left out.
+
+          The matrix of each tag is kept while the atoms of the view and their species, isotopes and K tensors stay
+          the same, for views of the atoms of one :py:class:`magres.store.AtomStore`.
 
-        images = sorted(images, key=lambda d_p: d_p[0])
+          >>> matrix = atoms.isc_matrix('isc_fc')
+          >>> matrix.J_iso[matrix.pair(atoms.rows([atoms.C1])[0], atoms.rows([atoms.H1])[0])]
+        """
 
-        return images
+        store, rows = self._store_rows()
+
+        if store is None:
+            return self._isc_matrix(tag)
+
+        if self._cache is None:
+            self._cache = {}
+
+        key = ('isc_matrix', tag)
+        generation, matrix = self._cache.get(key, (None, None))
+
+        if generation != store.nmr_generation:
+            matrix = self._isc_matrix(tag)
+            self._cache[key] = (store.nmr_generation, matrix)
+
+        return matrix
+
+    def _isc_matrix(self, tag):
+        rows = dict((id(atom), i) for i, atom in enumerate(self.atoms))
+        atom1, atom2, K = [], [], []
+
+        for i, atom in enumerate(self.atoms):
+            for isc in getattr(atom, tag, []):
+                j = rows.get(id(isc.atom2))
+
+                if j is not None:
+                    atom1.append(i)
+                    atom2.append(j)
+                    K.append(isc.magres_isc['K'])
+
+        gamma = lookup(constants.gamma, [(atom.species, atom.isotope) for atom in self.atoms], numpy.nan)
+        atom1, atom2 = numpy.array(atom1, dtype=int), numpy.array(atom2, dtype=int)
+
+        return IscMatrix(len(self.atoms), atom1, atom2, numpy.array(K, dtype=float).reshape(-1, 3, 3), gamma[atom1],
+                         gamma[atom2])
+
+    def _all_images_within(self, a, b, r):
+        """
+          Give all images of a to b within distance r.
+        """
+
+        search = NeighbourSearch([a], self.lattice, self.reduced_lattice)
+        centre, atom, shift, distance = search.query([b], r)
+
+        return [(d, numpy.add(a, numpy.dot(s, self.lattice))) for d, s in zip(distance.tolist(), shift)]
 
     re_species_index = re.compile('([A-Za-z]+)([0-9]+)')
 
@@ -462,7 +805,7 @@ class MagresAtoms(MagresAtomsView):
         if atoms is not None:
             # We've been passed a list of MagresAtom or MagresAtomImage, just drop it in.
             if type(atoms) == list and all([type(atom) in [MagresAtom, MagresAtomImage] for atom in atoms]):
-                pass
+                self._bind(atoms)
             # We've been passed a MagresFile, build all the atoms off it
             elif type(atoms) == MagresFile:
                 atoms, lattice = self._from_magres(atoms)
@@ -471,62 +814,149 @@ class MagresAtoms(MagresAtomsView):
                 atoms, lattice = self._from_magres(MagresFile.merge(atoms))
         else:
             atoms = []
+            self.store = AtomStore()
 
         super(MagresAtoms, self).__init__(atoms, lattice)
 
-        if len(self) < 20:
-            self.calculate_bonds()
+        # Bonds are found when an atom's bonded atoms are first asked for, see bonds. Atoms that already belong to
+        # another collection keep finding their bonds there
+        for atom in self.atoms:
+            if type(atom) == MagresAtom and not hasattr(atom, '_owner'):
+                atom._owner = self
 
     def __repr__(self):
         return "<magres.atom.MagresAtoms - {} atoms>".format(len(self))
 
+    def _bind(self, atoms):
+        """
+          Gather the atoms of a list that aren't yet in a collection, each with a store of its own, into one store.
+          Atoms of another collection stay rows of its store, so that both collections see the same atoms. store is
+          the one store of all the atoms, or None if they're spread over several.
+        """
+
+        loose = [atom for atom in atoms if type(atom) == MagresAtom and not atom._store.owned]
+
+        if loose:
+            store = AtomStore([atom.magres_atom for atom in loose])
+            store.references[:] = [atom.reference for atom in loose]
+            store.owned = True
+
+            for i, atom in enumerate(loose):
+                atom._store = store
+                atom._row = i
+
+        stores = dict((id(atom._store), atom._store) for atom in atoms if type(atom) == MagresAtom)
+
+        if not stores:
+            self.store = AtomStore()
+        elif len(stores) == 1:
+            self.store = list(stores.values())[0]
+        else:
+            self.store = None
+
+    def _forget_positions(self):
+        super(MagresAtoms, self)._forget_positions()
+
+        self._bonds = None
+
+    @property
+    def bonds(self):
+        """
+          The covalent bonds between the atoms as a :py:class:`magres.neighbours.Adjacency` of their indices in
+          self.atoms. Atoms are bonded if they're closer than the sum of their covalent radii plus
+          constants.bond_tolerance. Found for every atom at once when first needed.
+        """
+
+        self._check_moved()
+
+        if self._bonds is None:
+            search, rows = self.neighbours
+            species = [self.atoms[i].species for i in rows]
+
+            adjacency = covalent_bonds(search, species, constants.covalent_radii, constants.bond_tolerance)
+
+            # Index by the rows of self.atoms rather than those of the neighbour search, which are in the same order
+            counts = numpy.zeros(len(self.atoms), dtype=int)
+            counts[rows] = adjacency.degrees()
+
+            adjacency.indptr = numpy.concatenate([[0], numpy.cumsum(counts)])
+            adjacency.atoms = rows[adjacency.atoms]
+
+            self._bonds = (adjacency, dict((id(atom), i) for i, atom in enumerate(self.atoms)))
+
+        return self._bonds[0]
+
+    def bonded_to(self, atom):
+        """
+          The atoms and images bonded to an atom of this collection, from :py:attr:`bonds`.
+        """
+
+        bonds = self.bonds
+        row = self._bonds[1][id(atom)]
+
+        neighbours, shifts = bonds[row]
+        positions = self.positions()[neighbours]
+
+        if self.lattice is not None:
+            positions = positions + numpy.dot(shifts, self.lattice)
+
+        return MagresAtomsView([MagresAtomImage(self.atoms[j], position)
+                                for j, position in zip(neighbours.tolist(), positions)], self.lattice)
+
     def _from_magres(self, magres_file):
         """
           Take a MagresFile and create the MagresAtoms structure.
         """
 
         self.magres_file = magres_file
-        atoms = []
+        self.store = AtomStore()
 
         if 'atoms' in magres_file.data_dict and 'lattice' in magres_file.data_dict['atoms'] and len(
                 magres_file.data_dict['atoms']['lattice']) == 1:
             lattice = numpy.array(magres_file.data_dict['atoms']['lattice'][0])
 
         if 'atoms' in magres_file.data_dict and 'atom' in magres_file.data_dict['atoms']:
-            temp_label_index = {}
-            for magres_atom in magres_file.data_dict['atoms']['atom']:
-                atom = MagresAtom(magres_atom)
-
-                temp_label_index[(atom.label, atom.index)] = atom
+            self.store = AtomStore(magres_file.data_dict['atoms']['atom'])
 
-                atoms.append(atom)
+        self.store.owned = True
+        atoms = [MagresAtom(store=self.store, row=i) for i in range(len(self.store))]
 
         if 'magres' in magres_file.data_dict:
-            for tag in magres_file.data_dict['magres']:
+            tags = [tag for tag in magres_file.data_dict['magres']
+                    if getattr(magres_file, 'tags', None) is None or tag in magres_file.tags]
+
+            # Records are joined to their atoms by row, see MagresFile.atom_ids
+            rows = magres_file.atom_rows() if magres_file.backend == "dict" else None
+
+            for tag in tags:
                 if not (tag.startswith("ms_") or tag == "ms"):
                     continue
 
                 ms_type = tag
 
-                for magres_ms in magres_file.data_dict['magres'][ms_type]:
-                    atom = temp_label_index[(magres_ms['atom']['label'], magres_ms['atom']['index'])]
+                ids = magres_file.atom_ids(ms_type, rows).tolist()
+
+                for magres_ms, (i,) in zip(magres_file.data_dict['magres'][ms_type], ids):
+                    atom = atoms[i]
                     magres_atom_ms = MagresAtomMs(atom, magres_ms)
                     # getattr(self, ms_type).append(magres_atom_ms)
                     setattr(atom, ms_type, magres_atom_ms)
 
-            for tag in magres_file.data_dict['magres']:
+            for tag in tags:
                 if not (tag.startswith("efg_") or tag == "efg"):
                     continue
 
                 efg_type = tag
 
-                for magres_efg in magres_file.data_dict['magres'][efg_type]:
-                    atom = temp_label_index[(magres_efg['atom']['label'], magres_efg['atom']['index'])]
+                ids = magres_file.atom_ids(efg_type, rows).tolist()
+
+                for magres_efg, (i,) in zip(magres_file.data_dict['magres'][efg_type], ids):
+                    atom = atoms[i]
                     magres_atom_efg = MagresAtomEfg(atom, magres_efg)
                     # getattr(self, efg_type).append(magres_atom_efg)
                     setattr(atom, efg_type, magres_atom_efg)
 
-            for tag in magres_file.data_dict['magres']:
+            for tag in tags:
                 if not (tag.startswith("isc_") or tag == "isc"):
                     continue
 
@@ -534,14 +964,16 @@ class MagresAtoms(MagresAtomsView):
 
                 # setattr(self, isc_type, IscListPropertyView([]))
 
-                for magres_isc in magres_file.data_dict['magres'][isc_type]:
-                    atom1 = temp_label_index[(magres_isc['atom1']['label'], magres_isc['atom1']['index'])]
-                    atom2 = temp_label_index[(magres_isc['atom2']['label'], magres_isc['atom2']['index'])]
+                ids = magres_file.atom_ids(isc_type, rows).tolist()
 
+                for magres_isc, (i, j) in zip(magres_file.data_dict['magres'][isc_type], ids):
                     # Don't bother with self couplings
-                    if atom1 == atom2:
+                    if i == j:
                         continue
 
+                    atom1 = atoms[i]
+                    atom2 = atoms[j]
+
                     magres_atom_isc = MagresAtomIsc(atom1, atom2, magres_isc)
 
                     # getattr(self, isc_type).append(magres_atom_isc)
@@ -578,17 +1010,28 @@ class MagresAtoms(MagresAtomsView):
             atom1.bonded = MagresAtomsView(list(bonded_atoms), self.lattice)
 
     def calculate_bonds(self, tol=2.0):
-        for atom1 in self.atoms:
-            bonded_atoms = []
+        """
+          Set the bonded atoms of every atom to the atoms and images within tol Angstroms of it, found in one query
+          of the neighbour search.
+        """
 
-            for atom2 in self.within(atom1, tol):
-                if (atom1.position != atom2.position).any():
-                    bonded_atoms.append(atom2)
+        positions = self.positions()
 
-            atom1.bonded = MagresAtomsView(list(bonded_atoms), self.lattice)
+        centre, row, image_positions, distance = self._query(positions, tol)
+
+        # Leave out each atom itself
+        other = (image_positions != positions[centre]).any(axis=1)
+
+        bonded_atoms = [[] for atom in self.atoms]
+
+        for c, i, position in zip(centre[other].tolist(), row[other].tolist(), image_positions[other]):
+            bonded_atoms[c].append(self._image(i, position))
+
+        for atom1, bonded in zip(self.atoms, bonded_atoms):
+            atom1.bonded = MagresAtomsView(bonded, self.lattice)
 
     @classmethod
-    def load_magres(self, f):
+    def load_magres(self, f, cache=False):
         """
           A class method to easily load a :py:class:`magres.format.MagresFile` and return the corresponding MagresAtoms.
 
@@ -597,10 +1040,17 @@ class MagresAtoms(MagresAtomsView):
           or
 
           >>> MagresAtoms.load_magres(open("path/to/magres/file.magres"))
+
+          Paths to gzip, bzip2 or xz compressed files are decompressed as they're parsed. With cache=True a path is
+          loaded through its binary sidecar, see :py:meth:`magres.format.MagresFile.load_cached`.
         """
 
-        if type(f) == str:
-            magres_file = MagresFile(open(f))
+        if type(f) == str and cache:
+            magres_file = MagresFile.load_cached(f)
+        elif type(f) == str:
+            with open_magres(f) as fp:
+                magres_file = MagresFile(fp)
+
             magres_file.path = f
         elif type(f) == MagresFile:
             magres_file = f
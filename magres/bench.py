@@ -0,0 +1,296 @@
+"""
+  magres.bench times the parser and the atoms model on the sample files and on synthetic systems of increasing size,
+  reporting operations per second and peak memory as JSON.
+
+    python -m magres.bench
+    python -m magres.bench --sizes 100 1000 10000 100000 --isc-sites 4 --no-samples -o bench.json
+"""
+from __future__ import print_function
+import os
+import sys
+import json
+import math
+import time
+import random
+import argparse
+import platform
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+import numpy
+from .format import MagresFile, sniff
+from .schema.schema import schema
+from .schema.validate import validate as schema_validate
+from .atoms import MagresAtoms
+from .neighbours import NeighbourSearch, covalent_bonds
+from . import constants
+
+samples_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), "samples")
+
+# Species of synthetic atoms, cycled through in order
+synthetic_species = ['C', 'H', 'H', 'N', 'O', 'H']
+
+synthetic_isc_tags = ['isc_fc', 'isc_orbital_p', 'isc_orbital_d', 'isc_spin', 'isc']
+
+
+def iter_synthetic_lines(num_atoms, isc_sites=4, spacing=1.5, seed=0):
+    """
+      Generate the lines of a valid magres file of num_atoms atoms on a jittered cubic grid, with ms and efg tensors
+      for every atom and all the isc tensors coupling each of the first isc_sites atoms to every atom.
+    """
+
+    rand = random.Random(seed)
+
+    side = int(math.ceil(num_atoms ** (1.0 / 3.0)))
+    a = side * spacing
+
+    def tensor():
+        return " ".join("%.6f" % rand.uniform(-100.0, 100.0) for i in range(9))
+
+    atoms = []
+    counts = {}
+
+    for n in range(num_atoms):
+        species = synthetic_species[n % len(synthetic_species)]
+        counts[species] = counts.get(species, 0) + 1
+
+        i, j, k = n % side, (n // side) % side, n // (side * side)
+        position = [(x + 0.5) * spacing + rand.uniform(-0.1, 0.1) for x in (i, j, k)]
+
+        atoms.append((species, counts[species], position))
+
+    yield "#$magres-abinitio-v1.0"
+    yield "[calculation]"
+    yield "calc_code synthetic"
+    yield "calc_name synthetic-%d" % num_atoms
+    yield "[/calculation]"
+    yield "[atoms]"
+    yield "  units lattice Angstrom"
+    yield "  units atom Angstrom"
+    yield "  lattice %f 0.0 0.0 0.0 %f 0.0 0.0 0.0 %f" % (a, a, a)
+
+    for species, index, position in atoms:
+        yield "  atom %s %s %d %f %f %f" % ((species, species, index) + tuple(position))
+
+    yield "[/atoms]"
+    yield "[magres]"
+    yield "  units ms ppm"
+    yield "  units efg au"
+
+    for tag in synthetic_isc_tags:
+        yield "  units %s 10^19.T^2.J^-1" % tag
+
+    for species, index, position in atoms:
+        yield "  ms %s %d %s" % (species, index, tensor())
+
+    for species, index, position in atoms:
+        yield "  efg %s %d %s" % (species, index, tensor())
+
+    for tag in synthetic_isc_tags:
+        for species1, index1, position1 in atoms[:isc_sites]:
+            for species2, index2, position2 in atoms:
+                yield "  %s %s %d %s %d %s" % (tag, species1, index1, species2, index2, tensor())
+
+    yield "[/magres]"
+
+
+def synthetic_magres(num_atoms, isc_sites=4, spacing=1.5, seed=0):
+    """
+      The contents of a synthetic magres file, see :py:func:`iter_synthetic_lines`.
+    """
+
+    return "\n".join(iter_synthetic_lines(num_atoms, isc_sites, spacing, seed)) + "\n"
+
+
+class Case(object):
+    """
+      A magres file to benchmark on. The parsed file and atoms are made when first needed, outside of the timings.
+    """
+
+    def __init__(self, name, text):
+        self.name = name
+        self.text = text
+
+        self._magres_file = None
+        self._atoms = None
+
+    @property
+    def magres_file(self):
+        if self._magres_file is None:
+            self._magres_file = MagresFile(self.text)
+
+        return self._magres_file
+
+    @property
+    def atoms(self):
+        if self._atoms is None:
+            self._atoms = MagresAtoms(self.magres_file)
+
+        return self._atoms
+
+    @property
+    def num_atoms(self):
+        return len(self.magres_file.data_dict.get('atoms', {}).get('atom', []))
+
+
+def _bonds(atoms):
+    search = NeighbourSearch([atom.position for atom in atoms], atoms.lattice)
+    return covalent_bonds(search, [atom.species for atom in atoms], constants.covalent_radii, constants.bond_tolerance)
+
+
+def _ms_properties(atoms):
+    for atom in atoms:
+        if hasattr(atom, 'ms'):
+            atom.ms.iso, atom.ms.aniso, atom.ms.eta, atom.ms.span, atom.ms.skew
+
+
+def _efg_properties(atoms):
+    for atom in atoms:
+        if hasattr(atom, 'efg'):
+            atom.efg.Cq, atom.efg.eta
+
+
+def _isc_properties(atoms):
+    for atom in atoms:
+        for isc in getattr(atom, 'isc', []):
+            isc.J_iso, isc.K_aniso, isc.K_eta
+
+
+def _validate_schema(magres_file):
+    # Validation as it was before the validation modes, the whole data dictionary against the JSON schema
+    if schema_validate is not None:
+        schema_validate(magres_file.data_dict, schema)
+
+
+# Name and function of each benchmark, run on every case
+benchmarks = [
+    ('parse', lambda case: MagresFile(case.text)),
+    ('parse_structural', lambda case: MagresFile(case.text, validation="structural")),
+    ('parse_columnar', lambda case: MagresFile(case.text, backend="columnar")),
+    ('str', lambda case: str(case.magres_file)),
+    ('as_json', lambda case: case.magres_file.as_json()),
+    ('validate', lambda case: case.magres_file.validate()),
+    ('validate_structural', lambda case: case.magres_file.validate("structural")),
+    ('validate_schema', lambda case: _validate_schema(case.magres_file)),
+    ('from_magres', lambda case: MagresAtoms(case.magres_file)),
+    ('calculate_bonds', lambda case: case.atoms.calculate_bonds()),
+    ('bonds', lambda case: _bonds(case.atoms)),
+    ('within', lambda case: case.atoms.within(case.atoms[0], 3.0)),
+    ('ms_properties', lambda case: _ms_properties(case.atoms)),
+    ('ms_table', lambda case: case.atoms.ms_table()),
+    ('efg_properties', lambda case: _efg_properties(case.atoms)),
+    ('efg_table', lambda case: case.atoms.efg_table()),
+    ('isc_properties', lambda case: _isc_properties(case.atoms)),
+    ('isc_matrix', lambda case: case.atoms.isc_matrix().J_iso), ]
+
+
+def measure(fn, min_time=0.5, max_runs=100):
+    """
+      Time fn, running it until min_time has passed or it has run max_runs times, then run it once more tracing its
+      peak memory use.
+    """
+
+    times = []
+    start = time.time()
+
+    while not times or (time.time() - start < min_time and len(times) < max_runs):
+        t0 = time.time()
+        fn()
+        times.append(time.time() - t0)
+
+    result = {
+        'runs': len(times),
+        'mean_s': sum(times) / len(times),
+        'min_s': min(times),
+        'ops_per_s': len(times) / sum(times) if sum(times) > 0 else None, }
+
+    if tracemalloc is not None:
+        tracemalloc.start()
+
+        try:
+            fn()
+            result['peak_memory_bytes'] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    else:
+        result['peak_memory_bytes'] = None
+
+    return result
+
+
+def iter_cases(sizes, isc_sites=4, samples=None):
+    """
+      Generate the cases to benchmark: the synthetic systems, then every file of the samples directory.
+    """
+
+    for size in sizes:
+        yield Case("synthetic-%d" % size, synthetic_magres(size, isc_sites))
+
+    if samples is not None and os.path.isdir(samples):
+        for name in sorted(os.listdir(samples)):
+            path = os.path.join(samples, name)
+
+            if name.endswith(".magres") and os.path.isfile(path) and sniff(path) == ('magres', MagresFile.version):
+                with open(path) as f:
+                    yield Case(name, f.read())
+
+
+def run(sizes=(100, 1000, 10000), isc_sites=4, samples=samples_dir, names=None, min_time=0.5, log=None):
+    """
+      Run the benchmarks, returning a list of results.
+    """
+
+    results = []
+
+    for case in iter_cases(sizes, isc_sites, samples):
+        for name, fn in benchmarks:
+            if names is not None and name not in names:
+                continue
+
+            result = {'case': case.name, 'benchmark': name, 'atoms': case.num_atoms, 'bytes': len(case.text)}
+            result.update(measure(lambda: fn(case), min_time))
+
+            if log is not None:
+                print("%-40s %-16s %12.3f ops/s" % (case.name, name, result['ops_per_s'] or 0.0), file=log)
+
+            results.append(result)
+
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the magres parser and atoms model.')
+    parser.add_argument('--sizes', nargs='*', type=int, default=[100, 1000, 10000],
+                        help='Numbers of atoms of the synthetic systems.')
+    parser.add_argument('--isc-sites', type=int, default=4,
+                        help='Number of perturbing atoms of the isc blocks of the synthetic systems.')
+    parser.add_argument('--samples', default=samples_dir, help='Directory of sample magres files to benchmark.')
+    parser.add_argument('--no-samples', action="store_const", default=False, const=True,
+                        help="Only benchmark the synthetic systems.")
+    parser.add_argument('--bench', nargs='*', default=None, help='Names of the benchmarks to run.')
+    parser.add_argument('--min-time', type=float, default=0.5, help='Minimum time to run each benchmark for.')
+    parser.add_argument('-o', '--output', default=None, help='File to write the JSON report to, otherwise stdout.')
+
+    a = parser.parse_args(argv)
+
+    results = run(a.sizes, a.isc_sites, None if a.no_samples else a.samples, a.bench, a.min_time, log=sys.stderr)
+
+    report = {
+        'python': platform.python_version(),
+        'numpy': numpy.__version__,
+        'platform': platform.platform(),
+        'results': results, }
+
+    if a.output is None:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        with open(a.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+"""
+  magres.cache keeps a binary sidecar of a parsed magres file, path + ".npz", holding the lattice, positions and
+  tensors as NumPy arrays along with label and species tables, so that later loads skip parsing the text.
+
+  >>> magres_file = load_cached("ethanol-jc-all.magres")
+"""
+import os
+import json
+import hashlib
+import numpy
+from .format import MagresFile, LazyDict, magres_tensor_tags
+from .columnar import LabelTable, TensorColumns, columns_dict
+
+suffix = ".npz"
+
+# Version of the sidecar layout, bumped whenever it changes so that old sidecars are rebuilt
+cache_version = 1
+
+
+def cache_path(path):
+    return path + suffix
+
+
+def file_hash(path, chunk_size=1 << 20):
+    """
+      The SHA1 hex digest of a file's contents, read in chunks.
+    """
+
+    h = hashlib.sha1()
+
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+
+    return h.hexdigest()
+
+
+def is_current(path, meta):
+    """
+      Whether the sidecar described by meta is up to date with the magres file at path. The size and mtime are
+      checked first, and the contents hashed only if the size matches but the mtime has changed. If the contents
+      match, meta's mtime is updated to the file's, so that it isn't hashed again once the sidecar is rewritten.
+    """
+
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return False
+
+    if meta.get('version') != cache_version or stat.st_size != meta['size']:
+        return False
+
+    if stat.st_mtime == meta['mtime']:
+        return True
+
+    if file_hash(path) != meta['sha1']:
+        return False
+
+    meta['mtime'] = stat.st_mtime
+
+    return True
+
+
+def save_cache(magres_file, path, sidecar=None):
+    """
+      Write the sidecar of a magres file parsed from path.
+    """
+
+    if sidecar is None:
+        sidecar = cache_path(path)
+
+    stat = os.stat(path)
+
+    labels = LabelTable()
+    species = LabelTable()
+
+    arrays = {}
+    blocks = {}
+
+    for name in magres_file.data_dict:
+        data = magres_file.data_dict[name]
+
+        if name == 'atoms':
+            atoms = data.get('atom', [])
+
+            arrays['atoms_species'] = numpy.array([species.code(atom['species']) for atom in atoms], dtype=numpy.int32)
+            arrays['atoms_labels'] = numpy.array([labels.code(atom['label']) for atom in atoms], dtype=numpy.int32)
+            arrays['atoms_indices'] = numpy.array([atom['index'] for atom in atoms], dtype=numpy.int32)
+            arrays['atoms_positions'] = numpy.array([atom['position'] for atom in atoms],
+                                                    dtype=numpy.float64).reshape(-1, 3)
+            arrays['atoms_lattice'] = numpy.array(data.get('lattice', []), dtype=numpy.float64).reshape(-1, 3, 3)
+
+            blocks[name] = {'tags': list(data),
+                            'other': dict((tag, data[tag]) for tag in data if tag not in ['atom', 'lattice'])}
+        elif name == 'magres':
+            block_columns = magres_file.columns.get('magres', {}) if magres_file.backend == "columnar" else {}
+
+            for tag in data:
+                if tag not in magres_tensor_tags:
+                    continue
+
+                if tag in block_columns:
+                    col = block_columns[tag]
+                else:
+                    tensor_name, atoms = magres_tensor_tags[tag]
+                    fields = _record_fields(data[tag], len(atoms), tensor_name)
+                    col = TensorColumns.from_fields(tag, tensor_name, len(atoms), fields, LabelTable())
+
+                codes = numpy.array([labels.code(label) for label in col.labels.labels], dtype=numpy.int32)
+
+                arrays['magres_%s_labels' % tag] = codes[col.label_codes]
+                arrays['magres_%s_indices' % tag] = col.indices
+                arrays['magres_%s_tensors' % tag] = col.tensors
+
+            blocks[name] = {'tags': list(data),
+                            'other': dict((tag, data[tag]) for tag in data if tag not in magres_tensor_tags)}
+        else:
+            blocks[name] = {'data': data}
+
+    meta = {'version': cache_version,
+            'size': stat.st_size,
+            'mtime': stat.st_mtime,
+            'sha1': file_hash(path),
+            'blocks': [[name, blocks[name]] for name in magres_file.data_dict]}
+
+    arrays['meta'] = numpy.array(json.dumps(meta))
+    arrays['labels'] = numpy.array(labels.labels, dtype=str)
+    arrays['species'] = numpy.array(species.labels, dtype=str)
+
+    write_sidecar(sidecar, arrays)
+
+
+def write_sidecar(sidecar, arrays):
+    # Write to a temporary file first so that a reader never sees a partially written sidecar
+    tmp_path = "%s.%d.tmp" % (sidecar, os.getpid())
+
+    with open(tmp_path, 'wb') as f:
+        numpy.savez(f, **arrays)
+
+    os.rename(tmp_path, sidecar)
+
+
+def _record_fields(records, num_atoms, tensor_name):
+    atoms = ['atom'] if num_atoms == 1 else ['atom1', 'atom2']
+
+    for record in records:
+        fields = []
+
+        for atom in atoms:
+            fields += [record[atom]['label'], record[atom]['index']]
+
+        yield fields + list(numpy.ravel(record[tensor_name]))
+
+
+def read_cache(path, sidecar=None, backend="dict", validation=None):
+    """
+      Load a magres file from its sidecar. Returns None if the sidecar is missing or out of date.
+    """
+
+    if sidecar is None:
+        sidecar = cache_path(path)
+
+    if not os.path.isfile(sidecar):
+        return None
+
+    try:
+        npz = numpy.load(sidecar, allow_pickle=False)
+    except (IOError, OSError, ValueError):
+        return None
+
+    with npz:
+        meta = json.loads(str(npz['meta']))
+        mtime = meta['mtime']
+
+        if not is_current(path, meta):
+            return None
+
+        arrays = dict((key, npz[key]) for key in npz.files)
+
+    if meta['mtime'] != mtime:
+        # The file was touched without being changed, keep its new mtime so that later loads don't hash it again
+        arrays['meta'] = numpy.array(json.dumps(meta))
+
+        try:
+            write_sidecar(sidecar, arrays)
+        except (IOError, OSError):
+            pass
+
+    labels = LabelTable(arrays['labels'].tolist())
+    species = arrays['species'].tolist()
+
+    magres_file = MagresFile(backend=backend, validation=validation)
+    magres_file.data_dict = LazyDict()
+    magres_file.columns = LazyDict()
+
+    if backend == "columnar":
+        magres_file.labels = labels
+
+    for name, block in meta['blocks']:
+        if name == 'atoms':
+            data = {}
+
+            for tag in block['tags']:
+                if tag == 'atom':
+                    data[tag] = [{'species': species[s], 'label': labels[l], 'index': i, 'position': position}
+                                 for s, l, i, position in zip(arrays['atoms_species'].tolist(),
+                                                              arrays['atoms_labels'].tolist(),
+                                                              arrays['atoms_indices'].tolist(),
+                                                              arrays['atoms_positions'].tolist())]
+                elif tag == 'lattice':
+                    data[tag] = arrays['atoms_lattice'].tolist()
+                else:
+                    data[tag] = block['other'][tag]
+
+            magres_file.data_dict[name] = data
+        elif name == 'magres':
+            columns = {}
+
+            for tag in block['tags']:
+                if tag in magres_tensor_tags:
+                    columns[tag] = TensorColumns(tag, magres_tensor_tags[tag][0], labels,
+                                                 arrays['magres_%s_labels' % tag],
+                                                 arrays['magres_%s_indices' % tag],
+                                                 arrays['magres_%s_tensors' % tag])
+                else:
+                    columns[tag] = block['other'][tag]
+
+            if backend == "columnar":
+                magres_file.columns[name] = columns
+
+            # Records of the dict backend have their own atom references, as parsed ones do
+            magres_file.data_dict[name] = columns_dict(columns, share=(backend == "columnar"))
+        else:
+            magres_file.data_dict[name] = block['data']
+
+    magres_file.validate()
+
+    return magres_file
+
+
+def load_cached(path, backend="dict", validation=None, save=True):
+    """
+      Load a magres file through its sidecar, parsing the text and writing the sidecar if it is missing or out of
+      date.
+    """
+
+    magres_file = read_cache(path, backend=backend, validation=validation)
+
+    if magres_file is None:
+        magres_file = MagresFile(path, backend=backend, validation=validation)
+
+        if save:
+            try:
+                save_cache(magres_file, path)
+            except (IOError, OSError):
+                # Not being able to write the sidecar, e.g. in a read only directory, shouldn't stop the load
+                pass
+
+    magres_file.path = path
+
+    return magres_file
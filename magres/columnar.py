@@ -0,0 +1,381 @@
+"""
+  magres.columnar holds the tensor records of a magres block as contiguous NumPy arrays, one set of arrays per tag,
+  instead of one dictionary per record. The dictionary representation used by :py:class:`magres.format.MagresFile`
+  can be generated from the columns on demand.
+"""
+import array
+import numpy
+from collections import deque
+from functools import partial
+from itertools import islice
+from multiprocessing import Pool, cpu_count
+from .format import LazyDict, BadMagresFile, AtomRefs, interned_atom_ref, check_units, block_records, magres_tensor_tags
+
+
+class LabelTable(object):
+    """
+      Interns atom labels, mapping each distinct label to a small integer code.
+    """
+
+    __slots__ = ["labels", "codes"]
+
+    def __init__(self, labels=None):
+        self.labels = []
+        self.codes = {}
+
+        if labels is not None:
+            for label in labels:
+                self.code(label)
+
+    def code(self, label):
+        """
+          Return the code of a label, adding it to the table if it has not been seen before.
+        """
+
+        try:
+            return self.codes[label]
+        except KeyError:
+            code = len(self.labels)
+            self.codes[label] = code
+            self.labels.append(label)
+            return code
+
+    def __getitem__(self, code):
+        return self.labels[code]
+
+    def __len__(self):
+        return len(self.labels)
+
+
+class TensorColumns(object):
+    """
+      All records of one tensor tag, e.g. "ms" or "isc_fc", stored as arrays.
+
+      label_codes and indices are int32 arrays of shape (N, num_atoms), where num_atoms is 1 for single site tensors
+      (ms, efg) and 2 for couplings (isc). tensors is a float64 array of shape (N, 3, 3).
+    """
+
+    __slots__ = ["tag", "tensor_name", "labels", "label_codes", "indices", "tensors"]
+
+    def __init__(self, tag, tensor_name, labels, label_codes, indices, tensors):
+        self.tag = tag
+        self.tensor_name = tensor_name
+        self.labels = labels
+        self.label_codes = label_codes
+        self.indices = indices
+        self.tensors = tensors
+
+    def __len__(self):
+        return len(self.tensors)
+
+    def __repr__(self):
+        return "<magres.columnar.TensorColumns - {} {} records>".format(len(self), self.tag)
+
+    @property
+    def num_atoms(self):
+        """
+          The number of atoms each record refers to.
+        """
+        return self.label_codes.shape[1]
+
+    def atom_dict(self, i, j=0):
+        """
+          The legacy {'label': ..., 'index': ...} dictionary of atom j of record i.
+        """
+        return {'label': self.labels[self.label_codes[i, j]], 'index': int(self.indices[i, j])}
+
+    def record(self, i):
+        """
+          The legacy dictionary representation of record i, as produced by
+          :py:func:`magres.format.parse_magres_block`.
+        """
+
+        if self.num_atoms == 1:
+            rec = {'atom': self.atom_dict(i)}
+        else:
+            rec = {'atom1': self.atom_dict(i, 0), 'atom2': self.atom_dict(i, 1)}
+
+        rec[self.tensor_name] = self.tensors[i].tolist()
+
+        return rec
+
+    def records(self, share=True):
+        """
+          Generate the legacy dictionary representation of every record. Records referring to the same atom share
+          its reference dictionary, which mustn't be changed in place, see :py:class:`magres.format.AtomRefs`, unless
+          share is False, when every record has its own as the dict backend parses them.
+        """
+
+        refs = AtomRefs() if share else interned_atom_ref
+        labels = self.labels.labels
+        names = ['atom'] if self.num_atoms == 1 else ['atom1', 'atom2']
+
+        for codes, indices, tensor in zip(self.label_codes.tolist(), self.indices.tolist(), self.tensors.tolist()):
+            rec = dict((name, refs(labels[code], index)) for name, code, index in zip(names, codes, indices))
+            rec[self.tensor_name] = tensor
+
+            yield rec
+
+    def atom_ids(self, atoms):
+        """
+          The rows of a list of atom records, e.g. data_dict['atoms']['atom'], that each record refers to, as an int
+          array of shape (N, num_atoms). Raises KeyError if a record refers to an atom that isn't in the list.
+        """
+
+        codes = numpy.array([self.labels.codes.get(atom['label'], -1) for atom in atoms], dtype=numpy.int64)
+        indices = numpy.array([atom['index'] for atom in atoms], dtype=numpy.int64)
+
+        size = max([1] + [int(x.max()) + 1 for x in (indices, self.indices) if x.size])
+
+        # Dense (label code, index) -> row lookup table, -1 where there's no atom
+        table = numpy.full((len(self.labels), size), -1, dtype=numpy.int64)
+        known = (codes >= 0) & (indices >= 0)
+        table[codes[known], indices[known]] = numpy.arange(len(atoms))[known]
+
+        ids = numpy.where(self.indices >= 0, table[self.label_codes, self.indices], -1)
+
+        if (ids < 0).any():
+            i, j = numpy.argwhere(ids < 0)[0]
+            raise KeyError((self.labels[self.label_codes[i, j]], int(self.indices[i, j])))
+
+        return ids
+
+    def to_records(self, share=True):
+        return list(self.records(share))
+
+    def compact(self):
+        """
+          The compact JSON encoding of the records, see :py:func:`magres.format.compact_records`.
+        """
+
+        labels = numpy.array(self.labels.labels, dtype=object)
+
+        return {
+            'shape': list(self.tensors.shape),
+            'labels': labels[self.label_codes.ravel()].tolist(),
+            'indices': self.indices.ravel().tolist(),
+            'tensors': self.tensors.ravel().tolist(), }
+
+    @classmethod
+    def from_compact(klass, tag, compact, labels):
+        """
+          Build the columns from the compact JSON encoding of the records of a tensor tag.
+        """
+
+        tensor_name, atoms = magres_tensor_tags[tag]
+        num_atoms = len(atoms)
+
+        return klass(tag, tensor_name, labels,
+                     numpy.array([labels.code(label) for label in compact['labels']],
+                                 dtype=numpy.int32).reshape(-1, num_atoms),
+                     numpy.array(compact['indices'], dtype=numpy.int32).reshape(-1, num_atoms),
+                     numpy.array(compact['tensors'], dtype=numpy.float64).reshape(-1, 3, 3))
+
+    @classmethod
+    def from_fields(klass, tag, tensor_name, num_atoms, fields, labels):
+        """
+          Build the columns from an iterable of record fields, e.g. ["C", "1", "H", "2", K_xx, ..., K_zz] for an
+          isc record.
+        """
+
+        builder = TensorColumnsBuilder(tag, tensor_name, num_atoms, labels)
+
+        for data in fields:
+            builder.append(data)
+
+        return builder.build()
+
+
+class TensorColumnsBuilder(object):
+    """
+      Accumulates the fields of records one at a time into compact arrays, then builds a TensorColumns.
+    """
+
+    __slots__ = ["tag", "tensor_name", "num_atoms", "labels", "label_codes", "indices", "tensors"]
+
+    def __init__(self, tag, tensor_name, num_atoms, labels):
+        self.tag = tag
+        self.tensor_name = tensor_name
+        self.num_atoms = num_atoms
+        self.labels = labels
+
+        self.label_codes = array.array('i')
+        self.indices = array.array('i')
+        self.tensors = array.array('d')
+
+    def append(self, data):
+        num_atoms = self.num_atoms
+
+        width = 2 * num_atoms + 9
+
+        if len(data) != width:
+            raise ValueError("Record \"%s %s\" should have %d fields" % (self.tag, " ".join(data), width))
+
+        for j in range(num_atoms):
+            self.label_codes.append(self.labels.code(data[2 * j]))
+            self.indices.append(int(data[2 * j + 1]))
+
+        self.tensors.extend(map(float, data[2 * num_atoms:]))
+
+    def build(self):
+        return TensorColumns(self.tag, self.tensor_name, self.labels,
+                             numpy.frombuffer(self.label_codes, dtype=numpy.int32).reshape(-1, self.num_atoms),
+                             numpy.frombuffer(self.indices, dtype=numpy.int32).reshape(-1, self.num_atoms),
+                             numpy.frombuffer(self.tensors, dtype=numpy.float64).reshape(-1, 3, 3))
+
+
+def parse_magres_block_columnar(block, labels=None):
+    """
+      Parse magres block into a dictionary of TensorColumns given list of record tuples. Units are kept as a list,
+      as in :py:func:`magres.format.parse_magres_block`.
+    """
+
+    name, records = block
+
+    if labels is None:
+        labels = LabelTable()
+
+    builders = {}
+    units = []
+
+    for tag, data in records:
+        if tag == 'units':
+            units.append(check_units(data))
+        elif tag in magres_tensor_tags:
+            if tag not in builders:
+                tensor_name, atoms = magres_tensor_tags[tag]
+                builders[tag] = TensorColumnsBuilder(tag, tensor_name, len(atoms), labels)
+
+            try:
+                builders[tag].append(data)
+            except ValueError as e:
+                raise BadMagresFile(str(e))
+        else:
+            raise BadMagresFile("Unrecognised tag \"%s\" in %s block" % (tag, name))
+
+    data_dict = {}
+
+    if units:
+        data_dict['units'] = units
+
+    for tag, builder in builders.items():
+        data_dict[tag] = builder.build()
+
+    return data_dict
+
+
+def concat_columns(parts, labels):
+    """
+      Concatenate the TensorColumns of the same tag, in order, into a single TensorColumns using the label table
+      labels. The label codes of each part are remapped from its own table.
+    """
+
+    label_codes = []
+
+    for part in parts:
+        remap = numpy.array([labels.code(label) for label in part.labels.labels], dtype=numpy.int32)
+        label_codes.append(remap[part.label_codes])
+
+    first = parts[0]
+
+    return TensorColumns(first.tag, first.tensor_name, labels,
+                         numpy.concatenate(label_codes),
+                         numpy.concatenate([part.indices for part in parts]),
+                         numpy.concatenate([part.tensors for part in parts]))
+
+
+def _parse_chunk(lines):
+    return parse_magres_block_columnar(('magres', block_records(lines)))
+
+
+# Number of lines of a block parsed by each task of parse_magres_block_parallel
+parallel_chunk_size = 100000
+
+
+def parse_magres_block_parallel(lines, labels=None, processes=None, chunk_size=None):
+    """
+      Parse the lines of a magres block into a dictionary of TensorColumns, splitting them into chunks of chunk_size
+      lines, parallel_chunk_size if it's None, that are parsed in a pool of processes, one per CPU if processes is
+      None, and concatenated in order. Only a few chunks per process are read
+      ahead of the parsing, so the lines can come straight from an open file. Blocks of a single chunk are parsed
+      without starting a pool.
+    """
+
+    if labels is None:
+        labels = LabelTable()
+
+    if chunk_size is None:
+        chunk_size = parallel_chunk_size
+
+    lines = iter(lines)
+    chunk = list(islice(lines, chunk_size))
+
+    if len(chunk) < chunk_size:
+        return parse_magres_block_columnar(('magres', block_records(chunk)), labels)
+
+    units = []
+    parts = {}
+
+    def add(data_dict):
+        for tag, value in data_dict.items():
+            if tag == 'units':
+                units.extend(value)
+            else:
+                parts.setdefault(tag, []).append(value)
+
+    pool = Pool(processes)
+
+    try:
+        pending = deque()
+        max_pending = 2 * (processes or cpu_count())
+
+        while chunk:
+            pending.append(pool.apply_async(_parse_chunk, (chunk,)))
+
+            if len(pending) >= max_pending:
+                add(pending.popleft().get())
+
+            chunk = list(islice(lines, chunk_size))
+
+        while pending:
+            add(pending.popleft().get())
+    finally:
+        pool.terminate()
+        pool.join()
+
+    data_dict = {}
+
+    if units:
+        data_dict['units'] = units
+
+    for tag, tag_parts in parts.items():
+        data_dict[tag] = concat_columns(tag_parts, labels)
+
+    return data_dict
+
+
+def columns_dict(columns, share=True):
+    """
+      The data dictionary view of a block of columns. Records of each tensor tag are generated when first accessed,
+      sharing their atom references unless share is False, see :py:meth:`TensorColumns.records`.
+    """
+
+    data_dict = LazyDict()
+
+    for tag in columns:
+        if isinstance(columns, LazyDict) and not columns.is_loaded(tag):
+            data_dict.set_loader(tag, partial(_tag_records, columns, tag, share))
+        elif isinstance(columns[tag], TensorColumns):
+            data_dict.set_loader(tag, partial(columns[tag].to_records, share))
+        else:
+            data_dict[tag] = columns[tag]
+
+    return data_dict
+
+
+def _tag_records(columns, tag, share=True):
+    return columns[tag].to_records(share)
+
+
+columnar_block_parsers = {
+    'magres': parse_magres_block_columnar, }
@@ -41,7 +41,11 @@ def efg_to_Cq(efg, s):
 
 def efg_to_Cq_isotope(efg, species, isotope):
     # Magic constants to convert from millibarns to a.u. and then back to MHz
-    return sorted_evals(efg)[0] * (Q[(species, isotope)] * millibarn) / megahertz
+    return val_to_Cq_isotope(sorted_evals(efg)[0], species, isotope)
+
+
+def val_to_Cq_isotope(ev, species, isotope):
+    return ev * (Q[(species, isotope)] * millibarn) / megahertz
 
 
 def val_to_Cq(ev, s):
@@ -55,13 +59,16 @@ def largest_eval(m):
     return sorted_evals(m)[0]
 
 
+# More magic constants. Should make a proper atomic unit conversion function. J = K * gamma1 * gamma2 * K_to_J_factor
+K_to_J_factor = 1.05457148e-15 / (2 * math.pi)
+
+
 def K_to_J(K, s1, s2):
-    # More magic constants. Should make a proper atomic unit conversion function
-    return (K + K.T) / 2.0 * gamma_common[s1] * gamma_common[s2] * 1.05457148e-15 / (2 * math.pi)
+    return (K + K.T) / 2.0 * gamma_common[s1] * gamma_common[s2] * K_to_J_factor
 
 
 def K_to_J_iso(K, s1, iso1, s2, iso2):
-    return (K + K.T) / 2.0 * gamma[(s1, iso1)] * gamma[(s2, iso2)] * 1.05457148e-15 / (2 * math.pi)
+    return (K + K.T) / 2.0 * gamma[(s1, iso1)] * gamma[(s2, iso2)] * K_to_J_factor
 
 
 # Nuclear gyromagnetic ratios, from constants.f90, source IUPAC Recommendations 2001, Robin K. Harris et al
@@ -519,3 +526,21 @@ iso_spin = {
     ('Ti', 46): 0.0, ('Ba', 134): 0.0, ('Pb', 207): 0.5, ('Pd', 102): 0.0, ('Kr', 86): 0.0, ('Hg', 196): 0.0,
     ('Nd', 145): 3.5, ('Sn', 114): 0.0, ('Li', 7): 1.5
     }
+
+# Covalent radii in Angstroms, from B. Cordero et al., Dalton Trans. 2832 (2008), taking sp3 carbon and low spin
+# Mn, Fe and Co
+covalent_radii = {
+    'H': 0.31, 'He': 0.28, 'Li': 1.28, 'Be': 0.96, 'B': 0.84, 'C': 0.76, 'N': 0.71, 'O': 0.66, 'F': 0.57, 'Ne': 0.58,
+    'Na': 1.66, 'Mg': 1.41, 'Al': 1.21, 'Si': 1.11, 'P': 1.07, 'S': 1.05, 'Cl': 1.02, 'Ar': 1.06, 'K': 2.03,
+    'Ca': 1.76, 'Sc': 1.70, 'Ti': 1.60, 'V': 1.53, 'Cr': 1.39, 'Mn': 1.39, 'Fe': 1.32, 'Co': 1.26, 'Ni': 1.24,
+    'Cu': 1.32, 'Zn': 1.22, 'Ga': 1.22, 'Ge': 1.20, 'As': 1.19, 'Se': 1.20, 'Br': 1.20, 'Kr': 1.16, 'Rb': 2.20,
+    'Sr': 1.95, 'Y': 1.90, 'Zr': 1.75, 'Nb': 1.64, 'Mo': 1.54, 'Tc': 1.47, 'Ru': 1.46, 'Rh': 1.42, 'Pd': 1.39,
+    'Ag': 1.45, 'Cd': 1.44, 'In': 1.42, 'Sn': 1.39, 'Sb': 1.39, 'Te': 1.38, 'I': 1.39, 'Xe': 1.40, 'Cs': 2.44,
+    'Ba': 2.15, 'La': 2.07, 'Ce': 2.04, 'Pr': 2.03, 'Nd': 2.01, 'Pm': 1.99, 'Sm': 1.98, 'Eu': 1.98, 'Gd': 1.96,
+    'Tb': 1.94, 'Dy': 1.92, 'Ho': 1.92, 'Er': 1.89, 'Tm': 1.90, 'Yb': 1.87, 'Lu': 1.87, 'Hf': 1.75, 'Ta': 1.70,
+    'W': 1.62, 'Re': 1.51, 'Os': 1.44, 'Ir': 1.41, 'Pt': 1.36, 'Au': 1.36, 'Hg': 1.32, 'Tl': 1.45, 'Pb': 1.46,
+    'Bi': 1.48, 'Po': 1.40, 'At': 1.50, 'Rn': 1.50, 'Fr': 2.60, 'Ra': 2.21, 'Ac': 2.15, 'Th': 2.06, 'Pa': 2.00,
+    'U': 1.96, 'Np': 1.90, 'Pu': 1.87, 'Am': 1.80, 'Cm': 1.69, }
+
+# Two atoms are bonded if they're closer than the sum of their covalent radii plus this tolerance, in Angstroms
+bond_tolerance = 0.4
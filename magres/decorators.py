@@ -1,7 +1,10 @@
 class lazyproperty(object):
     '''
       Meant to be used for lazy evaluation of an object attribute.
-      Property should represent non-mutable data, as it replaces itself.
+      Property should represent non-mutable data, as it's computed once and then kept.
+
+      Values are kept in the owner's _cache dictionary, a slot for classes with __slots__, and are all forgotten by
+      clear_cache, e.g. in the setter of the data they're computed from.
     '''
 
     def __init__(self, fget=None, fset=None, fdel=None, doc=None):
@@ -13,14 +16,28 @@ class lazyproperty(object):
         if doc is None and fget is not None:
             self.__doc__ = fget.__doc__
 
-        self.__name__ = fget.__name__
-
     def __get__(self, obj, cls):
         # When the property on the owner instance is first accessed we
-        # calculate its value and self-modify to insert the value on
-        # the owner instance
+        # calculate its value and keep it in the owner's cache
 
         if obj is None:
             return self
 
-        return self.fget(obj)
+        cache = getattr(obj, '_cache', None)
+
+        if cache is None:
+            cache = obj._cache = {}
+
+        try:
+            return cache[self.__name__]
+        except KeyError:
+            value = cache[self.__name__] = self.fget(obj)
+            return value
+
+
+def clear_cache(obj):
+    '''
+      Forget the values of all the lazy properties of obj.
+    '''
+
+    obj._cache = None
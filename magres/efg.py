@@ -1,18 +1,22 @@
 import numpy
 from . import constants
 from . import html_repr
+from .decorators import lazyproperty, clear_cache
 #from decorators import property
 
 class MagresAtomEfg(object):
   """
     Representation of the electric field gradient on a particular atom.
+
+    The eigenvalues and eigenvectors of V are computed once and kept until V is set again.
   """
 
-  __slots__ = ["atom", "magres_efg"]
+  __slots__ = ["atom", "magres_efg", "_cache"]
 
   def __init__(self, atom, magres_efg):
     self.atom = atom
     self.magres_efg = magres_efg
+    self._cache = None
 
   @property
   def V(self):
@@ -28,6 +32,7 @@ class MagresAtomEfg(object):
       raise Exception("Wrong shape for new electric field gradient tensor, {}. Should be (3,3)".format(sh))
 
     self.magres_efg['V'] = value
+    clear_cache(self)
 
   @property
   def Cq(self):
@@ -39,7 +44,7 @@ class MagresAtomEfg(object):
       Where Q is the quadrupole moment of this particular species, e is the electron charge and h is Planck's constant.
     """
     try:
-      return constants.efg_to_Cq_isotope(self.V, self.atom.species, self.atom.isotope)
+      return constants.val_to_Cq_isotope(self.evals[2], self.atom.species, self.atom.isotope)
     except KeyError:
       return 0.0
 
@@ -55,6 +60,15 @@ class MagresAtomEfg(object):
     return (evals[1] - evals[0])/evals[2]
 
   @property
+  def P_Q(self):
+    """
+      The quadrupolar product of Cq and eta.
+
+      :math:`P_Q = C_q \sqrt{1 + \eta^2 / 3}`
+    """
+    return self.Cq * numpy.sqrt(1.0 + self.eta ** 2 / 3.0)
+
+  @lazyproperty
   def evalsvecs(self):
     """
       The eigenvalues and eigenvectors of V, ordered according to the Haeberlen convention:
@@ -69,11 +83,15 @@ class MagresAtomEfg(object):
 
         :math:`V_{ZZ}` = evals[2]
     """
-    evals, evecs = numpy.linalg.eig(self.magres_efg['V'])
+    V = self.V
+    evals, evecs = numpy.linalg.eigh((V + V.T) / 2.0)
+    evecs.flags.writeable = False
 
-    se = list(zip(*sorted(zip(evals, evecs), key=lambda x_y: abs(x_y[0]))))
+    order = sorted(range(3), key=lambda i: abs(evals[i]))
 
-    return ([se[0][1], se[0][0], se[0][2]], [se[1][1], se[1][0], se[1][2]])
+    # Tuples, so that the kept eigenvalues can't be changed in place
+    return (tuple(evals[i] for i in [order[1], order[0], order[2]]),
+            tuple(evecs[:, i] for i in [order[1], order[0], order[2]]))
 
   @property
   def evecs(self):
@@ -1,6 +1,12 @@
 from __future__ import print_function
+import io
 import re
 import json
+import gzip
+import zlib
+from functools import partial
+from collections import namedtuple
+from itertools import islice
 import magres.schema.validate
 
 try:
@@ -8,9 +14,28 @@ try:
 except:
     numpy = None
 
+try:
+    import bz2
+except ImportError:
+    bz2 = None
+
+try:
+    import lzma
+except ImportError:
+    lzma = None
+
 import sys
 
+try:
+    from sys import intern
+except ImportError:
+    # intern is a builtin on Python 2
+    pass
+
 blocks_re = re.compile(r"[\[<](?P<block_name>.*?)[>\]](.*?)[<\[]/(?P=block_name)[\]>]", re.M | re.S)
+block_start_re = re.compile(r"\s*[\[<](?P<block_name>[^/\]>]+)[>\]]")
+block_end_re = re.compile(r"\s*[<\[]/(?P<block_name>[^\]>]+)[\]>]")
+version_re = re.compile(r"\#\$magres-abinitio-v([0-9]+).([0-9]+)")
 
 if numpy is not None:
     def tensor33(x):
@@ -45,8 +70,8 @@ def get_version(file_contents):
       Look for and parse the magres file format version line
     """
 
-    lines = file_contents.split('\n')
-    match = re.match("\#\$magres-abinitio-v([0-9]+).([0-9]+)", lines[0])
+    # Only the first line is looked at, so there's no need to split the rest of the file
+    match = version_re.match(file_contents)
 
     if match:
         version = match.groups()
@@ -57,6 +82,131 @@ def get_version(file_contents):
     return version
 
 
+# Leading bytes of compressed files
+compression_magic = [
+    (b"\x1f\x8b", 'gzip'),
+    (b"BZh", 'bz2'),
+    (b"\xfd7zXZ\x00", 'xz'), ]
+
+compressed_kinds = [kind for magic, kind in compression_magic]
+
+# Longest magic number, i.e. the number of bytes needed to recognise a compressed file
+magic_size = max(len(magic) for magic, kind in compression_magic)
+
+# Errors raised reading a truncated or corrupt compressed file, bz2 raises OSError
+decompression_errors = (IOError, OSError, EOFError, zlib.error)
+
+if lzma is not None:
+    decompression_errors += (lzma.LZMAError,)
+
+
+def compression(head):
+    """
+      The kind of compression of a file from its leading bytes, or None if it isn't compressed.
+    """
+
+    for magic, kind in compression_magic:
+        if head.startswith(magic):
+            return kind
+
+    return None
+
+
+def open_compressed(path, kind):
+    """
+      Open a compressed file for reading as a binary stream that decompresses on the fly.
+    """
+
+    if kind == 'gzip':
+        return gzip.GzipFile(path, 'rb')
+    elif kind == 'bz2' and bz2 is not None:
+        return bz2.BZ2File(path, 'rb')
+    elif kind == 'xz' and lzma is not None:
+        return lzma.LZMAFile(path, 'rb')
+    else:
+        raise BadMagresFile("No module available to decompress %s file %s" % (kind, path))
+
+
+def open_magres(path):
+    """
+      Open a file for reading as text. Files compressed with gzip, bzip2 or xz, recognised by their magic number
+      rather than their name, are decompressed as they're read without writing a decompressed copy.
+
+      >>> MagresFile(open_magres("ethanol-jc-all.magres.gz"))
+    """
+
+    with open(path, 'rb') as f:
+        kind = compression(f.read(magic_size))
+
+    if kind is None:
+        return open(path)
+    else:
+        return io.TextIOWrapper(open_compressed(path, kind))
+
+# Atom header of CASTEP's old style magres output
+oldmagres_re = re.compile(r"=+[\r\n]+\s*(Perturbing Atom|Atom): ")
+
+
+def sniff(path, size=4096, decompress=False):
+    """
+      Work out the kind of a file from its first few bytes without reading the rest. Returns (kind, version) where
+      kind is one of
+
+        "magres": a magres-abinitio file, version is the (major, minor) version of the format.
+        "oldmagres": CASTEP's old style magres output, see :py:mod:`magres.oldmagres`.
+        "json": a magres data dictionary dumped as json, see :py:meth:`MagresFile.as_json`.
+        "gzip", "bz2" or "xz": a compressed file.
+
+      or None if it is none of these. version is None for every kind but "magres". With decompress=True the kind of
+      the contents of a compressed file is returned instead, decompressing only its first few bytes.
+
+      >>> sniff("ethanol.magres")
+      ('magres', (1, 0))
+    """
+
+    with open(path, 'rb') as f:
+        head = f.read(size)
+
+    kind = compression(head)
+
+    if kind is not None:
+        if not decompress:
+            return kind, None
+
+        with open_compressed(path, kind) as f:
+            head = f.read(size)
+
+    text = head.decode('latin-1')
+
+    version = get_version(text)
+
+    if version is not None:
+        return 'magres', version
+    elif text.lstrip().startswith("{"):
+        return 'json', None
+    elif oldmagres_re.search(text):
+        return 'oldmagres', None
+    else:
+        return None, None
+
+
+def check_version(line):
+    """
+      Check the version line of a magres file is one this parser understands, and return the version.
+    """
+
+    version = get_version(line)
+
+    if version is None:
+        # pass # Emit a warning?
+        raise BadVersion("Version string not present. Possibly not magres file.")
+    else:
+        if version[0] != MagresFile.version[0]:  # this is a major version 1 parser
+            raise BadVersion("Version %d.%d not recognised. This is a version 1.x parser" % version)
+
+    return version
+
+
 def parse_blocks(file_contents):
     """
       Parse series of XML-like deliminated blocks into a list of (block_name, contents) tuples
@@ -67,36 +217,136 @@ def parse_blocks(file_contents):
     return blocks
 
 
-def parse_block(block):
+def clean_line(line):
     """
-      Parse block contents into a series of (tag, data) records
+      Remove comments and whitespace at the start and end of a line
     """
 
-    def clean_line(line):
-        # Remove comments and whitespace at start and ends of line
-        line = re.sub('#(.*?)\n', '', line)
-        line = line.strip()
+    return line.split('#', 1)[0].strip()
 
-        return line
+
+def parse_block(block):
+    """
+      Parse block contents into a series of (tag, data) records
+    """
 
     name, data = block
 
-    lines = [clean_line(line) for line in data.split('\n')]
+    return (name, list(block_records(data.split('\n'))))
 
-    records = []
+
+def block_records(lines):
+    """
+      Turn the lines of a block into a series of (tag, data) records, skipping comments and blank lines
+    """
 
     for line in lines:
-        xs = line.split()
+        xs = clean_line(line).split()
 
         if not xs:
             continue
 
-        tag = xs[0]
-        data = xs[1:]
+        yield (xs[0], xs[1:])
+
+
+def iter_blocks(lines):
+    """
+      Split an iterable of lines into XML-like deliminated blocks in a single pass. Yields (block_name, lines)
+      tuples, where lines is an iterator over the raw lines of the block that shares the underlying line iterator.
+      Each block is consumed before the next one is read, so only one line is held in memory at a time.
+    """
+
+    lines = iter(lines)
+
+    for line in lines:
+        match = block_start_re.match(line)
+
+        if not match:
+            continue
+
+        name = match.group('block_name')
+        block_lines = _iter_block_lines(lines, name)
+
+        yield (name, block_lines)
+
+        # Skip whatever the consumer didn't read of this block
+        for _ in block_lines:
+            pass
+
+
+def _iter_block_lines(lines, name):
+    for line in lines:
+        match = block_end_re.match(line)
+
+        if match and match.group('block_name') == name:
+            return
+
+        yield line.rstrip('\r\n')
+
+    raise BadMagresFile("Block \"%s\" is not terminated" % name)
+
+
+def tokenize(lines):
+    """
+      Single pass tokenizer over the lines of a magres file. Yields (block_name, tag, data) records in file order.
+
+      >>> for block_name, tag, data in tokenize(open("ethanol.magres")):
+      ...   print(block_name, tag, data)
+    """
+
+    for name, block_lines in iter_blocks(lines):
+        for tag, data in block_records(block_lines):
+            yield (name, tag, data)
+
+
+def iter_lines(data):
+    """
+      Iterate over the lines of a string of magres file contents or an open file.
+    """
+
+    if isinstance(data, str):
+        return iter(data.splitlines())
+    elif hasattr(data, 'read'):
+        return iter(data)
+    else:
+        raise BadMagresFile("Can't load given magres file")
+
+
+MagresRecord = namedtuple('MagresRecord', ['block', 'tag', 'data'])
+
+
+def iter_records(fp, tags=None):
+    """
+      Stream the records of a magres file one at a time without building a data dictionary. Yields MagresRecord
+      tuples of (block, tag, data), where data has the same form as one item of data_dict[block][tag], e.g.
+      {'atom': {'label': 'C', 'index': 1}, 'sigma': [[...], [...], [...]]} for an ms record. fp can be a path or an
+      open file. Blocks MagresFile doesn't parse are skipped, as are records of tags not in tags, if it's given.
+
+      >>> for record in iter_records("ethanol-jc.magres", tags=['isc']):
+      ...   print(record.data['atom2'], record.data['K'])
+    """
+
+    if isinstance(fp, str):
+        with open_magres(fp) as f:
+            for record in iter_records(f, tags):
+                yield record
+
+        return
+
+    lines = iter_lines(fp)
+
+    check_version(next(lines, ""))
+
+    for name, tag, data in tokenize(lines):
+        if name not in MagresFile.block_parsers or (tags is not None and tag not in tags):
+            continue
 
-        records.append((tag, data))
+        converters = block_tags.get(name)
 
-    return (name, records)
+        if converters is None:
+            yield MagresRecord(name, tag, data)
+        else:
+            yield MagresRecord(name, tag, converters[tag](data))
 
 
 def check_units(d):
@@ -128,35 +378,71 @@ def check_units(d):
     return d
 
 
-def parse_magres_block(block):
+def atom_ref(label, index):
+    return {'label': label, 'index': int(index)}
+
+
+def interned_atom_ref(label, index):
+    return atom_ref(intern(label), index)
+
+
+class AtomRefs(object):
     """
-      Parse magres block into data dictionary given list of record tuples.
+      Interns the {'label': ..., 'index': ...} atom references of records, so that every record referring to the same
+      atom shares one dictionary and one label string. Call with the label and index fields of a record.
+
+      Only the columnar backend shares references, as its records are built from the columns, see
+      :py:meth:`magres.columnar.TensorColumns.records`. A shared reference must not be changed in place, as that
+      changes every record referring to the atom.
     """
 
-    name, records = block
+    __slots__ = ["refs"]
+
+    def __init__(self):
+        self.refs = {}
+
+    def __call__(self, label, index):
+        try:
+            return self.refs[(label, index)]
+        except KeyError:
+            ref = self.refs[(label, index)] = atom_ref(intern(label), index)
+            return ref
+
 
-    # Atom label, atom index and 3x3 tensor
-    def sitensor33(name):
-        return lambda d: {'atom': {'label': data[0], 'index': int(data[1])}, name: tensor33(list(map(float, data[2:])))}
-
-    # 2x(Atom label, atom index) and 3x3 tensor
-    def sisitensor33(name):
-        return lambda d: {
-            'atom1': {'label': data[0], 'index': int(data[1])}, 'atom2': {'label': data[2], 'index': int(data[3])},
-            name: tensor33(list(map(float, data[4:])))
-            }
-
-    tags = {
-        'ms': sitensor33('sigma'),
-        'efg': sitensor33('V'),
-        'efg_local': sitensor33('V'),
-        'efg_nonlocal': sitensor33('V'),
-        'isc': sisitensor33('K'),
-        'isc_fc': sisitensor33('K'), 'isc_spin': sisitensor33('K'), 'isc_orbital_p': sisitensor33('K'),
-        'isc_orbital_d': sisitensor33('K'),
-        'units': check_units
+# Atom label, atom index and 3x3 tensor
+def sitensor33(name):
+    return lambda data, ref=atom_ref: {'atom': ref(data[0], data[1]), name: tensor33(list(map(float, data[2:])))}
+
+
+# 2x(Atom label, atom index) and 3x3 tensor
+def sisitensor33(name):
+    return lambda data, ref=atom_ref: {
+        'atom1': ref(data[0], data[1]), 'atom2': ref(data[2], data[3]),
+        name: tensor33(list(map(float, data[4:])))
         }
 
+
+magres_tags = {
+    'ms': sitensor33('sigma'),
+    'efg': sitensor33('V'),
+    'efg_local': sitensor33('V'),
+    'efg_nonlocal': sitensor33('V'),
+    'isc': sisitensor33('K'),
+    'isc_fc': sisitensor33('K'), 'isc_spin': sisitensor33('K'), 'isc_orbital_p': sisitensor33('K'),
+    'isc_orbital_d': sisitensor33('K'),
+    'units': check_units
+    }
+
+
+def parse_magres_block(block):
+    """
+      Parse magres block into data dictionary given list of record tuples. Every record has its own atom reference
+      dictionaries, so that they can be changed independently, but their labels are interned. Only the columnar
+      backend saves the reference dictionaries, see :py:class:`AtomRefs`.
+    """
+
+    name, records = block
+
     data_dict = {}
 
     for record in records:
@@ -165,19 +451,54 @@ def parse_magres_block(block):
         if tag not in data_dict:
             data_dict[tag] = []
 
-        data_dict[tag].append(tags[tag](data))
+        if tag in magres_tensor_tags:
+            data_dict[tag].append(magres_tags[tag](data, interned_atom_ref))
+        else:
+            data_dict[tag].append(magres_tags[tag](data))
 
     return data_dict
 
 
 def write_units(data, out):
+    out.extend(iter_units_lines(data))
+
+
+def iter_units_lines(data):
     if 'units' in data:
         for tag, units in data['units']:
-            out.append("  units %s %s" % (tag, units))
+            yield "  units %s %s" % (tag, units)
+
+
+def tensor_format(precision, n=9):
+    """
+      A format string for n floats written in scientific notation with the given number of decimal places.
+    """
+    return " ".join(["%%.%dE" % precision] * n)
+
+
+def floats_format(precision=None, n=9):
+    """
+      A format string for n floats, as str writes them if precision is None, otherwise as tensor_format.
+    """
+    if precision is None:
+        return " ".join(["%s"] * n)
+    else:
+        return tensor_format(precision, n)
 
 
-def tensor_string(tensor):
-    return " ".join([" ".join(map(str, xs)) for xs in tensor])
+def format_lines(line_format, fields, num_lines):
+    """
+      Format num_lines lines of line_format from a flat list of the fields of every line with a single format
+      operation, rather than one per line. Returns the list of lines.
+    """
+    return ("\n".join([line_format] * num_lines) % tuple(fields)).split("\n")
+
+
+def tensor_string(tensor, precision=None):
+    if precision is None:
+        return " ".join([" ".join(map(str, xs)) for xs in tensor])
+    else:
+        return tensor_format(precision) % tuple(x for xs in tensor for x in xs)
 
 
 def write_magres_block(data):
@@ -185,36 +506,196 @@ def write_magres_block(data):
       Write out a <magres> block from its dictionary representation
     """
 
-    out = []
+    return "\n".join(iter_magres_block_lines(data))
+
+
+# Tensor tags of the magres block in the order they're written, and the name of their tensor
+magres_si_tags = [('ms', 'sigma'), ('efg_local', 'V'), ('efg_nonlocal', 'V'), ('efg', 'V')]
+magres_sisi_tags = [('isc_fc', 'K'), ('isc_orbital_p', 'K'), ('isc_orbital_d', 'K'), ('isc_spin', 'K'), ('isc', 'K')]
+
+
+def iter_magres_block_lines(data, precision=None, columns=None, chunk_size=4096):
+    """
+      Generate the lines of a <magres> block from its dictionary representation. Tags that haven't been loaded from
+      columns, a dictionary of :py:class:`magres.columnar.TensorColumns`, are written directly from the arrays.
+      Records are formatted chunk_size at a time, see :py:func:`format_lines`.
+    """
+
+    for line in iter_units_lines(data):
+        yield line
+
+    def from_columns(tag):
+        return (columns is not None and tag in columns and
+                isinstance(data, LazyDict) and not data.is_loaded(tag))
+
+    for tag, tensor_name in magres_si_tags:
+        if tag not in data:
+            continue
+
+        if from_columns(tag):
+            for line in iter_columns_lines(columns[tag], precision, chunk_size):
+                yield line
+        else:
+            line_format = "  " + tag + " %s %d " + floats_format(precision)
+            records = data[tag]
+
+            for start in range(0, len(records), chunk_size):
+                chunk = records[start:start + chunk_size]
+                fields = []
+
+                for atom_si in chunk:
+                    fields += [atom_si['atom']['label'], atom_si['atom']['index']]
+                    fields += [x for xs in atom_si[tensor_name] for x in xs]
+
+                for line in format_lines(line_format, fields, len(chunk)):
+                    yield line
+
+    for tag, tensor_name in magres_sisi_tags:
+        if tag not in data:
+            continue
+
+        if from_columns(tag):
+            for line in iter_columns_lines(columns[tag], precision, chunk_size):
+                yield line
+        else:
+            line_format = "  " + tag + " %s %d %s %d " + floats_format(precision)
+            records = data[tag]
+
+            for start in range(0, len(records), chunk_size):
+                chunk = records[start:start + chunk_size]
+                fields = []
+
+                for isc in chunk:
+                    fields += [isc['atom1']['label'], isc['atom1']['index'],
+                               isc['atom2']['label'], isc['atom2']['index']]
+                    fields += [x for xs in isc[tensor_name] for x in xs]
+
+                for line in format_lines(line_format, fields, len(chunk)):
+                    yield line
+
+
+def iter_columns_lines(columns, precision=None, chunk_size=4096):
+    """
+      Generate the record lines of a TensorColumns a chunk of records at a time. The fields of a chunk are laid out
+      as the columns of one table, a label and index per atom then the nine tensor components, and formatted by a
+      single format operation.
+    """
+
+    num_atoms = columns.num_atoms
+    line_format = "  " + columns.tag + " %s %d" * num_atoms + " " + floats_format(precision)
+
+    labels = numpy.array(columns.labels.labels, dtype=object)
+
+    for start in range(0, len(columns), chunk_size):
+        tensors = columns.tensors[start:start + chunk_size].reshape(-1, 9)
+
+        fields = numpy.empty((len(tensors), 2 * num_atoms + 9), dtype=object)
+        fields[:, 0:2 * num_atoms:2] = labels[columns.label_codes[start:start + chunk_size]]
+        fields[:, 1:2 * num_atoms:2] = columns.indices[start:start + chunk_size].tolist()
+        fields[:, 2 * num_atoms:] = tensors.tolist()
+
+        for line in format_lines(line_format, fields.ravel().tolist(), len(tensors)):
+            yield line
+
+
+class MagresEncoder(json.JSONEncoder):
+    """
+      JSON encoder that also accepts the NumPy arrays and scalars that tensor setters store in data dictionaries.
+    """
+
+    def default(self, o):
+        if numpy is not None:
+            if isinstance(o, numpy.ndarray):
+                return o.tolist()
+            elif isinstance(o, numpy.generic):
+                return o.item()
+
+        return json.JSONEncoder.default(self, o)
+
+
+# Default of arguments for which None has a meaning of its own, to tell when they weren't given
+not_given = object()
+
+# Name of the tensor of each tensor tag of the magres block, and the atoms each record refers to
+magres_tensor_tags = dict([(tag, (tensor_name, ['atom'])) for tag, tensor_name in magres_si_tags] +
+                          [(tag, (tensor_name, ['atom1', 'atom2'])) for tag, tensor_name in magres_sisi_tags])
+
+
+def compact_records(records, tag):
+    """
+      The compact JSON encoding of the records of a tensor tag: the atom labels and indices of the records and their
+      tensors as flat lists, with the shape of the tensors as a header.
+
+      {"shape": [N, 3, 3], "labels": [...], "indices": [...], "tensors": [...]}
+    """
+
+    tensor_name, atoms = magres_tensor_tags[tag]
+
+    return {
+        'shape': [len(records), 3, 3],
+        'labels': [record[atom]['label'] for record in records for atom in atoms],
+        'indices': [int(record[atom]['index']) for record in records for atom in atoms],
+        'tensors': [float(x) for record in records for xs in record[tensor_name] for x in xs], }
+
+
+def expand_records(compact, tag):
+    """
+      The records of a tensor tag from its compact JSON encoding, see :py:func:`compact_records`.
+    """
+
+    tensor_name, atoms = magres_tensor_tags[tag]
+
+    labels = compact['labels']
+    indices = compact['indices']
+    tensors = compact['tensors']
+
+    records = []
+
+    for i in range(compact['shape'][0]):
+        record = {}
+
+        for j, atom in enumerate(atoms):
+            k = i * len(atoms) + j
+            record[atom] = {'label': labels[k], 'index': indices[k]}
+
+        record[tensor_name] = [tensors[9 * i:9 * i + 3], tensors[9 * i + 3:9 * i + 6], tensors[9 * i + 6:9 * i + 9]]
+
+        records.append(record)
+
+    return records
+
+
+def is_compact(data_dict):
+    """
+      Whether any tensor tag of a magres block dictionary is in the compact JSON encoding.
+    """
+
+    return any(isinstance(data_dict[tag], dict) for tag in data_dict if tag in magres_tensor_tags)
+
 
-    def siout(tag, tensor_name):
-        if tag in data:
-            for atom_si in data[tag]:
-                out.append("  %s %s %d %s" % (
-                tag, atom_si['atom']['label'], atom_si['atom']['index'], tensor_string(atom_si[tensor_name])))
+# Lattice record: a1, a2 a3, b1, b2, b3, c1, c2 c3
+def lattice_record(data):
+    return tensor33(list(map(float, data)))
 
-    write_units(data, out)
 
-    siout('ms', 'sigma')
+# Atom record: label, index, x, y, z
+def atom_record(data):
+    return {
+        'species': data[0], 'label': data[1], 'index': int(data[2]),
+        'position': tensor31(list(map(float, data[3:])))
+        }
 
-    siout('efg_local', 'V')
-    siout('efg_nonlocal', 'V')
-    siout('efg', 'V')
 
-    def sisiout(tag, tensor_name):
-        if tag in data:
-            for isc in data[tag]:
-                out.append("  %s %s %d %s %d %s" % (
-                tag, isc['atom1']['label'], isc['atom1']['index'], isc['atom2']['label'], isc['atom2']['index'],
-                tensor_string(isc[tensor_name])))
+def symmetry_record(data):
+    return " ".join(data)
 
-    sisiout("isc_fc", 'K')
-    sisiout("isc_orbital_p", 'K')
-    sisiout("isc_orbital_d", 'K')
-    sisiout("isc_spin", 'K')
-    sisiout("isc", 'K')
 
-    return "\n".join(out)
+atoms_tags = {
+    'lattice': lattice_record,
+    'atom': atom_record,
+    'units': check_units,
+    'symmetry': symmetry_record
+    }
 
 
 def parse_atoms_block(block):
@@ -224,27 +705,6 @@ def parse_atoms_block(block):
 
     name, records = block
 
-    # Lattice record: a1, a2 a3, b1, b2, b3, c1, c2 c3
-    def lattice(d):
-        return tensor33(list(map(float, data)))
-
-    # Atom record: label, index, x, y, z
-    def atom(d):
-        return {
-            'species': data[0], 'label': data[1], 'index': int(data[2]),
-            'position': tensor31(list(map(float, data[3:])))
-            }
-
-    def symmetry(d):
-        return " ".join(data)
-
-    tags = {
-        'lattice': lattice,
-        'atom': atom,
-        'units': check_units,
-        'symmetry': symmetry
-        }
-
     data_dict = {}
 
     for record in records:
@@ -253,29 +713,45 @@ def parse_atoms_block(block):
         if tag not in data_dict:
             data_dict[tag] = []
 
-        data_dict[tag].append(tags[tag](data))
+        data_dict[tag].append(atoms_tags[tag](data))
 
     return data_dict
 
 
 def write_atoms_block(data):
-    out = []
+    return "\n".join(iter_atoms_block_lines(data))
 
-    write_units(data, out)
+
+def iter_atoms_block_lines(data, precision=None, columns=None):
+    """
+      Generate the lines of an <atoms> block from its dictionary representation
+    """
+
+    for line in iter_units_lines(data):
+        yield line
 
     if 'lattice' in data:
         for lat in data['lattice']:
-            out.append("  lattice %s" % tensor_string(lat))
+            yield "  lattice %s" % tensor_string(lat, precision)
 
     if 'symmetry' in data:
         for sym in data['symmetry']:
-            out.append("  symmetry %s" % sym)
+            yield "  symmetry %s" % sym
 
     if 'atom' in data:
         for a in data['atom']:
-            out.append("  atom %s %s %s %s" % (a['species'], a['label'], a['index'], " ".join(map(str, a['position']))))
+            if precision is None:
+                position = " ".join(map(str, a['position']))
+            else:
+                position = tensor_format(precision, 3) % tuple(a['position'])
 
-    return "\n".join(out)
+            yield "  atom %s %s %s %s" % (a['species'], a['label'], a['index'], position)
+
+
+# Record converters of each block type. Records of other blocks are left as lists of strings.
+block_tags = {
+    'magres': magres_tags,
+    'atoms': atoms_tags, }
 
 
 def parse_generic_block(block):
@@ -299,13 +775,120 @@ def parse_generic_block(block):
 
 
 def write_generic_block(data):
-    out = []
+    return "\n".join(iter_generic_block_lines(data))
 
+
+def iter_generic_block_lines(data, precision=None, columns=None):
     for tag, data in list(data.items()):
         for value in data:
-            out.append("%s %s" % (tag, " ".join(map(str, value))))
+            yield "%s %s" % (tag, " ".join(map(str, value)))
+
+
+class LazyDict(dict):
+    """
+      A dictionary some of whose values are produced by loader functions the first time they are accessed.
+      Iterating over the keys or testing membership doesn't load anything; looking up a value loads just that value,
+      and anything that needs all values (items(), values(), comparison, copying, JSON encoding) loads them all.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(LazyDict, self).__init__(*args, **kwargs)
+        self.loaders = {}
+
+    def set_loader(self, key, loader):
+        self.loaders[key] = loader
+        dict.__setitem__(self, key, None)
+
+    def is_loaded(self, key):
+        return key not in self.loaders
+
+    def load(self, key):
+        loader = self.loaders.pop(key, None)
+
+        if loader is not None:
+            dict.__setitem__(self, key, loader())
+
+    def load_all(self):
+        for key in list(self.loaders):
+            self.load(key)
+
+    def loaded(self):
+        """
+          A plain dictionary of only the values that have already been loaded.
+        """
+        return dict((key, value) for key, value in dict.items(self) if key not in self.loaders)
+
+    def __getitem__(self, key):
+        self.load(key)
+        return dict.__getitem__(self, key)
+
+    def __setitem__(self, key, value):
+        self.loaders.pop(key, None)
+        dict.__setitem__(self, key, value)
+
+    def __delitem__(self, key):
+        self.loaders.pop(key, None)
+        dict.__delitem__(self, key)
+
+    def __iter__(self):
+        return dict.__iter__(self)
+
+    def get(self, key, default=None):
+        if key in self:
+            return self[key]
+        else:
+            return default
+
+    def pop(self, key, *args):
+        self.load(key)
+        return dict.pop(self, key, *args)
+
+    def setdefault(self, key, default=None):
+        self.load(key)
+        return dict.setdefault(self, key, default)
+
+    def items(self):
+        self.load_all()
+        return dict.items(self)
+
+    def values(self):
+        self.load_all()
+        return dict.values(self)
+
+    def copy(self):
+        self.load_all()
+        return dict(self)
+
+    def __eq__(self, other):
+        self.load_all()
+
+        if isinstance(other, LazyDict):
+            other.load_all()
+
+        return dict.__eq__(self, other)
+
+    def __ne__(self, other):
+        return not (self == other)
+
+    __hash__ = None
+
+    def __repr__(self):
+        self.load_all()
+        return dict.__repr__(self)
+
+    def __reduce__(self):
+        return (LazyDict, (self.copy(),))
+
+
+def loaded(data_dict):
+    """
+      A copy of a data dictionary containing only the values of any LazyDicts that have already been loaded.
+    """
+
+    if isinstance(data_dict, LazyDict):
+        data_dict = data_dict.loaded()
 
-    return "\n".join(out)
+    return dict((key, loaded(value) if isinstance(value, dict) else value) for key, value in data_dict.items())
 
 
 class MagresFile(object):
@@ -319,112 +902,427 @@ class MagresFile(object):
         'atoms': write_atoms_block,
         'calculation': write_generic_block, }
 
+    block_line_writers = {
+        'magres': iter_magres_block_lines,
+        'atoms': iter_atoms_block_lines,
+        'calculation': iter_generic_block_lines, }
+
     version = (1, 0)
 
-    def __init__(self, data=None):
+    backends = ['dict', 'columnar']
+
+    # Blocks whose records can be selected by tag
+    selective_blocks = ['magres']
+
+    # Default validation mode, see magres.schema.validate.validate_magres
+    validation = "full"
+
+    # Number of processes that parse the [magres] block with the columnar backend, None for one per CPU
+    processes = 1
+
+    def __init__(self, data=None, backend="dict", blocks=None, tags=None, validation=None, processes=not_given):
+        """
+          Load a magres file from a path, string contents, open file or data dictionary.
+
+          With backend="columnar", the tensors of the [magres] block are stored as NumPy arrays in self.columns (see
+          :py:mod:`magres.columnar`) and their data_dict records are only generated when first accessed.
+
+          blocks and tags restrict parsing to the given blocks, e.g. ['atoms', 'magres'], and the given tags of the
+          [magres] block, e.g. ['ms']. The lines of anything else are kept without being split or converted, and are
+          parsed the first time they're looked up in data_dict.
+
+          >>> MagresFile("ethanol-jc-all.magres", tags=['ms'])
+
+          validation is "off", "structural" or "full" (the default), see :py:meth:`validate`.
+
+          With the columnar backend, processes > 1 splits a large [magres] block into chunks parsed in a pool of that
+          many processes, or one per CPU if processes is None (see
+          :py:func:`magres.columnar.parse_magres_block_parallel`). Left out, it's the class default of 1. It can't be
+          combined with tags.
+
+          >>> MagresFile("all-pairs.magres", backend="columnar", processes=64)
+        """
+
+        if backend not in self.backends:
+            raise ValueError("Unknown backend \"%s\", should be one of %s" % (backend, ", ".join(self.backends)))
+
+        self.backend = backend
+        self.blocks = blocks
+        self.tags = tags
+        self.columns = {}
+
+        if validation is not None:
+            if validation not in magres.schema.validate.modes:
+                raise ValueError("Unknown validation mode \"%s\", should be one of %s" %
+                                 (validation, ", ".join(magres.schema.validate.modes)))
+
+            self.validation = validation
+
+        if processes is not not_given:
+            if processes != 1 and backend != "columnar":
+                raise ValueError("Parsing in several processes needs the columnar backend")
+
+            self.processes = processes
+
+        if self.processes != 1 and tags is not None:
+            raise ValueError("Parsing in several processes can't be restricted to tags")
+
         if data is not None:
             self.load(data)
 
     def load(self, data):
-        if type(data) == dict:
+        if isinstance(data, dict):
+            self.load_dict(data)
+        else:
+            self.parse(data)
+
+        self.validate()
+
+    def load_dict(self, data):
+        """
+          Use a data dictionary, expanding any tags of its [magres] block that are in the compact JSON encoding (see
+          :py:meth:`as_json`). With the columnar backend these go straight into arrays.
+        """
+
+        if not isinstance(data.get('magres'), dict) or not is_compact(data['magres']):
             self.data_dict = data
+            return
+
+        data = dict(data)
+        magres_dict = data['magres']
+
+        if self._is_columnar('magres'):
+            from .columnar import LabelTable, TensorColumns, columns_dict
+
+            if not hasattr(self, 'labels'):
+                self.labels = LabelTable()
+
+            columns = {}
+
+            for tag in magres_dict:
+                if tag in magres_tensor_tags and isinstance(magres_dict[tag], dict):
+                    columns[tag] = TensorColumns.from_compact(tag, magres_dict[tag], self.labels)
+                else:
+                    columns[tag] = magres_dict[tag]
+
+            self.columns = LazyDict(magres=columns)
+            data['magres'] = columns_dict(columns)
         else:
-            if type(data) == str:
-                file_contents = data
-            else:
-                try:
-                    file_contents = data.read()
-                except:
-                    raise BadMagresFile("Can't load given magres file")
+            data['magres'] = dict((tag, expand_records(value, tag) if isinstance(value, dict) and
+                                   tag in magres_tensor_tags else value) for tag, value in magres_dict.items())
+
+        self.data_dict = data
+
+    def validate(self, mode=None):
+        """
+          Validate the data dictionary. mode defaults to self.validation and is one of
+
+            "off": no validation.
+            "structural": check the shapes of the lattice, positions and tensors and that every tensor refers to an
+            existing atom, using array operations.
+            "full": the structural checks plus validation against the magres JSON schema.
+
+          Values of a LazyDict that haven't been loaded yet aren't checked against the schema. Columnar tensors are
+          checked structurally from their arrays.
+        """
+
+        if mode is None:
+            mode = self.validation
+
+        if mode == "off":
+            return
+
+        # Columnar tags whose records haven't been generated are checked straight from their arrays
+        magres.schema.validate.validate_magres(loaded(self.data_dict), mode, self._unloaded_columns())
+
+    def _unloaded_columns(self):
+        """
+          The TensorColumns of the [magres] block whose data_dict records haven't been generated yet.
+        """
+
+        if 'magres' in self.columns and self.columns.is_loaded('magres') and \
+                isinstance(self.data_dict.get('magres'), LazyDict):
+            block = self.columns['magres']
+            magres_dict = self.data_dict['magres']
+
+            return dict((tag, block[tag]) for tag in block
+                        if tag in magres_tensor_tags and not magres_dict.is_loaded(tag) and
+                        (not isinstance(block, LazyDict) or block.is_loaded(tag)))
+        else:
+            return {}
+
+    def atom_rows(self):
+        """
+          A dictionary of the rows of data_dict['atoms']['atom'] by (label, index), empty if there are no atoms.
+        """
+
+        if 'atoms' not in self.data_dict or 'atom' not in self.data_dict['atoms']:
+            return {}
+
+        return dict(((atom['label'], atom['index']), i) for i, atom in enumerate(self.data_dict['atoms']['atom']))
+
+    def atom_ids(self, tag, rows=None):
+        """
+          The rows of data_dict['atoms']['atom'] that each record of a tensor tag of the [magres] block refers to, as
+          an int array of shape (N, 1) for ms and efg tags or (N, 2) for isc tags. Raises KeyError if a record refers
+          to an atom that doesn't exist.
+
+          The columnar backend joins its arrays to the atoms without touching any records. Otherwise each record is
+          looked up in rows, the dictionary of atom_rows, which can be given to share it between tags.
+        """
+
+        atoms = self.data_dict['atoms']['atom']
+
+        if self._is_columnar('magres') and 'magres' in self.columns and tag in self.columns['magres']:
+            return self.columns['magres'][tag].atom_ids(atoms)
+
+        if rows is None:
+            rows = self.atom_rows()
 
-            self.parse(file_contents)
+        names = magres_tensor_tags[tag][1]
 
-        magres.schema.validate.validate_magres(self.data_dict)
+        ids = [rows[(record[name]['label'], record[name]['index'])]
+               for record in self.data_dict['magres'][tag] for name in names]
+
+        return numpy.array(ids, dtype=int).reshape(-1, len(names))
 
     def parse(self, data, clean=True, include_unrecognised=False):
         if type(data) == str:
             try:
-                file_contents = open(data).read()
+                f = open_magres(data)
             except:
-                file_contents = data
-        elif type(data) == dict:
-            self.data_dict = data
+                f = None
+        elif isinstance(data, dict):
+            self.load_dict(data)
             return
         else:
-            try:
-                file_contents = data.read()
-            except:
-                raise BadMagresFile("Can't load given magres file")
-
-        version = get_version(file_contents)
+            f = None
 
-        if version is None:
-            # pass # Emit a warning?
-            raise BadVersion("Version string not present. Possibly not magres file.")
+        if f is not None:
+            with f:
+                self.parse_lines(f, clean, include_unrecognised)
         else:
-            if version[0] != self.version[0]:  # this is a major version 1 parser
-                raise BadVersion("Version %d.%d not recognised. This is a version 1.x parser" % version)
+            self.parse_lines(iter_lines(data), clean, include_unrecognised)
 
-        self.blocks = parse_blocks(file_contents)
+    def parse_lines(self, lines, clean=True, include_unrecognised=False):
+        """
+          Parse a magres file from an iterable of lines in a single pass, e.g. an open file.
+        """
+
+        lines = iter(lines)
+
+        check_version(next(lines, ""))
 
         if clean or not hasattr(self, 'data_dict'):
-            self.data_dict = {}
+            self.data_dict = LazyDict()
+            self.columns = LazyDict()
+        elif not isinstance(self.data_dict, LazyDict):
+            self.data_dict = LazyDict(self.data_dict)
 
-        for block_data in self.blocks:
-            block = parse_block(block_data)
+        if self.backend == "columnar" and (clean or not hasattr(self, 'labels')):
+            from .columnar import LabelTable
+            self.labels = LabelTable()
 
-            if block[0] in self.block_parsers:
-                data_dict = self.block_parsers[block[0]](block)
-                self.data_dict[block[0]] = data_dict
+        for name, block_lines in iter_blocks(lines):
+            if name not in self.block_parsers:
+                if include_unrecognised:
+                    # Throw in the text content of blocks we don't recognise
+                    self.data_dict[name] = "\n" + "".join("%s\n" % line for line in block_lines)
+
+                continue
+
+            if self.blocks is not None and name not in self.blocks:
+                # Keep the lines of blocks that weren't asked for, and parse them when they're first accessed
+                self._add_block(name, loader=partial(self._parse_block, name, list(block_lines)))
+            elif self.tags is not None and name in self.selective_blocks:
+                deferred = {}
+                parsed = self._parse_records(name, self._select_records(block_lines, deferred))
+
+                if not isinstance(parsed, LazyDict):
+                    parsed = LazyDict(parsed)
+
+                for tag, tag_lines in deferred.items():
+                    parsed.set_loader(tag, partial(self._parse_tag, name, tag, tag_lines))
+
+                self._add_block(name, parsed)
+            elif name == 'magres' and self._is_columnar(name) and self.processes != 1:
+                from .columnar import parse_magres_block_parallel
+                self._add_block(name, parse_magres_block_parallel(block_lines, self.labels, self.processes))
             else:
-                # print "Block type \"%s\" not recognised" % block[0]
+                self._add_block(name, self._parse_records(name, block_records(block_lines)))
 
-                # Throw in the text content of blocks we don't recognise
-                if include_unrecognised:
-                    self.data_dict[block[0]] = block_data[1]
+    def _is_columnar(self, name):
+        if self.backend == "columnar":
+            from .columnar import columnar_block_parsers
+            return name in columnar_block_parsers
+        else:
+            return False
 
-    @classmethod
-    def load_json(klass, json_string):
+    def _parse_records(self, name, records):
+        """
+          Parse the (tag, data) records of a block with the parser for this file's backend.
+        """
+
+        if self._is_columnar(name):
+            from .columnar import columnar_block_parsers
+            return columnar_block_parsers[name]((name, records), self.labels)
+        else:
+            return self.block_parsers[name]((name, records))
+
+    def _parse_block(self, name, lines):
+        return self._parse_records(name, block_records(lines))
+
+    def _parse_tag(self, name, tag, lines):
+        return self._parse_block(name, lines)[tag]
+
+    def _select_records(self, lines, deferred):
+        """
+          Yield the (tag, data) records of the requested tags, putting aside the lines of any other tags in deferred
+          without splitting them into fields.
+        """
+
+        for line in lines:
+            line = clean_line(line)
+
+            if not line:
+                continue
+
+            tag = line.split(None, 1)[0]
+
+            if tag == 'units' or tag in self.tags:
+                xs = line.split()
+                yield (xs[0], xs[1:])
+            else:
+                deferred.setdefault(tag, []).append(line)
+
+    def _add_block(self, name, parsed=None, loader=None):
         """
-          Load from a json dictionary
+          Add a parsed block, or a loader that will parse it, to data_dict. Columnar blocks go into self.columns and
+          data_dict holds a view of them.
         """
 
-        return MagresFile(json.loads(json_string))
+        if self._is_columnar(name):
+            from .columnar import columns_dict
+
+            if loader is not None:
+                self.columns.set_loader(name, loader)
+                self.data_dict.set_loader(name, lambda: columns_dict(self.columns[name]))
+            else:
+                self.columns[name] = parsed
+                self.data_dict[name] = columns_dict(parsed)
+        else:
+            if loader is not None:
+                self.data_dict.set_loader(name, loader)
+            else:
+                self.data_dict[name] = parsed
 
     @classmethod
-    def merge(klass, magres_files):
-        # Make the output magres file using the first magres file's data dictionary
-        out_magres_file = MagresFile(dict(magres_files[0].data_dict))
-        out_dict = out_magres_file.data_dict
+    def load_json(klass, json_string, backend="dict", validation=None):
+        """
+          Load from a json dictionary, in either the full or compact encoding produced by :py:meth:`as_json`. Trusted
+          data, e.g. written by as_json, can be loaded without validating it again with validation="off".
 
-        # We should check that the atoms and lattice are the same here. We don't.
+          >>> MagresFile.load_json(json_string, validation="off")
+        """
 
-        # Loop through the rest and add their information in
-        for magres_file in magres_files[1:]:
-            data_dict = magres_file.data_dict
+        return MagresFile(json.loads(json_string), backend=backend, validation=validation)
 
-            if 'magres' not in out_dict:
-                out_dict['magres'] = {}
+    @classmethod
+    def load_cached(klass, path, backend="dict", validation=None, save=True):
+        """
+          Load a magres file from its binary sidecar, path + ".npz", which is written the first time the file is
+          parsed and rebuilt whenever the file changes. See :py:mod:`magres.cache`.
 
-            for tag_key in data_dict['magres']:
-                if tag_key not in out_dict['magres']:
-                    out_dict['magres'][tag_key] = data_dict['magres'][tag_key]
-                else:
-                    out_dict['magres'][tag_key] += data_dict['magres'][tag_key]
+          >>> MagresFile.load_cached("ethanol-jc-all.magres")
+        """
 
-        return out_magres_file
+        from .cache import load_cached
+        return load_cached(path, backend, validation, save)
 
-    def as_json(self):
+    @classmethod
+    def merge(klass, magres_files, tolerance=1e-5, check=True, processes=1, validation=None):
+        """
+          Merge the [magres] blocks of a list of MagresFiles or paths into a new MagresFile without modifying them,
+          checking their structures match and de-duplicating records. See :py:func:`magres.merge.merge`.
+        """
+
+        from .merge import merge
+        return merge(magres_files, tolerance, check, processes, validation)
+
+    def as_json(self, compact=False):
         """
           Dump as a json dictionary for easy storage/transmission
+
+          With compact=True the records of each tensor tag of the [magres] block are encoded as flat lists with a
+          shape header, see :py:func:`compact_records`. Columnar tensors are encoded straight from their arrays.
         """
 
-        magres.schema.validate.validate_magres(self.data_dict)
+        self.validate()
 
-        json_out = json.dumps(self.data_dict)
+        json_out = json.dumps(self.json_dict(compact), cls=MagresEncoder)
 
         return json_out
 
+    def write_json(self, fp, compact=False):
+        """
+          Write the json dictionary to an open file one tag at a time, without building the whole string in memory.
+          The output is identical to as_json(compact).
+        """
+
+        self.validate()
+
+        data = self.json_dict(compact)
+
+        fp.write("{")
+
+        for i, name in enumerate(data):
+            if i > 0:
+                fp.write(", ")
+
+            fp.write(json.dumps(name) + ": ")
+
+            block = data[name]
+
+            if isinstance(block, dict):
+                fp.write("{")
+
+                for j, tag in enumerate(block):
+                    if j > 0:
+                        fp.write(", ")
+
+                    fp.write(json.dumps(tag) + ": ")
+                    fp.write(json.dumps(block[tag], cls=MagresEncoder))
+
+                fp.write("}")
+            else:
+                fp.write(json.dumps(block, cls=MagresEncoder))
+
+        fp.write("}")
+
+    def json_dict(self, compact=False):
+        """
+          The data dictionary to dump as json, with the tensor tags of the [magres] block in the compact encoding if
+          compact is True.
+        """
+
+        if not compact or 'magres' not in self.data_dict:
+            return self.data_dict
+
+        columns = self._unloaded_columns()
+        magres_dict = self.data_dict['magres']
+
+        compact_dict = {}
+
+        for tag in magres_dict:
+            if tag in columns:
+                compact_dict[tag] = columns[tag].compact()
+            elif tag in magres_tensor_tags:
+                compact_dict[tag] = compact_records(magres_dict[tag], tag)
+            else:
+                compact_dict[tag] = magres_dict[tag]
+
+        return dict((name, compact_dict if name == 'magres' else self.data_dict[name]) for name in self.data_dict)
+
     # def as_ase(self):
     #  from ase import Atoms, Atom
 
@@ -439,16 +1337,15 @@ class MagresFile(object):
 
     #  return atoms
 
-    def __str__(self):
+    def iter_lines(self, precision=None):
         """
-          Convert the internal data dictionary representation to a magres-abinitio format file
+          Generate the lines of the magres-abinitio format file one at a time. If precision is given, floats are
+          written in scientific notation with that many decimal places, otherwise exactly as str() gives them.
         """
 
-        out = []
-
-        out.append("#$magres-abinitio-v%d.%d" % self.version)
-        out.append(
-            "# Generated by format.py. For format definition and code samples see http://www.ccpnc.ac.uk/pmwiki.php/CCPNC/Fileformat")
+        yield "#$magres-abinitio-v%d.%d" % self.version
+        yield "# Generated by format.py. For format definition and code samples see " \
+              "http://www.ccpnc.ac.uk/pmwiki.php/CCPNC/Fileformat"
 
         # Order of the blocks, lower weights are higher up. Default weight is 0.
         order = {
@@ -458,11 +1355,52 @@ class MagresFile(object):
         for block_type in sorted(self.data_dict, key=lambda x: order.get(x, 0)):
             data = self.data_dict[block_type]
 
-            textout = self.block_writers[block_type](data)
+            if block_type in self.columns:
+                columns = self.columns[block_type]
+            else:
+                columns = None
+
+            yield "[%s]" % block_type
+
+            empty = True
+
+            for line in self.block_line_writers[block_type](data, precision, columns):
+                empty = False
+                yield line
+
+            if empty:
+                yield ""
+
+            yield "[/%s]" % block_type
 
-            out.append("[%s]\n" % block_type + textout + "\n[/%s]" % block_type)
+    def write(self, fp, precision=None, chunk_size=4096):
+        """
+          Write the magres-abinitio format file to an open file, chunk_size lines at a time, without building the
+          whole file in memory. The output is identical to str(magres_file) unless a precision is given.
+
+          >>> magres_file.write(open("merged.magres", "w"))
+        """
+
+        lines = self.iter_lines(precision)
+        chunk = list(islice(lines, chunk_size))
+
+        fp.write("\n".join(chunk))
+
+        while True:
+            chunk = list(islice(lines, chunk_size))
+
+            if not chunk:
+                break
+
+            fp.write("\n")
+            fp.write("\n".join(chunk))
+
+    def __str__(self):
+        """
+          Convert the internal data dictionary representation to a magres-abinitio format file
+        """
 
-        return "\n".join(out)
+        return "\n".join(self.iter_lines())
 
 
 if __name__ == "__main__":
@@ -0,0 +1,269 @@
+"""
+  magres.index builds a byte offset index of the blocks and records of a magres file, so that the records of a
+  single atom can be read from a large file through mmap without parsing the rest of it.
+
+  >>> index = MagresIndex.load("ethanol-jc-all.magres")
+  >>> index.records('isc', 'C', 1)
+"""
+import os
+import json
+import mmap
+from .format import (
+    MagresFile,
+    BadMagresFile,
+    check_version,
+    compressed_kinds,
+    sniff,
+    block_records,
+    block_start_re,
+    block_end_re,
+    clean_line,
+)
+
+# Tags whose records are keyed by an atom, and the position of that atom's label in the record's fields
+keyed_tags = {
+    'atom': 1,
+    'ms': 0,
+    'efg': 0,
+    'efg_local': 0,
+    'efg_nonlocal': 0,
+    'isc': 0,
+    'isc_fc': 0,
+    'isc_spin': 0,
+    'isc_orbital_p': 0,
+    'isc_orbital_d': 0, }
+
+
+def record_key(label, index):
+    return "%s %d" % (label, int(index))
+
+
+class MagresIndex(object):
+    """
+      Byte offsets of each block of a magres file, and of the line ranges holding the records of each tag and atom.
+
+      offsets[block_name][tag][key] is a list of [start, end] byte ranges, where key is "label index" of the (first)
+      atom the records refer to, or "" for records that don't refer to an atom. Consecutive lines are merged into a
+      single range, so a coupling block sorted by perturbing atom has one range per atom.
+    """
+
+    suffix = ".idx"
+
+    def __init__(self, path, blocks, offsets, size, mtime):
+        self.path = path
+        self.blocks = blocks
+        self.offsets = offsets
+        self.size = size
+        self.mtime = mtime
+
+        self._file = None
+        self._mmap = None
+
+    def __repr__(self):
+        return "<magres.index.MagresIndex - {}>".format(self.path)
+
+    @classmethod
+    def build(klass, path):
+        """
+          Scan a magres file once, recording the byte offsets of its blocks and records. The file can't be compressed,
+          as the offsets are into the file itself.
+        """
+
+        kind, version = sniff(path)
+
+        if kind in compressed_kinds:
+            raise BadMagresFile("Can't index %s file %s, decompress it first" % (kind, path))
+
+        blocks = {}
+        offsets = {}
+
+        with open(path, 'rb') as f:
+            first_line = f.readline()
+            offset = len(first_line)
+
+            check_version(first_line.decode('latin-1'))
+
+            name = None
+            block_start = None
+
+            for raw_line in f:
+                start = offset
+                offset += len(raw_line)
+                line = raw_line.decode('latin-1')
+
+                if name is None:
+                    match = block_start_re.match(line)
+
+                    if match:
+                        name = match.group('block_name')
+                        block_start = offset
+                        offsets[name] = {}
+
+                    continue
+
+                match = block_end_re.match(line)
+
+                if match and match.group('block_name') == name:
+                    blocks[name] = [block_start, start]
+                    name = None
+                    continue
+
+                xs = clean_line(line).split()
+
+                if not xs:
+                    continue
+
+                tag = xs[0]
+
+                if tag in keyed_tags and len(xs) > keyed_tags[tag] + 2:
+                    key = record_key(xs[keyed_tags[tag] + 1], xs[keyed_tags[tag] + 2])
+                else:
+                    key = ""
+
+                ranges = offsets[name].setdefault(tag, {}).setdefault(key, [])
+
+                if ranges and ranges[-1][1] == start:
+                    ranges[-1][1] = offset
+                else:
+                    ranges.append([start, offset])
+
+            if name is not None:
+                raise BadMagresFile("Block \"%s\" is not terminated" % name)
+
+        stat = os.stat(path)
+
+        return klass(path, blocks, offsets, stat.st_size, stat.st_mtime)
+
+    @classmethod
+    def load(klass, path, save=True):
+        """
+          Load the index of a magres file from its sidecar file, path + ".idx", rebuilding it if it is missing,
+          unreadable or out of date with the magres file.
+        """
+
+        index_path = path + klass.suffix
+
+        if os.path.isfile(index_path):
+            try:
+                with open(index_path) as f:
+                    d = json.load(f)
+
+                index = klass(path, d['blocks'], d['offsets'], d['size'], d['mtime'])
+            except (IOError, OSError, ValueError, KeyError, TypeError):
+                # A corrupt or partially written sidecar is rebuilt
+                index = None
+
+            if index is not None and index.is_current():
+                return index
+
+        index = klass.build(path)
+
+        if save:
+            try:
+                index.save()
+            except (IOError, OSError):
+                # Not being able to write the sidecar, e.g. in a read only directory, shouldn't stop the load
+                pass
+
+        return index
+
+    def save(self, index_path=None):
+        if index_path is None:
+            index_path = self.path + self.suffix
+
+        # Write to a temporary file first so that a reader never sees a partially written sidecar
+        tmp_path = "%s.%d.tmp" % (index_path, os.getpid())
+
+        with open(tmp_path, 'w') as f:
+            json.dump({'size': self.size,
+                       'mtime': self.mtime,
+                       'blocks': self.blocks,
+                       'offsets': self.offsets}, f)
+
+        os.rename(tmp_path, index_path)
+
+    def is_current(self):
+        """
+          Whether the magres file is unchanged since the index was built.
+        """
+
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return False
+
+        return stat.st_size == self.size and stat.st_mtime == self.mtime
+
+    def _map(self):
+        if self._mmap is None:
+            self._file = open(self.path, 'rb')
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        return self._mmap
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._file.close()
+
+            self._mmap = None
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def ranges(self, tag, label=None, index=None, block='magres'):
+        """
+          The [start, end] byte ranges of the records of a tag, optionally only those of a particular atom.
+        """
+
+        keys = self.offsets.get(block, {}).get(tag, {})
+
+        if label is None:
+            ranges = [r for key_ranges in keys.values() for r in key_ranges]
+        else:
+            ranges = keys.get(record_key(label, index), [])
+
+        return sorted(ranges)
+
+    def lines(self, tag, label=None, index=None, block='magres'):
+        """
+          The raw lines of the records of a tag, optionally only those of a particular atom.
+        """
+
+        m = self._map()
+
+        lines = []
+
+        for start, end in self.ranges(tag, label, index, block):
+            lines += m[start:end].decode('latin-1').splitlines()
+
+        return lines
+
+    def records(self, tag, label=None, index=None, block='magres'):
+        """
+          Parse the records of a tag, optionally only those of a particular atom, into their data dictionary form.
+
+          >>> index.records('isc', 'C', 1)
+        """
+
+        if block not in MagresFile.block_parsers:
+            raise KeyError("No parser for block \"%s\"" % block)
+
+        data_dict = MagresFile.block_parsers[block]((block, block_records(self.lines(tag, label, index, block))))
+
+        return data_dict.get(tag, [])
+
+    def block(self, name):
+        """
+          Parse a single block into its data dictionary form.
+        """
+
+        start, end = self.blocks[name]
+
+        lines = self._map()[start:end].decode('latin-1').splitlines()
+
+        return MagresFile.block_parsers[name]((name, block_records(lines)))
@@ -2,18 +2,24 @@ from . import constants
 from . import html_repr
 import numpy
 from .view import ListPropertyView
+from .decorators import lazyproperty, clear_cache
 
 
 class MagresAtomIsc(object):
     """
       Representation of the indirect spin coupling between two atoms.
+
+      The symmetric part of K and its eigenvalues and eigenvectors are computed once and kept until K is set again.
+      J is K scaled by the gyromagnetic ratios of the isotopes of the atoms, so its eigenvalues and eigenvectors are
+      found from those of K.
     """
-    __slots__ = ["atom1", "atom2", "magres_isc"]
+    __slots__ = ["atom1", "atom2", "magres_isc", "_cache"]
 
     def __init__(self, atom1, atom2, magres_isc):
         self.atom1 = atom1
         self.atom2 = atom2
         self.magres_isc = magres_isc
+        self._cache = None
 
     def perturbing(self, species=None, index=None):
         if hasattr(species, "__call__"):
@@ -81,8 +87,12 @@ class MagresAtomIsc(object):
             raise Exception("Wrong shape for new indirect spin-spin coupling tensor, {}. Should be (3,3)".format(sh))
 
         self.magres_isc['K'] = value
+        clear_cache(self)
 
-    @property
+        # Tell matrices of the atoms' couplings that they're out of date
+        self.atom1._store.nmr_generation += 1
+
+    @lazyproperty
     def K_iso(self):
         """
           The isotropic component of the reduced indirect spin-spin coupling tensor.
@@ -104,12 +114,16 @@ class MagresAtomIsc(object):
         """
         return numpy.trace(self.J) / 3.0
 
-    @property
+    @lazyproperty
     def K_sym(self):
         """
           The symmetric component of the reduced indirect spin-spin coupling tensor K.
         """
-        return (self.K + self.K.T) / 2.0
+        K = self.K
+        K_sym = (K + K.T) / 2.0
+        K_sym.flags.writeable = False
+
+        return K_sym
 
     @property
     def K_asym(self):
@@ -132,13 +146,16 @@ class MagresAtomIsc(object):
         """
         return (self.J - self.J.T) / 2.0
 
-    @property
+    @lazyproperty
     def K_evalsvecs(self):
-        evals, evecs = numpy.linalg.eig(self.K_sym)
+        evals, evecs = numpy.linalg.eigh(self.K_sym)
+        evecs.flags.writeable = False
 
-        se = list(zip(*sorted(zip(evals, evecs), key=lambda x_y: abs(x_y[0] - self.K_iso))))
+        order = sorted(range(3), key=lambda i: abs(evals[i] - self.K_iso))
 
-        return ([se[0][1], se[0][0], se[0][2]], [se[1][1], se[1][0], se[1][2]])
+        # Tuples, so that the kept eigenvalues can't be changed in place
+        return (tuple(evals[i] for i in [order[1], order[0], order[2]]),
+                tuple(evecs[:, i] for i in [order[1], order[0], order[2]]))
 
     @property
     def K_evecs(self):
@@ -150,11 +167,13 @@ class MagresAtomIsc(object):
 
     @property
     def J_evalsvecs(self):
-        evals, evecs = numpy.linalg.eig(self.J_sym)
+        # Scaling K keeps the order of the eigenvalues by their distance from the isotropic value
+        scale = constants.K_to_J_iso(numpy.eye(3), self.atom1.species, self.atom1.isotope, self.atom2.species,
+                                     self.atom2.isotope)[0, 0]
 
-        se = list(zip(*sorted(zip(evals, evecs), key=lambda x_y1: abs(x_y1[0] - self.J_iso))))
+        evals, evecs = self.K_evalsvecs
 
-        return ([se[0][1], se[0][0], se[0][2]], [se[1][1], se[1][0], se[1][2]])
+        return (tuple(scale * ev for ev in evals), evecs)
 
     @property
     def J_evecs(self):
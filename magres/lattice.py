@@ -0,0 +1,130 @@
+"""
+  magres.lattice reduces a lattice to a basis of short, nearly orthogonal vectors, Selling reduction to an obtuse
+  superbase (J. H. Conway and N. J. A. Sloane, Proc. R. Soc. Lond. A 436, 55 (1992)), in which periodic geometry is
+  cheap however sheared the original lattice is. Minimum image displacements are found among the 27 images of the
+  home cell of the reduced basis, and checked against a bound that proves no other image can be closer.
+
+  >>> reduced = ReducedLattice(lattice)
+  >>> dr = reduced.minimum_image(positions[1] - positions[0])
+"""
+import itertools
+import numpy
+
+# Lattice translations to the 27 cells around the home cell, as fractional coordinates
+stencil = numpy.array(list(itertools.product([-1, 0, 1], repeat=3)), dtype=float)
+
+
+def selling_reduce(lattice, tol=1e-10, max_steps=1000):
+    """
+      Selling reduce a 3x3 lattice of row vectors. Returns (reduced, transform), where transform is an integer
+      matrix with reduced = dot(transform, lattice), and every pair of the superbase b1, b2, b3 and
+      b0 = -(b1 + b2 + b3) of the reduced lattice has a non-positive dot product.
+    """
+
+    lattice = numpy.array(lattice, dtype=float).reshape(3, 3)
+
+    # Superbase as integer combinations of the lattice vectors
+    coeffs = numpy.vstack([-numpy.ones((1, 3), dtype=int), numpy.eye(3, dtype=int)])
+    scale = tol * max(numpy.abs(lattice).max(), 1.0) ** 2
+
+    for step in range(max_steps):
+        superbase = numpy.dot(coeffs, lattice)
+        dots = numpy.dot(superbase, superbase.T)
+
+        pairs = [(i, j) for i in range(4) for j in range(i + 1, 4) if dots[i, j] > scale]
+
+        if not pairs:
+            break
+
+        # Flip the pair with the largest dot product: b_i -> -b_i and b_k -> b_k + b_i for the other two
+        i, j = max(pairs, key=lambda ij: dots[ij])
+
+        for k in range(4):
+            if k != i and k != j:
+                coeffs[k] += coeffs[i]
+
+        coeffs[i] = -coeffs[i]
+    else:
+        raise ValueError("Lattice reduction didn't converge")
+
+    transform = coeffs[1:]
+
+    # Keep the handedness of the original lattice
+    if numpy.linalg.det(transform) < 0:
+        transform = -transform
+
+    return numpy.dot(transform, lattice), transform
+
+
+class ReducedLattice(object):
+    """
+      A lattice of row vectors with its Selling reduced basis, inverse and reciprocal lattice, computed once.
+
+      reciprocal holds the reciprocal lattice vectors as rows, without the factor of 2 pi, so that
+      dot(lattice, reciprocal.T) is the identity.
+    """
+
+    __slots__ = ["lattice", "inverse", "reciprocal", "reduced", "reduced_inverse", "transform", "translations",
+                 "widths"]
+
+    def __init__(self, lattice):
+        self.lattice = numpy.array(lattice, dtype=float).reshape(3, 3)
+        self.inverse = numpy.linalg.inv(self.lattice)
+        self.reciprocal = self.inverse.T
+
+        self.reduced, self.transform = selling_reduce(self.lattice)
+        self.reduced_inverse = numpy.linalg.inv(self.reduced)
+
+        self.translations = numpy.dot(stencil, self.reduced)
+
+        # Perpendicular widths of the reduced cell, the inverse lengths of its reciprocal vectors
+        self.widths = 1.0 / numpy.sqrt((self.reduced_inverse ** 2).sum(axis=0))
+
+    def fractional(self, positions):
+        """
+          Fractional coordinates of an (..., 3) array of positions in the original lattice.
+        """
+
+        return numpy.dot(positions, self.inverse)
+
+    def cartesian(self, fractional):
+        return numpy.dot(fractional, self.lattice)
+
+    def minimum_image(self, dr):
+        """
+          The shortest periodic images of an (..., 3) array of displacements.
+        """
+
+        dr = numpy.asarray(dr, dtype=float)
+        shape = dr.shape
+
+        # Wrap into the reduced cell centred on the origin and try the images in the 27 cells around it
+        frac = numpy.dot(dr.reshape(-1, 3), self.reduced_inverse)
+        wrapped = numpy.dot(frac - numpy.rint(frac), self.reduced)
+
+        image = self._nearest(wrapped, self.translations)
+
+        # A closer image n would have |frac_i - n_i| < d / width_i for each reduced vector i, so with the wrapped
+        # fractional coordinates in [-1/2, 1/2] it must be in the stencil unless d / width_i >= 3/2
+        reach = numpy.sqrt((image ** 2).sum(axis=1))[:, None] / self.widths
+
+        for i in numpy.nonzero((reach >= 1.5).any(axis=1))[0]:
+            k = int(numpy.ceil(reach[i].max() + 0.5))
+            steps = numpy.array(list(itertools.product(range(-k, k + 1), repeat=3)), dtype=float)
+            image[i] = self._nearest(wrapped[i:i + 1], numpy.dot(steps, self.reduced))[0]
+
+        return image.reshape(shape)
+
+    @staticmethod
+    def _nearest(dr, translations):
+        candidates = dr[:, None, :] + translations
+        nearest = (candidates ** 2).sum(axis=2).argmin(axis=1)
+
+        return candidates[numpy.arange(len(dr)), nearest]
+
+    def shifts(self, dr, image):
+        """
+          The integer lattice shifts, in the original lattice, taking displacements dr to their images.
+        """
+
+        return numpy.rint(numpy.dot(numpy.asarray(image) - dr, self.inverse)).astype(int)
@@ -0,0 +1,157 @@
+"""
+  magres.merge combines the results of several calculations on the same structure, e.g. the per-site J-coupling
+  outputs of a directory, into a single :py:class:`magres.format.MagresFile`.
+
+  >>> merged = merge(["ethanol-jc-C1.magres", "ethanol-jc-C2.magres"], processes=4)
+"""
+import numpy
+from multiprocessing import Pool
+from .format import MagresFile, magres_tensor_tags
+from .lattice import ReducedLattice
+
+
+class StructureMismatch(ValueError):
+    pass
+
+
+def record_key(tag, record):
+    """
+      The key records of a tag are de-duplicated by: the tag and the label and index of each atom the record refers
+      to, or the record itself for records that don't refer to atoms, such as units.
+    """
+
+    if tag in magres_tensor_tags:
+        return (tag,) + tuple((record[atom]['label'], record[atom]['index']) for atom in magres_tensor_tags[tag][1])
+    elif isinstance(record, list):
+        return (tag,) + tuple(record)
+    else:
+        return (tag, id(record))
+
+
+def _structure(data_dict):
+    """
+      The lattice, atom keys and positions of a data dictionary as arrays.
+    """
+
+    atoms = data_dict.get('atoms', {})
+
+    lattice = numpy.array(atoms.get('lattice', []), dtype=float).reshape(-1, 3, 3)
+    keys = [(atom['label'], atom['index']) for atom in atoms.get('atom', [])]
+    positions = numpy.array([atom['position'] for atom in atoms.get('atom', [])], dtype=float).reshape(-1, 3)
+
+    return lattice, keys, positions
+
+
+def check_structures(data_dicts, tolerance=1e-5):
+    """
+      Check that the lattices and atom positions of several data dictionaries agree to within tolerance, comparing
+      all of them against the first at once. Raises StructureMismatch if they don't.
+    """
+
+    lattice, keys, positions = _structure(data_dicts[0])
+    rows = dict((key, i) for i, key in enumerate(keys))
+
+    lattices = []
+    all_positions = []
+
+    for n, data_dict in enumerate(data_dicts[1:], 1):
+        other_lattice, other_keys, other_positions = _structure(data_dict)
+
+        if other_lattice.shape != lattice.shape:
+            raise StructureMismatch("Structure %d has %d lattices, the first has %d" %
+                                    (n, len(other_lattice), len(lattice)))
+
+        if len(other_keys) != len(keys) or any(key not in rows for key in other_keys):
+            raise StructureMismatch("Structure %d has different atoms to the first" % n)
+
+        # Put the positions in the order of the first structure's atoms
+        order = numpy.empty(len(keys), dtype=int)
+        order[[rows[key] for key in other_keys]] = numpy.arange(len(keys))
+
+        lattices.append(other_lattice)
+        all_positions.append(other_positions[order])
+
+    if lattices:
+        lattice_diff = numpy.abs(numpy.array(lattices) - lattice).reshape(len(lattices), -1)
+        position_diff = numpy.array(all_positions) - positions
+
+        if len(lattice) == 1:
+            # Positions that differ by a lattice vector are periodic images of each other
+            position_diff = ReducedLattice(lattice[0]).minimum_image(position_diff)
+
+        position_diff = numpy.abs(position_diff).reshape(len(all_positions), -1)
+
+        for name, diff in [("lattice", lattice_diff), ("positions", position_diff)]:
+            if diff.size and diff.max() > tolerance:
+                n = int(diff.max(axis=1).argmax())
+                raise StructureMismatch("The %s of structure %d differ from the first by %g, more than the tolerance "
+                                        "of %g" % (name, n + 1, diff[n].max(), tolerance))
+
+
+def _parse(path):
+    return MagresFile(path, validation="off").data_dict.copy()
+
+
+def load_data_dicts(magres_files, processes=1):
+    """
+      The data dictionaries of a list of MagresFiles or paths. Paths are parsed in a pool of processes if processes
+      isn't 1, and None uses one per CPU.
+    """
+
+    paths = [f for f in magres_files if not isinstance(f, MagresFile)]
+
+    if paths and processes != 1:
+        pool = Pool(processes)
+
+        try:
+            parsed = iter(pool.map(_parse, paths))
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        parsed = (_parse(path) for path in paths)
+
+    return [f.data_dict if isinstance(f, MagresFile) else next(parsed) for f in magres_files]
+
+
+def merge(magres_files, tolerance=1e-5, check=True, processes=1, validation=None):
+    """
+      Merge the [magres] blocks of a list of MagresFiles or paths into a new MagresFile, taking the other blocks from
+      the first. The inputs aren't modified, and the output shares their records rather than copying them.
+
+      Records are de-duplicated by :py:func:`record_key`, keeping the first. With check=True the lattices and atom
+      positions must agree to within tolerance (see :py:func:`check_structures`). Paths are parsed without
+      validation, and the merged file is validated instead.
+    """
+
+    if not magres_files:
+        raise ValueError("No magres files to merge")
+
+    data_dicts = load_data_dicts(magres_files, processes)
+
+    if check:
+        check_structures(data_dicts, tolerance)
+
+    # A single pass over the records of every input, appending each one not already seen to its tag's list
+    seen = set()
+    magres_dict = {}
+
+    for data_dict in data_dicts:
+        block = data_dict.get('magres', {})
+
+        for tag in block:
+            records = magres_dict.setdefault(tag, [])
+
+            for record in block[tag]:
+                key = record_key(tag, record)
+
+                if key not in seen:
+                    seen.add(key)
+                    records.append(record)
+
+    out_dict = dict((name, magres_dict if name == 'magres' else data_dicts[0][name]) for name in data_dicts[0])
+
+    if magres_dict:
+        out_dict['magres'] = magres_dict
+
+    return MagresFile(out_dict, validation=validation)
@@ -1,5 +1,6 @@
 import numpy
 from . import html_repr
+from .decorators import lazyproperty, clear_cache
 
 
 # from decorators import property
@@ -7,13 +8,17 @@ from . import html_repr
 class MagresAtomMs(object):
     """
       Representation of the magnetic shielding of a particular atom.
+
+      The symmetric part of sigma and its eigenvalues and eigenvectors are computed once and kept until sigma is
+      set again.
     """
 
-    __slots__ = ["atom", "magres_ms"]
+    __slots__ = ["atom", "magres_ms", "_cache"]
 
     def __init__(self, atom, magres_ms):
         self.atom = atom
         self.magres_ms = magres_ms
+        self._cache = None
 
     @property
     def sigma(self):
@@ -29,15 +34,20 @@ class MagresAtomMs(object):
             raise Exception("Wrong shape for new magnetic shielding tensor, {}. Should be (3,3)".format(sh))
 
         self.magres_ms['sigma'] = value
+        clear_cache(self)
 
-    @property
+    @lazyproperty
     def sym(self):
         """
           The symmetric part of sigma.
 
           :math:`\sigma_{sym} = (\sigma + \sigma^T)/2`
         """
-        return (self.sigma + self.sigma.T) / 2.0
+        sigma = self.sigma
+        sym = (sigma + sigma.T) / 2.0
+        sym.flags.writeable = False
+
+        return sym
 
     @property
     def asym(self):
@@ -48,7 +58,7 @@ class MagresAtomMs(object):
         """
         return (self.sigma - self.sigma.T) / 2.0
 
-    @property
+    @lazyproperty
     def iso(self):
         """
           The isotropic part of sigma. Defined by
@@ -94,7 +104,7 @@ class MagresAtomMs(object):
         """
         return (self.evals[1] - self.evals[0]) / self.zeta
 
-    @property
+    @lazyproperty
     def evalsvecs(self):
         """
           The eigenvalues and eigenvectors of the symmetric part of sigma, ordered according to the Haeberlen
@@ -109,11 +119,12 @@ class MagresAtomMs(object):
             sigma_ZZ = evals[2]
         """
 
-        evals, evecs = numpy.linalg.eig(self.sym)
-
-        se = list(zip(*sorted(zip(evals, evecs), key=lambda x_y: abs(x_y[0] - self.iso))))
+        evals, evecs = self._eigh
+        order = sorted(range(3), key=lambda i: abs(evals[i] - self.iso))
 
-        return ([se[0][1], se[0][0], se[0][2]], [se[1][1], se[1][0], se[1][2]])
+        # Tuples, so that the kept eigenvalues can't be changed in place
+        return (tuple(evals[i] for i in [order[1], order[0], order[2]]),
+                tuple(evecs[:, i] for i in [order[1], order[0], order[2]]))
 
     @property
     def evecs(self):
@@ -145,7 +156,7 @@ class MagresAtomMs(object):
         """
         return self.evalsvecs[0]
 
-    @property
+    @lazyproperty
     def evalsvecs_mehring(self):
         """
           The eigenvalues and eigenvectors of the symmetric part of sigma ordered according to the Mehring notation:
@@ -153,11 +164,17 @@ class MagresAtomMs(object):
           :math:`\sigma_{11} \leq \sigma_{22} \leq \sigma_{33}`
         """
 
-        evals, evecs = numpy.linalg.eig(self.sym)
+        # eigh gives the eigenvalues in ascending order
+        evals, evecs = self._eigh
+
+        return ((evals[0], evals[1], evals[2]), (evecs[:, 0], evecs[:, 1], evecs[:, 2]))
 
-        se = list(zip(*sorted(zip(evals, evecs), key=lambda x_y1: x_y1[0])))
+    @lazyproperty
+    def _eigh(self):
+        evals, evecs = numpy.linalg.eigh(self.sym)
+        evecs.flags.writeable = False
 
-        return ([se[0][0], se[0][1], se[0][2]], [se[1][0], se[1][1], se[1][2]])
+        return evals, evecs
 
     @property
     def evals_mehring(self):
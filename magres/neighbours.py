@@ -0,0 +1,291 @@
+"""
+  magres.neighbours finds the atoms, including periodic images, within a radius of one or many centres using a cell
+  list, so that a query only looks at the atoms of the cells around each centre rather than every atom and image.
+
+  >>> search = NeighbourSearch(positions, lattice)
+  >>> centres, atoms, shifts, distances = search.query(positions, 2.0)
+"""
+import itertools
+import numpy
+from .lattice import ReducedLattice
+
+
+class NeighbourSearch(object):
+    """
+      A cell list over a set of positions in Angstroms, periodic in a 3x3 lattice of row vectors, or not periodic if
+      lattice is None. The cells divide the reduced cell of the lattice, see :py:class:`magres.lattice.ReducedLattice`,
+      which can be passed in if it's already known. The grid of cells is chosen for the radius of each query and kept
+      for later queries of a similar radius.
+    """
+
+    # Maximum number of candidate pairs examined at once, to bound the memory used by a query of many centres
+    max_candidates = 1 << 22
+
+    def __init__(self, positions, lattice=None, reduced=None):
+        self.positions = numpy.array(positions, dtype=float).reshape(-1, 3)
+
+        if lattice is not None:
+            self.lattice = numpy.array(lattice, dtype=float).reshape(3, 3)
+            self.reduced = reduced if reduced is not None else ReducedLattice(self.lattice)
+            self.origin = numpy.zeros(3)
+
+            # Grid the reduced cell, whose cells stay compact however sheared the lattice is
+            frame = self.reduced.reduced
+        else:
+            # Not periodic, use a box around the atoms as the frame of the grid
+            self.lattice = None
+            self.reduced = None
+
+            if len(self.positions):
+                self.origin = self.positions.min(axis=0)
+                extent = self.positions.max(axis=0) - self.origin
+            else:
+                self.origin = numpy.zeros(3)
+                extent = numpy.zeros(3)
+
+            frame = numpy.diag(numpy.maximum(extent, 1.0) * (1.0 + 1e-9))
+
+        self.frame = frame
+        self.frame_inverse = numpy.linalg.inv(frame)
+
+        # Perpendicular width of the frame along each of its vectors
+        self.widths = 1.0 / numpy.sqrt((self.frame_inverse ** 2).sum(axis=0))
+
+        frac = numpy.dot(self.positions - self.origin, self.frame_inverse)
+
+        if self.lattice is not None:
+            # Wrap into the reduced cell, remembering the shift back to the given positions
+            self.offsets = numpy.floor(frac).astype(int)
+            self.frac = frac - self.offsets
+        else:
+            self.offsets = numpy.zeros((len(frac), 3), dtype=int)
+            self.frac = frac
+
+        self._grids = {}
+
+    @property
+    def periodic(self):
+        return self.lattice is not None
+
+    def __len__(self):
+        return len(self.positions)
+
+    def grid_shape(self, r):
+        """
+          The number of cells along each vector of the frame for queries of radius r: cells at least r wide where
+          possible, but no more cells than atoms.
+        """
+
+        if r <= 0:
+            shape = numpy.ones(3)
+        else:
+            shape = numpy.maximum(numpy.floor(self.widths / r), 1)
+
+        num_cells = numpy.prod(shape)
+
+        if num_cells > max(len(self), 1):
+            shape = numpy.maximum(numpy.floor(shape * (max(len(self), 1) / num_cells) ** (1.0 / 3.0)), 1)
+
+        return tuple(int(n) for n in shape)
+
+    def grid(self, shape):
+        """
+          The atoms sorted by cell and the start of each cell in that order, for a grid of the given shape.
+        """
+
+        if shape not in self._grids:
+            n = numpy.array(shape)
+            cells = numpy.clip(numpy.floor(self.frac * n).astype(int), 0, n - 1)
+            cell_ids = numpy.ravel_multi_index(cells.T, shape) if len(cells) else numpy.zeros(0, dtype=int)
+
+            order = numpy.argsort(cell_ids, kind='mergesort')
+            counts = numpy.bincount(cell_ids, minlength=int(numpy.prod(shape)))
+            starts = numpy.concatenate([[0], numpy.cumsum(counts)[:-1]])
+
+            self._grids[shape] = (order, starts, counts)
+
+        return self._grids[shape]
+
+    def query(self, centres, r):
+        """
+          Find every atom or periodic image within r of each centre, an (M, 3) array of positions.
+
+          Returns (centre, atom, shift, distance) arrays, sorted by centre, then atom, then distance: the index of the
+          centre, the index of the atom, the integer lattice shift of the image from the atom's position and its
+          distance to the centre. The image's position is positions[atom] + dot(shift, lattice).
+        """
+
+        centres = numpy.array(centres, dtype=float).reshape(-1, 3)
+
+        shape = self.grid_shape(r)
+        order, starts, counts = self.grid(shape)
+        n = numpy.array(shape)
+
+        centre_frac = numpy.dot(centres - self.origin, self.frame_inverse)
+
+        if self.periodic:
+            centre_offsets = numpy.floor(centre_frac).astype(int)
+            centre_frac = centre_frac - centre_offsets
+        else:
+            centre_offsets = numpy.zeros((len(centres), 3), dtype=int)
+
+        centre_cells = numpy.floor(centre_frac * n).astype(int)
+
+        if self.periodic:
+            centre_cells = numpy.clip(centre_cells, 0, n - 1)
+
+        # Number of cells either side of a centre's cell that can hold atoms within r
+        reach = numpy.ceil(r * n / self.widths).astype(int) if r > 0 else numpy.zeros(3, dtype=int)
+
+        results = []
+
+        for step in itertools.product(*[range(-k, k + 1) for k in reach]):
+            cells = centre_cells + step
+
+            if self.periodic:
+                # Cells beyond the grid are images of the cells inside it
+                shifts = numpy.floor_divide(cells, n)
+                cells = cells - shifts * n
+                valid = numpy.ones(len(cells), dtype=bool)
+            else:
+                shifts = numpy.zeros_like(cells)
+                valid = ((cells >= 0) & (cells < n)).all(axis=1)
+
+            centre_index = numpy.nonzero(valid)[0]
+
+            if not len(centre_index):
+                continue
+
+            cell_ids = numpy.ravel_multi_index(cells[centre_index].T, shape)
+
+            for chunk in self._chunks(counts[cell_ids]):
+                results.append(self._pairs(centres, centre_offsets, centre_index[chunk], shifts[centre_index[chunk]],
+                                           starts[cell_ids[chunk]], counts[cell_ids[chunk]], order, r))
+
+        if results:
+            centre, atom, shift, distance = [numpy.concatenate(x) for x in zip(*results)]
+        else:
+            centre, atom = numpy.zeros(0, dtype=int), numpy.zeros(0, dtype=int)
+            shift, distance = numpy.zeros((0, 3), dtype=int), numpy.zeros(0)
+
+        # Images at the same distance are ordered by shift, counting out from zero as 0, 1, -1, 2, -2...
+        outward = numpy.where(shift > 0, 2 * shift - 1, -2 * shift)
+        sort = numpy.lexsort((outward[:, 2], outward[:, 1], outward[:, 0], distance, atom, centre))
+
+        return centre[sort], atom[sort], shift[sort], distance[sort]
+
+    def _chunks(self, counts):
+        """
+          Split the centres of a step into slices with at most max_candidates candidate atoms between them.
+        """
+
+        total = numpy.cumsum(counts)
+
+        if not len(total) or total[-1] <= self.max_candidates:
+            yield slice(0, len(counts))
+            return
+
+        start = 0
+
+        while start < len(counts):
+            base = total[start - 1] if start > 0 else 0
+            end = max(int(numpy.searchsorted(total, base + self.max_candidates, side='right')), start + 1)
+            yield slice(start, end)
+            start = end
+
+    def _pairs(self, centres, centre_offsets, centre_index, cell_shifts, starts, counts, order, r):
+        # Every (centre, atom) pair of the centres and the atoms of their cells, as flat arrays
+        centre = numpy.repeat(centre_index, counts)
+        first = numpy.repeat(numpy.cumsum(counts) - counts, counts)
+        atom = order[numpy.repeat(starts, counts) + numpy.arange(len(centre)) - first]
+
+        # Shift of each image from the atom's given position
+        shift = numpy.repeat(cell_shifts, counts, axis=0) + centre_offsets[centre] - self.offsets[atom]
+
+        if self.periodic:
+            # From the reduced basis to the lattice
+            shift = numpy.dot(shift, self.reduced.transform)
+            images = self.positions[atom] + numpy.dot(shift, self.lattice)
+        else:
+            images = self.positions[atom]
+
+        distance = numpy.sqrt(((images - centres[centre]) ** 2).sum(axis=1))
+        within = distance <= r
+
+        return centre[within], atom[within], shift[within], distance[within]
+
+    def pairs(self, r):
+        """
+          All pairs of atoms within r of each other, as :py:meth:`query` with every atom as a centre. Each atom is
+          paired with itself at a distance of zero.
+        """
+
+        return self.query(self.positions, r)
+
+
+class Adjacency(object):
+    """
+      A compressed sparse row list of the neighbours of each of num_atoms atoms: the neighbours of atom i are
+      atoms[indptr[i]:indptr[i + 1]], at the lattice shifts shifts[indptr[i]:indptr[i + 1]].
+    """
+
+    __slots__ = ["indptr", "atoms", "shifts", "distances"]
+
+    def __init__(self, indptr, atoms, shifts, distances):
+        self.indptr = indptr
+        self.atoms = atoms
+        self.shifts = shifts
+        self.distances = distances
+
+    @classmethod
+    def from_pairs(klass, num_atoms, centre, atom, shift, distance):
+        """
+          Build the adjacency from (centre, atom, shift, distance) arrays sorted by centre, as returned by
+          :py:meth:`NeighbourSearch.query`.
+        """
+
+        indptr = numpy.zeros(num_atoms + 1, dtype=int)
+        indptr[1:] = numpy.cumsum(numpy.bincount(centre, minlength=num_atoms))
+
+        return klass(indptr, atom, shift, distance)
+
+    def __len__(self):
+        return len(self.indptr) - 1
+
+    def __getitem__(self, i):
+        """
+          The (atoms, shifts) of the neighbours of atom i.
+        """
+
+        s = slice(self.indptr[i], self.indptr[i + 1])
+
+        return self.atoms[s], self.shifts[s]
+
+    def degrees(self):
+        """
+          The number of neighbours of each atom.
+        """
+
+        return numpy.diff(self.indptr)
+
+
+def covalent_bonds(search, species, radii, tolerance):
+    """
+      The bonds between the atoms of a NeighbourSearch as an Adjacency, bonding atoms closer than the sum of their
+      radii plus tolerance. species is the species of each atom and radii a dictionary of radius by species. Atoms of
+      species without a radius aren't bonded.
+    """
+
+    atom_radii = numpy.array([radii.get(s, numpy.nan) for s in species], dtype=float)
+    known = atom_radii[~numpy.isnan(atom_radii)]
+
+    if not len(known):
+        empty = numpy.zeros(0, dtype=int)
+        return Adjacency.from_pairs(len(search), empty, empty, numpy.zeros((0, 3), dtype=int), numpy.zeros(0))
+
+    centre, atom, shift, distance = search.pairs(2.0 * known.max() + tolerance)
+
+    # Species with no radius give NaN cutoffs, which nothing is within
+    bonded = (distance <= atom_radii[centre] + atom_radii[atom] + tolerance) & (distance > 0.0)
+
+    return Adjacency.from_pairs(len(search), centre[bonded], atom[bonded], shift[bonded], distance[bonded])
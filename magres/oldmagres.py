@@ -33,6 +33,24 @@ class OldMagres(object):
         if castep_file is not None:
             self.parse_castep(castep_file)
 
+    @classmethod
+    def load(klass, magres_path, castep_path=None):
+        """
+          Load an old style magres file, and optionally the CASTEP output with its lattice, from paths. Either can be
+          gzip, bzip2 or xz compressed.
+        """
+
+        with format.open_magres(magres_path) as f:
+            magres_file = f.read()
+
+        if castep_path is not None:
+            with format.open_magres(castep_path) as f:
+                castep_file = f.read()
+        else:
+            castep_file = None
+
+        return klass(magres_file, castep_file)
+
     def parse_castep(self, castep_file):
         lattice = castep_get_lattice(castep_file)
 
@@ -1,15 +1,187 @@
 import sys
+import copy
+import numbers
 from .schema import schema
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 try:
     from jsonschema import validate
+    from jsonschema.validators import validator_for, extend
 except ImportError:
     validate = None
 
+# Validation modes, from cheapest to most thorough
+modes = ['off', 'structural', 'full']
+
+_validators = {}
+
+
+class InvalidMagres(ValueError):
+    pass
+
+
+def lean_schema():
+    """
+      The magres schema without the lattice, positions and tensors, which :py:func:`check_structure` checks as whole
+      arrays rather than the schema number by number.
+    """
+
+    lean = copy.deepcopy(schema)
+    lean['definitions']['tensor33'] = {}
+    lean['properties']['atoms']['properties']['atom']['items']['properties']['position'] = {}
+
+    return lean
+
+
+def get_validator(lean=False):
+    """
+      The JSON schema validator for magres data dictionaries, of the lean schema if lean is True, see
+      :py:func:`lean_schema`. Each is only compiled once per process.
+    """
+
+    if lean not in _validators and validate is not None:
+        magres_schema = lean_schema() if lean else schema
+
+        klass = validator_for(magres_schema)
+        klass.check_schema(magres_schema)
+
+        if numpy is not None:
+            # Accept the NumPy arrays and scalars that tensor setters store in data dictionaries
+            type_checker = klass.TYPE_CHECKER.redefine_many({
+                'array': lambda checker, x: isinstance(x, (list, numpy.ndarray)),
+                'number': lambda checker, x: (isinstance(x, (int, float, numpy.number)) and
+                                              not isinstance(x, bool)), })
+            klass = extend(klass, type_checker=type_checker)
+
+        _validators[lean] = klass(magres_schema)
+
+    return _validators.get(lean)
+
+
+def tensor_name(tag):
+    """
+      The name of the tensor held by records of a magres block tag, or None if it isn't a tensor tag.
+    """
+
+    for prefix, name in [('ms', 'sigma'), ('efg', 'V'), ('isc', 'K')]:
+        if tag == prefix or tag.startswith(prefix + "_"):
+            return name
+
+    return None
+
+
+def check_structure(d, columns=None):
+    """
+      A fast check that the lattice, positions and tensors of a data dictionary have the right shapes and that
+      every tensor refers to an atom that exists. columns can hold :py:class:`magres.columnar.TensorColumns` for
+      tags whose records haven't been generated, which are checked directly from their arrays.
+    """
+
+    if numpy is None:
+        raise Exception("Numpy module required for structural validation")
+
+    def shape(xs, name, expected):
+        try:
+            arr = numpy.array(xs, dtype=object)
+        except (ValueError, TypeError):
+            raise InvalidMagres("%s are not numeric arrays" % name)
+
+        # Numbers only, as the schema has them, not strings, booleans or nested lists of the wrong depth
+        for kind in set(map(type, arr.ravel().tolist())):
+            if not issubclass(kind, numbers.Real) or issubclass(kind, bool):
+                raise InvalidMagres("%s are not numeric arrays" % name)
 
-def validate_magres(d):
-    # Only validate if we have the jsonschema module
-    if validate is not None:
-        validate(d, schema)
-    else:
+        if arr.shape[1:] != expected:
+            raise InvalidMagres("%s have shape %s, should be (N, %s)" %
+                                (name, arr.shape, ", ".join(map(str, expected))))
+
+    if not isinstance(d, dict) or 'atoms' not in d:
+        raise InvalidMagres("No atoms block")
+
+    atoms = d['atoms']
+
+    if 'lattice' in atoms:
+        if len(atoms['lattice']) > 1:
+            raise InvalidMagres("More than one lattice")
+
+        if atoms['lattice']:
+            shape(atoms['lattice'], "Lattice vectors", (3, 3))
+
+    try:
+        atom_keys = set((atom['label'], atom['index']) for atom in atoms.get('atom', []))
+        positions = [atom['position'] for atom in atoms.get('atom', [])]
+    except (KeyError, TypeError):
+        raise InvalidMagres("Atom records must have a label, index and position")
+
+    if positions:
+        shape(positions, "Atom positions", (3,))
+
+    def check_atoms(keys, tag):
+        missing = keys - atom_keys
+
+        if missing:
+            raise InvalidMagres("%s records refer to atoms that don't exist: %s" %
+                                (tag, ", ".join("%s %d" % key for key in sorted(missing))))
+
+    magres = d.get('magres', {})
+
+    if columns is None:
+        columns = {}
+
+    for tag in set(magres) | set(columns):
+        name = tensor_name(tag)
+
+        if name is None:
+            continue
+
+        if tag in columns:
+            col = columns[tag]
+
+            if col.tensors.shape[1:] != (3, 3):
+                raise InvalidMagres("%s tensors have shape %s, should be (N, 3, 3)" % (tag, col.tensors.shape))
+
+            # Check each distinct (label code, index) pair once
+            for j in range(col.num_atoms):
+                pairs = numpy.unique(numpy.stack([col.label_codes[:, j], col.indices[:, j]], axis=1), axis=0)
+                check_atoms(set((col.labels[code], int(index)) for code, index in pairs), tag)
+        else:
+            records = magres[tag]
+
+            try:
+                if records:
+                    shape([record[name] for record in records], "%s tensors" % tag, (3, 3))
+
+                refs = [record[atom] for record in records for atom in ['atom', 'atom1', 'atom2'] if atom in record]
+                check_atoms(set((ref['label'], ref['index']) for ref in refs), tag)
+            except (KeyError, TypeError):
+                raise InvalidMagres("%s records must have atom references and a %s tensor" % (tag, name))
+
+
+def validate_magres(d, mode='full', columns=None):
+    """
+      Validate a magres data dictionary.
+
+      mode is one of "off", "structural", which only runs :py:func:`check_structure`, or "full", which also
+      validates against the JSON schema if the jsonschema module is available. As check_structure has already
+      checked the numeric arrays, the full mode validates the rest against the lean schema.
+    """
+
+    if mode not in modes:
+        raise ValueError("Unknown validation mode \"%s\", should be one of %s" % (mode, ", ".join(modes)))
+
+    if mode == 'off':
         return
+
+    if numpy is not None:
+        check_structure(d, columns)
+
+    if mode == 'full':
+        validator = get_validator(lean=numpy is not None)
+
+        # Only validate against the schema if we have the jsonschema module
+        if validator is not None:
+            validator.validate(d)
@@ -0,0 +1,76 @@
+"""
+  magres.store keeps the atoms of a structure as arrays, one row per atom, so that geometry and NMR parameters can
+  be worked out for every atom at once. A :py:class:`magres.atom.MagresAtom` is a view of one row.
+
+  >>> store = AtomStore(magres_file.data_dict['atoms']['atom'])
+  >>> store.positions[store.species_codes == store.species.code('H')]
+"""
+import numpy
+from .columnar import LabelTable
+
+
+class AtomStore(object):
+    """
+      The atoms of a structure as arrays: positions, an (N, 3) array in Angstroms, species and label codes into
+      interned tables of species and labels, label indices and chemical shift references.
+
+      positions is read only, atoms are moved with set_position. The parsed records the atoms came from are kept
+      and changes are written through to them, so that a MagresFile the atoms were loaded from stays in step.
+      generation counts the moves, so that anything worked out from the positions knows when to work it out again,
+      and nmr_generation likewise counts changes of species, isotopes and coupling tensors.
+      owned is set once a MagresAtoms has taken the store for its atoms, after which its rows stay where they are.
+    """
+
+    __slots__ = ["records", "_positions", "positions", "species", "species_codes", "labels", "label_codes",
+                 "indices", "references", "generation", "nmr_generation", "owned"]
+
+    def __init__(self, records=()):
+        self.records = list(records)
+
+        self._positions = numpy.array([record['position'] for record in self.records], dtype=float).reshape(-1, 3)
+        self.positions = self._positions.view()
+        self.positions.flags.writeable = False
+
+        self.species = LabelTable()
+        self.species_codes = numpy.array([self.species.code(record['species']) for record in self.records],
+                                         dtype=numpy.int32)
+
+        self.labels = LabelTable()
+        self.label_codes = numpy.array([self.labels.code(record['label']) for record in self.records],
+                                       dtype=numpy.int32)
+
+        self.indices = numpy.array([record['index'] for record in self.records], dtype=int)
+        self.references = numpy.zeros(len(self.records))
+
+        self.generation = 0
+        self.nmr_generation = 0
+        self.owned = False
+
+    def __len__(self):
+        return len(self.records)
+
+    def __repr__(self):
+        return "<magres.store.AtomStore - {} atoms>".format(len(self))
+
+    def set_position(self, row, position):
+        self._positions[row] = position
+        self.records[row]['position'] = self._positions[row].tolist()
+        self.generation += 1
+
+    def set_species(self, row, species):
+        self.species_codes[row] = self.species.code(species)
+        self.records[row]['species'] = species
+        self.nmr_generation += 1
+
+    def set_label(self, row, label):
+        self.label_codes[row] = self.labels.code(label)
+        self.records[row]['label'] = label
+
+    def species_of(self, rows=None):
+        """
+          The species of the atoms in rows, or of every atom.
+        """
+
+        codes = self.species_codes if rows is None else self.species_codes[rows]
+
+        return [self.species[code] for code in codes.tolist()]
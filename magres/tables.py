@@ -0,0 +1,238 @@
+"""
+  magres.tables works out the NMR parameters of many atoms at once from their tensors stacked into (N, 3, 3) arrays,
+  with one batched eigendecomposition rather than one per atom. Each table holds arrays aligned with the atoms it
+  was made from, with NaN for atoms that have no tensor.
+
+  >>> table = atoms.ms_table()
+  >>> table.iso, table.span
+"""
+import numpy
+from . import constants
+
+
+def stack_tensors(tensors):
+    """
+      Stack a list of 3x3 tensors, or None for atoms without one, into an (N, 3, 3) array with NaN for the missing
+      ones.
+    """
+
+    stacked = numpy.full((len(tensors), 3, 3), numpy.nan)
+
+    for i, tensor in enumerate(tensors):
+        if tensor is not None:
+            stacked[i] = tensor
+
+    return stacked
+
+
+def sym_eigh(tensors):
+    """
+      The symmetric parts of an (N, 3, 3) array of tensors and their eigenvalues, in ascending order, and
+      eigenvectors, found with one batched eigh. Eigenvectors are returned as rows, evecs[i, k] belonging to
+      evals[i, k]. Tensors with NaNs give NaN eigenvalues and eigenvectors.
+    """
+
+    sym = (tensors + tensors.transpose(0, 2, 1)) / 2.0
+
+    evals = numpy.full(sym.shape[:2], numpy.nan)
+    evecs = numpy.full(sym.shape, numpy.nan)
+
+    finite = numpy.isfinite(sym).all(axis=(1, 2))
+
+    if finite.any():
+        evals[finite], vectors = numpy.linalg.eigh(sym[finite])
+        evecs[finite] = vectors.transpose(0, 2, 1)
+
+    return sym, evals, evecs
+
+
+def haeberlen_order(evals, centre):
+    """
+      The indices that order each row of an (N, 3) array of ascending eigenvalues by the Haeberlen convention, XX, YY
+      and ZZ with |ZZ - centre| >= |XX - centre| >= |YY - centre|. Ties keep the ascending order, as the properties
+      of a single tensor do.
+    """
+
+    order = numpy.argsort(numpy.abs(evals - centre[:, None]), axis=1, kind='mergesort')
+
+    return order[:, [1, 0, 2]]
+
+
+def take_rows(values, order):
+    """
+      Reorder the eigenvalues (N, 3) or eigenvectors (N, 3, 3) of each tensor by an (N, 3) array of indices.
+    """
+
+    rows = numpy.arange(len(order))[:, None]
+
+    return values[rows, order]
+
+
+def lookup(table, keys, default=0.0):
+    """
+      The values of a dictionary for a list of keys as an array, looking each distinct key up once, with default for
+      keys that aren't in it.
+    """
+
+    distinct = {}
+    codes = numpy.array([distinct.setdefault(key, len(distinct)) for key in keys], dtype=int)
+
+    values = numpy.zeros(len(distinct))
+
+    for key, code in distinct.items():
+        values[code] = table.get(key, default)
+
+    return values[codes]
+
+
+class MsTable(object):
+    """
+      The magnetic shielding parameters of N atoms from their (N, 3, 3) sigma tensors and chemical shift references,
+      as :py:class:`magres.ms.MagresAtomMs` computes them for one atom.
+
+      evals and evecs are ordered by the Haeberlen convention, evals_mehring and evecs_mehring by the Mehring one,
+      and evecs[i, k] is the eigenvector of evals[i, k].
+    """
+
+    __slots__ = ["sigma", "sym", "iso", "cs", "aniso", "zeta", "eta", "span", "skew", "evals", "evecs",
+                 "evals_mehring", "evecs_mehring"]
+
+    def __init__(self, sigma, references=0.0):
+        self.sigma = numpy.asarray(sigma, dtype=float).reshape(-1, 3, 3)
+
+        self.sym, self.evals_mehring, self.evecs_mehring = sym_eigh(self.sigma)
+        self.iso = numpy.trace(self.sigma, axis1=1, axis2=2) / 3.0
+        self.cs = references - self.iso
+
+        order = haeberlen_order(self.evals_mehring, self.iso)
+        self.evals = take_rows(self.evals_mehring, order)
+        self.evecs = take_rows(self.evecs_mehring, order)
+
+        xx, yy, zz = self.evals.T
+        s11, s22, s33 = self.evals_mehring.T
+
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            self.aniso = zz - (xx + yy) / 2.0
+            self.zeta = zz - self.iso
+            self.eta = (yy - xx) / self.zeta
+            self.span = s33 - s11
+            self.skew = 3.0 * (self.iso - s22) / self.span
+
+    def __len__(self):
+        return len(self.sigma)
+
+    def __repr__(self):
+        return "<magres.tables.MsTable - {} atoms>".format(len(self))
+
+
+class EfgTable(object):
+    """
+      The electric field gradient parameters of N atoms from their (N, 3, 3) V tensors in atomic units and their
+      quadrupole moments Q in millibarns, as :py:class:`magres.efg.MagresAtomEfg` computes them for one atom.
+
+      evals and evecs are ordered by the Haeberlen convention, |V_ZZ| >= |V_XX| >= |V_YY|, and evecs[i, k] is the
+      eigenvector of evals[i, k]. Vzz is evals[:, 2], Cq is in MHz.
+    """
+
+    __slots__ = ["V", "Q", "evals", "evecs", "Vzz", "eta", "Cq", "P_Q"]
+
+    def __init__(self, V, Q):
+        self.V = numpy.asarray(V, dtype=float).reshape(-1, 3, 3)
+        self.Q = numpy.asarray(Q, dtype=float)
+
+        sym, evals, evecs = sym_eigh(self.V)
+
+        order = haeberlen_order(evals, numpy.zeros(len(evals)))
+        self.evals = take_rows(evals, order)
+        self.evecs = take_rows(evecs, order)
+
+        xx, yy, self.Vzz = self.evals.T
+
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            self.eta = (yy - xx) / self.Vzz
+
+        self.Cq = self.Vzz * self.Q * constants.millibarn / constants.megahertz
+        self.P_Q = self.Cq * numpy.sqrt(1.0 + self.eta ** 2 / 3.0)
+
+    def __len__(self):
+        return len(self.V)
+
+    def __repr__(self):
+        return "<magres.tables.EfgTable - {} atoms>".format(len(self))
+
+
+class IscMatrix(object):
+    """
+      The couplings of one isc tag between N atoms, as P pairs of atom indices, atom1 perturbing and atom2
+      receiving, with their (P, 3, 3) K tensors and the gyromagnetic ratios of the isotopes of the two atoms.
+
+      pair finds the coupling between two atoms in O(1), and K_iso, J and J_iso are worked out for every pair at
+      once, NaN where an isotope's gyromagnetic ratio isn't known.
+
+      >>> matrix = atoms.isc_matrix('isc_fc')
+      >>> matrix.J_iso[matrix.pair(0, 6)]
+      >>> matrix.dense(matrix.J_iso)
+    """
+
+    __slots__ = ["num_atoms", "atom1", "atom2", "K", "K_iso", "J", "J_iso", "_index", "_keys", "_order", "_first"]
+
+    def __init__(self, num_atoms, atom1, atom2, K, gamma1, gamma2):
+        self.num_atoms = num_atoms
+        self.atom1 = numpy.asarray(atom1, dtype=int)
+        self.atom2 = numpy.asarray(atom2, dtype=int)
+        self.K = numpy.asarray(K, dtype=float).reshape(-1, 3, 3)
+
+        self.K_iso = numpy.trace(self.K, axis1=1, axis2=2) / 3.0
+
+        factor = numpy.asarray(gamma1) * numpy.asarray(gamma2) * constants.K_to_J_factor
+        self.J = (self.K + self.K.transpose(0, 2, 1)) / 2.0 * factor[:, None, None]
+        self.J_iso = self.K_iso * factor
+
+        keys = self.atom1 * num_atoms + self.atom2
+
+        self._order = numpy.argsort(keys, kind='mergesort')
+        self._keys = keys[self._order]
+
+        # The first of any repeated couplings, as the stable sort above puts first
+        unique, self._first = numpy.unique(keys, return_index=True)
+        self._index = dict(zip(unique.tolist(), self._first.tolist()))
+
+    def __len__(self):
+        return len(self.K)
+
+    def __repr__(self):
+        return "<magres.tables.IscMatrix - {} couplings between {} atoms>".format(len(self), self.num_atoms)
+
+    def pair(self, atom1, atom2):
+        """
+          The index of the coupling from atom1 to atom2. Raises KeyError if they aren't coupled.
+        """
+
+        return self._index[atom1 * self.num_atoms + atom2]
+
+    def pairs(self, atom1, atom2):
+        """
+          The indices of the couplings from each of an array of atoms atom1 to the atoms atom2, -1 where there's none.
+        """
+
+        keys = numpy.asarray(atom1, dtype=int) * self.num_atoms + numpy.asarray(atom2, dtype=int)
+
+        if not len(self._keys):
+            return numpy.full(keys.shape, -1, dtype=int)
+
+        found = numpy.minimum(numpy.searchsorted(self._keys, keys), len(self._keys) - 1)
+
+        return numpy.where(self._keys[found] == keys, self._order[found], -1)
+
+    def dense(self, values, fill=numpy.nan):
+        """
+          An (N, N) matrix of a value of each coupling, e.g. J_iso, indexed by perturbing then receiving atom, with fill
+          where atoms aren't coupled. Of repeated couplings the first is kept, as pair finds.
+        """
+
+        first = self._first
+
+        matrix = numpy.full((self.num_atoms, self.num_atoms), fill, dtype=float)
+        matrix[self.atom1[first], self.atom2[first]] = numpy.asarray(values)[first]
+
+        return matrix
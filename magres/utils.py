@@ -1,6 +1,6 @@
 import os
 import re
-from .format import BadVersion
+from .format import MagresFile, BadVersion, BadMagresFile, sniff, decompression_errors
 from .atoms import MagresAtoms
 
 
@@ -37,32 +37,56 @@ def find_all(dir, suffix=".cell"):
     return calcs
 
 
-def find_all_magres(dir):
+# Suffixes of the index and cache files kept alongside magres files
+sidecar_suffixes = (".idx", ".npz", ".tmp")
+
+
+def find_all_magres(dir, check=False):
     """
       Find all magres files starting in directory dir.
+
+      Compressed files such as ethanol.magres.gz are included. With check=True only files whose first line is the
+      version line of a magres format this parser understands are returned, see :py:func:`magres.format.sniff`.
     """
     calcs = []
     for f in os.listdir(dir):
         path = os.path.join(dir, f)
-        if ".magres" in f:
-            calcs.append(path)
+        if ".magres" in f and not f.endswith(sidecar_suffixes):
+            if not check or is_magres(path):
+                calcs.append(path)
         elif os.path.isdir(path):
-            calcs += find_all_magres(path)
+            calcs += find_all_magres(path, check)
 
     return calcs
 
 
-def load_all_magres(dir):
+def is_magres(path):
+    """
+      Whether a file is a magres file this parser understands, reading only its first few bytes.
+    """
+
+    try:
+        kind, version = sniff(path, decompress=True)
+    except decompression_errors + (BadMagresFile,):
+        return False
+
+    return kind == 'magres' and version[0] == MagresFile.version[0]
+
+
+def load_all_magres(dir, cache=False):
     """
       Find all magres files starting in directory dir and load them into a :py:class:`magres.atoms.MagresAtoms`
       structure. Returns a list.
+
+      With cache=True each file is loaded through its binary sidecar, which is written on the first load. Files that
+      turn out to be truncated or corrupt past the first few bytes checked by :py:func:`is_magres` are left out.
     """
 
     atoms = []
-    for magres_file in find_all_magres(dir):
+    for magres_file in find_all_magres(dir, check=True):
         try:
-            atoms.append(MagresAtoms.load_magres(magres_file))
-        except BadVersion:
+            atoms.append(MagresAtoms.load_magres(magres_file, cache=cache))
+        except (BadVersion,) + decompression_errors:
             pass
 
     return atoms
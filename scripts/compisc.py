@@ -7,7 +7,7 @@ from magres.atoms import MagresAtoms
 from magres.utils import find_all_magres
 
 magres_files = []
-for f in find_all_magres(sys.argv[1]):
+for f in find_all_magres(sys.argv[1], check=True):
     try:
         magres_files.append(MagresFile(f))
     except BadVersion:
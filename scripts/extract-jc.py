@@ -7,6 +7,7 @@ from __future__ import print_function
 import os, os.path
 import sys
 import argparse
+import numpy
 from magres.atoms import MagresAtoms
 from magres.utils import load_all_magres, get_numeric, parse_atom_list
 
@@ -69,17 +70,31 @@ for i, atoms in enumerate(magres_atoms):
     else:
         idx = [i]
 
-    for isc in atoms.isc.perturbing(atoms1_filter).receiving(atoms2_filter):
-        atom1 = isc.atom1
-        atom2 = isc.atom2
+    iscs = list(atoms.isc.perturbing(atoms1_filter).receiving(atoms2_filter))
+
+    rows1 = atoms.rows([isc.atom1 for isc in iscs])
+    rows2 = atoms.rows([isc.atom2 for isc in iscs])
+
+    # The minimum image distances of every coupling at once
+    dists = atoms.distances(numpy.stack([rows1, rows2], axis=1))
 
-        sort_val = abs(getattr(isc, property))
+    # The value of every coupling for each tensor, NaN where a tensor doesn't have the coupling
+    values = []
 
-        all_tensors = [getattr(atoms, tensor).perturbing(atom1).receiving(atom2)[0] for tensor in tensors]
+    for tensor in tensors:
+        matrix = atoms.isc_matrix(tensor)
+        pairs = matrix.pairs(rows1, rows2)
+
+        values.append(numpy.where(pairs >= 0, getattr(matrix, property)[pairs], numpy.nan) if len(matrix)
+                      else numpy.full(len(iscs), numpy.nan))
+
+    for k, (isc, dist) in enumerate(zip(iscs, dists)):
+        atom1 = isc.atom1
+        atom2 = isc.atom2
 
-        tensor_strs = ["{:.3f}".format(getattr(isc_, property)) for isc_ in all_tensors]
+        sort_val = abs(values[0][k])
 
-        dist, _ = atoms.least_mirror(atom2.position, atom1.position)
+        tensor_strs = ["{:.3f}".format(tensor_values[k]) for tensor_values in values]
 
         lines.append((idx,
                       atoms.magres_file.path,
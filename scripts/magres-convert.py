@@ -6,6 +6,7 @@ import re
 import math
 import numpy
 from magres.oldmagres import OldMagres
+from magres.format import open_magres
 
 if __name__ == "__main__":
     magres_file = None
@@ -13,14 +14,14 @@ if __name__ == "__main__":
 
     if len(sys.argv) >= 2:
         try:
-            magres_file = open(sys.argv[1]).read()
+            magres_file = open_magres(sys.argv[1]).read()
         except IOError:
             print("Could not load magres file '%s'" % sys.argv[1], file=sys.stderr)
             sys.exit(1)
 
     if len(sys.argv) >= 3:
         try:
-            castep_file = open(sys.argv[2]).read()
+            castep_file = open_magres(sys.argv[2]).read()
         except IOError:
             print("Could not load castep output file '%s'" % sys.argv[2], file=sys.stderr)
             sys.exit(1)
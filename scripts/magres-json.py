@@ -1,9 +1,19 @@
 #!python
 from __future__ import print_function
 import sys
+import argparse
 import magres.format
 
+parser = argparse.ArgumentParser(description='Convert a magres file to json.')
+parser.add_argument('-c', '--compact', action="store_const",
+                    help="Encode the tensors of each tag as flat lists with a shape header.",
+                    default=False, const=True)
+parser.add_argument('source', help='Magres file to convert.')
+
 if __name__ == "__main__":
-    magres_file = magres.format.MagresFile(open(sys.argv[1]))
+    a = parser.parse_args(sys.argv[1:])
+
+    magres_file = magres.format.MagresFile(open(a.source))
 
-    print(magres_file.as_json())
+    magres_file.write_json(sys.stdout, a.compact)
+    print()
@@ -10,8 +10,8 @@ from magres.format import MagresFile
 if __name__ == "__main__":
     magres_file_paths = sys.argv[1:]
 
-    magres_files = [MagresFile(magres_file_path) for magres_file_path in magres_file_paths]
+    # Parse the files in parallel, one process per CPU
+    merged_magres_file = MagresFile.merge(magres_file_paths, processes=None)
 
-    merged_magres_file = MagresFile.merge(magres_files)
-
-    print(str(merged_magres_file))
+    merged_magres_file.write(sys.stdout)
+    print()
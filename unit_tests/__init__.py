@@ -5,5 +5,13 @@ from .test_isc import *
 from .test_efg import *
 from .test_ms import *
 from .test_angles import *
+from .test_columnar import *
+from .test_index import *
 
 
+from .test_cache import *
+from .test_merge import *
+from .test_bench import *
+from .test_neighbours import *
+from .test_lattice import *
+from .test_store import *
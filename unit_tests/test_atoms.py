@@ -3,6 +3,7 @@ import numpy
 import unittest
 import os
 from magres.format import MagresFile
+from magres.atom import MagresAtom
 from magres.atoms import MagresAtoms
 
 DATA_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), "test_data")
@@ -67,6 +68,61 @@ class AtomsTest(unittest.TestCase):
         self.assertEqual(len(atoms.species('H')), 1)
         self.assertEqual(len(atoms.species('C')), 2)
 
+    def test_distances(self):
+        atoms = MagresAtoms.load_magres(os.path.join(DATA_DIR, "ethanol-all.magres"))
+
+        D, V = atoms.distance_matrix(vectors=True)
+
+        self.assertEqual(D.shape, (len(atoms), len(atoms)))
+        self.assertEqual(V.shape, (len(atoms), len(atoms), 3))
+        self.assertTrue(numpy.allclose(D, D.T))
+        self.assertTrue(numpy.allclose(numpy.diag(D), 0.0))
+
+        for i, atom1 in enumerate(atoms):
+            for j, atom2 in enumerate(atoms):
+                dist, image = atoms.least_mirror(atom2.position, atom1.position)
+
+                self.assertAlmostEqual(D[i, j], dist)
+                self.assertAlmostEqual(D[i, j], numpy.linalg.norm(V[i, j]))
+
+        pairs = [[0, 6], [6, 7], [8, 5]]
+        dist, dr = atoms.distances(pairs, vectors=True)
+
+        self.assertTrue(numpy.allclose(dist, [D[i, j] for i, j in pairs]))
+        self.assertTrue(numpy.allclose(dr, [V[i, j] for i, j in pairs]))
+
+        # Small tiles give the same result
+        atoms.max_tile_pairs = 5
+        self.assertTrue(numpy.allclose(atoms.distance_matrix(), D))
+        self.assertTrue(numpy.allclose(atoms.distances(pairs), dist))
+
+        self.assertEqual(atoms.rows([atoms.C2, atoms.H1]).tolist(), [7, 0])
+
+    def test_angles(self):
+        atoms = MagresAtoms.load_magres(os.path.join(DATA_DIR, "ethanol-all.magres"))
+
+        n = len(atoms)
+        triples = [[i, j, k] for i in range(n) for j in range(n) for k in range(n) if len(set([i, j, k])) == 3]
+        quads = [[i, j, k, l] for i, j, k in triples for l in range(n) if l not in (j, k)]
+
+        angles = atoms.angles(triples)
+        dihedrals = atoms.dihedrals(quads, degrees=True)
+
+        self.assertEqual(angles.shape, (len(triples),))
+
+        for (i, j, k), angle in zip(triples, angles):
+            self.assertAlmostEqual(angle, atoms.angle(atoms[i], atoms[j], atoms[k]))
+
+        for (i, j, k, l), dihedral in zip(quads, dihedrals):
+            self.assertAlmostEqual(dihedral, atoms.dihedral(atoms[i], atoms[j], atoms[k], atoms[l], degrees=True))
+
+        # Across the boundary of the cell
+        magres_atoms = [{'species': 'H', 'label': 'H', 'index': i + 1, 'position': p}
+                        for i, p in enumerate([[2.9, 0.0, 0.0], [0.2, 0.0, 0.0], [0.2, 1.0, 0.0]])]
+        atoms = MagresAtoms([MagresAtom(a) for a in magres_atoms], numpy.eye(3) * 3.0)
+
+        self.assertTrue(numpy.allclose(atoms.angles([[1, 0, 2]]), [math.atan2(1.0, 0.3)]))
+
     def test_labels(self):
         atoms = MagresAtoms.load_magres(self.species)
 
@@ -0,0 +1,25 @@
+import unittest
+from magres.format import MagresFile
+from magres.bench import synthetic_magres, run, benchmarks
+
+
+class BenchTest(unittest.TestCase):
+    def test_synthetic(self):
+        f = MagresFile(synthetic_magres(50, isc_sites=2))
+
+        self.assertEqual(len(f.data_dict['atoms']['atom']), 50)
+        self.assertEqual(len(f.data_dict['magres']['ms']), 50)
+        self.assertEqual(len(f.data_dict['magres']['isc_fc']), 100)
+
+    def test_run(self):
+        results = run(sizes=[10], isc_sites=2, samples=None, min_time=0.0)
+
+        self.assertEqual([result['benchmark'] for result in results], [name for name, fn in benchmarks])
+
+        for result in results:
+            self.assertTrue(result['ops_per_s'] > 0)
+            self.assertEqual(result['atoms'], 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
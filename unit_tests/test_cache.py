@@ -0,0 +1,91 @@
+import os
+import shutil
+import tempfile
+import unittest
+from magres import cache
+from magres.format import MagresFile
+from magres.atoms import MagresAtoms
+from magres.cache import read_cache, cache_path
+from magres.utils import find_all_magres, load_all_magres
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), "test_data")
+
+
+class CacheTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, "ethanol-all.magres")
+        shutil.copy(os.path.join(DATA_DIR, "ethanol-all.magres"), self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_load_cached(self):
+        f = MagresFile(self.path)
+
+        self.assertEqual(read_cache(self.path), None)
+
+        for backend in MagresFile.backends:
+            cached = MagresFile.load_cached(self.path, backend=backend)
+
+            self.assertTrue(os.path.isfile(cache_path(self.path)))
+            self.assertEqual(cached.data_dict, f.data_dict)
+
+            cached = read_cache(self.path, backend=backend)
+
+            self.assertEqual(cached.backend, backend)
+            self.assertEqual(cached.data_dict, f.data_dict)
+            self.assertEqual(str(cached), str(f))
+
+        # Records loaded through the sidecar have their own atom references, as parsed ones do
+        cached = MagresFile.load_cached(self.path)
+        isc = cached.data_dict['magres']['isc']
+        same_atom = [record for record in isc if record['atom1'] == isc[0]['atom1']]
+
+        self.assertTrue(len(same_atom) > 1)
+
+        isc[0]['atom1']['index'] = 99
+        self.assertFalse(any(record['atom1']['index'] == 99 for record in same_atom[1:]))
+
+    def test_invalidation(self):
+        MagresFile.load_cached(self.path)
+
+        # Touching the file leaves the contents, and so the sidecar, valid
+        mtime = os.stat(self.path).st_mtime + 10.0
+        os.utime(self.path, (mtime, mtime))
+        self.assertTrue(read_cache(self.path) is not None)
+
+        # and the sidecar keeps the new mtime, so the file isn't hashed again
+        file_hash = cache.file_hash
+
+        def no_hash(path):
+            raise RuntimeError("hashed %s" % path)
+
+        cache.file_hash = no_hash
+
+        try:
+            self.assertTrue(read_cache(self.path) is not None)
+        finally:
+            cache.file_hash = file_hash
+
+        with open(self.path, 'a') as f:
+            f.write("\n")
+
+        self.assertEqual(read_cache(self.path), None)
+
+    def test_atoms(self):
+        atoms = MagresAtoms.load_magres(self.path)
+        cached_atoms = MagresAtoms.load_magres(self.path, cache=True)
+        cached_atoms = MagresAtoms.load_magres(self.path, cache=True)
+
+        self.assertEqual(len(cached_atoms), len(atoms))
+        self.assertEqual(list(cached_atoms.ms.iso), list(atoms.ms.iso))
+        self.assertEqual(list(cached_atoms.efg.Cq), list(atoms.efg.Cq))
+
+        # Sidecars aren't picked up as magres files
+        self.assertEqual(find_all_magres(self.tmp_dir), [self.path])
+        self.assertEqual(len(load_all_magres(self.tmp_dir, cache=True)), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
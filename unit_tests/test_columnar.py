@@ -0,0 +1,140 @@
+import numpy
+import unittest
+import os
+from magres.format import MagresFile, iter_blocks
+from magres.atoms import MagresAtoms
+from magres import columnar
+from magres.columnar import LabelTable, parse_magres_block_parallel
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), "test_data")
+
+
+class ColumnarTest(unittest.TestCase):
+    def test_columns(self):
+        f = MagresFile(os.path.join(DATA_DIR, "ethanol-isc.magres"), backend="columnar")
+
+        columns = f.columns['magres']
+
+        self.assertEqual(columns['isc'].tensors.shape, (9, 3, 3))
+        self.assertEqual(columns['isc'].tensors.dtype, numpy.float64)
+        self.assertEqual(columns['isc'].indices.dtype, numpy.int32)
+        self.assertEqual(columns['isc'].label_codes.shape, (9, 2))
+
+        # Labels are interned across all tags
+        self.assertTrue(columns['isc_fc'].labels is columns['isc'].labels)
+
+        # Nothing has been turned into records yet
+        self.assertFalse(f.data_dict['magres'].is_loaded('isc'))
+
+    def test_data_dict(self):
+        for path in [os.path.join(DATA_DIR, "ethanol-isc.magres"), os.path.join(DATA_DIR, "ethanol-all.magres")]:
+            f1 = MagresFile(path)
+            f2 = MagresFile(path, backend="columnar")
+
+            self.assertEqual(f1.data_dict, f2.data_dict)
+            self.assertEqual(str(f1), str(f2))
+            self.assertEqual(f1.as_json(), MagresFile(path, backend="columnar").as_json())
+
+    def test_atoms(self):
+        path = os.path.join(DATA_DIR, "ethanol-isc.magres")
+
+        atoms1 = MagresAtoms.load_magres(MagresFile(path))
+        atoms2 = MagresAtoms.load_magres(MagresFile(path, backend="columnar"))
+
+        self.assertEqual(list(atoms1.ms.iso), list(atoms2.ms.iso))
+        self.assertEqual(list(atoms1.isc.K_iso), list(atoms2.isc.K_iso))
+
+    def test_parallel(self):
+        path = os.path.join(DATA_DIR, "ethanol-all.magres")
+        f = MagresFile(path)
+
+        with open(path) as fp:
+            block_lines = dict((name, list(lines)) for name, lines in iter_blocks(fp))['magres']
+
+        # Small chunks, so that the labels of every chunk have to be remapped
+        labels = LabelTable(['O'])
+        columns = parse_magres_block_parallel(block_lines, labels, processes=2, chunk_size=5)
+
+        self.assertEqual(columns['units'], f.data_dict['magres']['units'])
+
+        for tag in ['ms', 'efg', 'isc']:
+            self.assertTrue(columns[tag].labels is labels)
+            self.assertEqual(columns[tag].to_records(), f.data_dict['magres'][tag])
+
+        self.assertEqual(MagresFile(path, backend="columnar", processes=2).data_dict, f.data_dict)
+
+        with self.assertRaises(ValueError):
+            MagresFile(path, processes=2)
+
+        # None is one process per CPU, and only left out is the default of 1
+        self.assertEqual(MagresFile(path, backend="columnar", processes=None).processes, None)
+        self.assertEqual(MagresFile(path, backend="columnar").processes, 1)
+
+        with self.assertRaises(ValueError):
+            MagresFile(path, processes=None)
+
+        # Tags are picked out serially, so they can't be asked for with several processes
+        for processes in [2, None]:
+            with self.assertRaises(ValueError):
+                MagresFile(path, backend="columnar", processes=processes, tags=['ms'])
+
+        # The chunk size is read when parsing, so that changing it splits the block into chunks for a pool
+        def no_pool(processes):
+            raise RuntimeError("pool")
+
+        chunk_size, pool = columnar.parallel_chunk_size, columnar.Pool
+
+        try:
+            columnar.parallel_chunk_size = 5
+            columnar.Pool = no_pool
+
+            with self.assertRaises(RuntimeError):
+                parse_magres_block_parallel(block_lines, LabelTable(), processes=2)
+        finally:
+            columnar.parallel_chunk_size, columnar.Pool = chunk_size, pool
+
+    def test_atom_ids(self):
+        path = os.path.join(DATA_DIR, "ethanol-all.magres")
+
+        f1 = MagresFile(path)
+        f2 = MagresFile(path, backend="columnar")
+
+        atoms = f1.data_dict['atoms']['atom']
+
+        for tag in ['ms', 'efg', 'isc']:
+            ids = f1.atom_ids(tag)
+
+            self.assertEqual(ids.tolist(), f2.atom_ids(tag).tolist())
+            self.assertEqual(ids.tolist(), f1.atom_ids(tag, f1.atom_rows()).tolist())
+
+            names = ['atom'] if tag != 'isc' else ['atom1', 'atom2']
+
+            for record, row in zip(f1.data_dict['magres'][tag], ids):
+                for name, i in zip(names, row):
+                    self.assertEqual((atoms[i]['label'], atoms[i]['index']),
+                                     (record[name]['label'], record[name]['index']))
+
+        # Parsed records have their own references, so that changing one leaves the others alone
+        isc = f1.data_dict['magres']['isc']
+        self.assertFalse(isc[0]['atom1'] is isc[1]['atom1'])
+        self.assertTrue(isc[0]['atom1']['label'] is isc[1]['atom1']['label'])
+
+        isc[0]['atom1']['index'] = 99
+        self.assertEqual(isc[1]['atom1']['index'], f2.data_dict['magres']['isc'][1]['atom1']['index'])
+
+        # while the records built from columns share them
+        isc = f2.data_dict['magres']['isc']
+        self.assertTrue(isc[0]['atom1'] is isc[1]['atom1'])
+
+        del f2.data_dict['atoms']['atom'][0]
+
+        with self.assertRaises(KeyError):
+            f2.atom_ids('ms')
+
+    def test_bad_backend(self):
+        with self.assertRaises(ValueError):
+            MagresFile(os.path.join(DATA_DIR, "ethanol-isc.magres"), backend="sqlite")
+
+
+if __name__ == "__main__":
+    unittest.main()
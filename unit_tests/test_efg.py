@@ -4,6 +4,7 @@ import unittest
 import os
 from magres.format import MagresFile
 from magres.atoms import MagresAtoms
+from magres import constants
 
 DATA_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), "test_data")
 
@@ -51,6 +52,42 @@ class MagresEfgTest(unittest.TestCase):
 
         self.assertEqual(atoms.C1.efg.Cq, orig_Cq * 2.0)
 
+        # Cached eigenvalues are forgotten when V is set
+        evals = atoms.C1.efg.evals
+        atoms.C1.efg.V = new_V * 2.0
+
+        self.assertTrue(numpy.allclose(atoms.C1.efg.evals, numpy.multiply(evals, 2.0)))
+
+        for ev, evec in zip(atoms.C1.efg.evals, atoms.C1.efg.evecs):
+            self.assertTrue(numpy.allclose(numpy.dot(atoms.C1.efg.V, evec), ev * evec))
+
+    def test_efg_table(self):
+        atoms = MagresAtoms.load_magres(os.path.join(DATA_DIR, "ethanol/ethanol-nmr.magres"))
+
+        # Deuterium has a quadrupole moment, 1H doesn't
+        atoms.H1.isotope = 2
+
+        table = atoms.efg_table()
+
+        self.assertEqual(len(table), len(atoms))
+
+        for i, atom in enumerate(atoms):
+            efg = atom.efg
+
+            self.assertAlmostEqual(table.Cq[i], efg.Cq)
+            self.assertAlmostEqual(table.eta[i], efg.eta)
+            self.assertAlmostEqual(table.P_Q[i], efg.P_Q)
+            self.assertAlmostEqual(table.Vzz[i], efg.evals[2])
+            self.assertAlmostEqual(table.Cq[i], constants.efg_to_Cq_isotope(efg.V, atom.species, atom.isotope)
+                                   if (atom.species, atom.isotope) in constants.Q else 0.0)
+            self.assertTrue(numpy.allclose(table.evecs[i], efg.evecs))
+
+        self.assertNotEqual(table.Cq[0], 0.0)
+        self.assertEqual(table.Cq[1], 0.0)
+
+        table = atoms.efg_table('efg_local')
+        self.assertTrue(numpy.isnan(table.Cq).all())
+
 
 if __name__ == "__main__":
     unittest.main()
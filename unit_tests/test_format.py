@@ -1,11 +1,19 @@
 import unittest
-from magres.format import MagresFile, BadVersion
+from magres.format import MagresFile, BadVersion, BadMagresFile, tokenize, iter_records, sniff, iter_magres_block_lines
+import io
+import gzip
+import bz2
+import lzma
+import shutil
+import tempfile
 import math
 import numpy
 import unittest
 import os
 from magres.format import MagresFile
+from magres.schema.validate import InvalidMagres, get_validator
 from magres.atoms import MagresAtoms
+from magres.utils import find_all_magres, load_all_magres
 
 DATA_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), "test_data")
 
@@ -67,6 +75,261 @@ class FormatTest(unittest.TestCase):
 
         self.assertEqual(f1.data_dict, f2.data_dict)
 
+    def test_json_compact(self):
+        path = os.path.join(DATA_DIR, "ethanol-isc.magres")
+        f = MagresFile(path)
+
+        for backend in MagresFile.backends:
+            f1 = MagresFile(path, backend=backend)
+
+            for compact in [False, True]:
+                json = f1.as_json(compact)
+
+                out = io.StringIO()
+                f1.write_json(out, compact)
+                self.assertEqual(out.getvalue(), json)
+
+                for backend2 in MagresFile.backends:
+                    f2 = MagresFile.load_json(json, backend=backend2, validation="off")
+
+                    self.assertEqual(f2.data_dict, f.data_dict)
+                    self.assertEqual(str(f2), str(f))
+
+        compact = MagresFile.load_json(f.as_json(compact=True), validation="off").json_dict(True)['magres']['isc']
+
+        self.assertEqual(compact['shape'], [len(f.data_dict['magres']['isc']), 3, 3])
+        self.assertEqual(len(compact['tensors']), 9 * compact['shape'][0])
+        self.assertEqual(len(compact['labels']), 2 * compact['shape'][0])
+
+    def test_json_numpy(self):
+        f = MagresFile(os.path.join(DATA_DIR, "ethanol-all.magres"))
+        atoms = MagresAtoms(f)
+
+        for atom in atoms:
+            atom.ms.sigma = atom.ms.sigma * 2
+
+        self.assertTrue(isinstance(f.data_dict['magres']['ms'][0]['sigma'], numpy.ndarray))
+
+        f2 = MagresFile.load_json(f.as_json())
+
+        self.assertEqual(f2.data_dict['magres']['ms'][0]['sigma'], f.data_dict['magres']['ms'][0]['sigma'].tolist())
+
+    def test_tokenize(self):
+        lines = ["#$magres-abinitio-v1.0",
+                 "[atoms]",
+                 "  units atom Angstrom # a comment",
+                 "  atom H H 1 0.0 0.0 0.0",
+                 "[/atoms]",
+                 "<magres>",
+                 "</magres>"]
+
+        records = list(tokenize(lines))
+
+        self.assertEqual(records, [("atoms", "units", ["atom", "Angstrom"]),
+                                   ("atoms", "atom", ["H", "H", "1", "0.0", "0.0", "0.0"])])
+
+        with self.assertRaises(BadMagresFile):
+            list(tokenize(lines[:4]))
+
+    def test_parse_lines(self):
+        path = os.path.join(DATA_DIR, "ethanol", "ethanol-nmr.magres")
+
+        f1 = MagresFile(open(path))
+        f2 = MagresFile(open(path).read())
+        f3 = MagresFile(path)
+
+        self.assertEqual(f1.data_dict, f2.data_dict)
+        self.assertEqual(f1.data_dict, f3.data_dict)
+
+    def test_selective(self):
+        path = os.path.join(DATA_DIR, "ethanol-isc.magres")
+
+        f1 = MagresFile(path)
+        f2 = MagresFile(path, blocks=['atoms', 'magres'], tags=['isc'])
+
+        self.assertTrue(f2.data_dict['magres'].is_loaded('isc'))
+        self.assertFalse(f2.data_dict['magres'].is_loaded('isc_fc'))
+        self.assertFalse(f2.data_dict.is_loaded('calculation'))
+
+        atoms = MagresAtoms.load_magres(f2)
+
+        self.assertTrue(hasattr(atoms.C2, "isc"))
+        self.assertFalse(hasattr(atoms.C2, "isc_fc"))
+
+        # Everything else is parsed when it's accessed
+        self.assertEqual(f1.data_dict['magres']['isc_fc'], f2.data_dict['magres']['isc_fc'])
+        self.assertEqual(f1.data_dict, f2.data_dict)
+
+    def test_iter_records(self):
+        path = os.path.join(DATA_DIR, "ethanol-all.magres")
+
+        f = MagresFile(path)
+
+        records = {}
+
+        for record in iter_records(open(path)):
+            records.setdefault(record.block, {}).setdefault(record.tag, []).append(record.data)
+
+        self.assertEqual(records, f.data_dict)
+
+        isc = list(iter_records(path, tags=['isc']))
+
+        self.assertEqual([record.data for record in isc], f.data_dict['magres']['isc'])
+
+        with self.assertRaises(BadVersion):
+            list(iter_records(os.path.join(DATA_DIR, "noversion.magres")))
+
+    def test_write(self):
+        path = os.path.join(DATA_DIR, "ethanol-all.magres")
+
+        for backend in MagresFile.backends:
+            f = MagresFile(path, backend=backend)
+
+            out = io.StringIO()
+            f.write(out, chunk_size=10)
+
+            self.assertEqual(out.getvalue(), str(f))
+
+            # Records formatted a few at a time give the same lines
+            for precision in [None, 4]:
+                data, columns = f.data_dict['magres'], f.columns.get('magres')
+
+                lines = list(iter_magres_block_lines(data, precision, columns))
+                chunked = iter_magres_block_lines(data, precision, columns, chunk_size=4)
+
+                self.assertEqual(list(chunked), lines)
+
+            out = io.StringIO()
+            f.write(out, precision=4)
+
+            f2 = MagresFile(out.getvalue())
+
+            self.assertTrue("  ms H 1 3.0298E+01 " in out.getvalue())
+            self.assertTrue(numpy.allclose(f2.data_dict['magres']['ms'][0]['sigma'],
+                                           f.data_dict['magres']['ms'][0]['sigma'], rtol=1e-4))
+
+    def test_validation(self):
+        path = os.path.join(DATA_DIR, "ethanol-all.magres")
+
+        with open(path) as f:
+            text = f.read()
+
+        self.assertTrue(get_validator() is get_validator())
+        self.assertTrue(get_validator(lean=True) is get_validator(lean=True))
+
+        for backend in MagresFile.backends:
+            for mode in ['off', 'structural', 'full']:
+                f = MagresFile(path, backend=backend, validation=mode)
+                f.validate()
+
+        self.assertRaises(ValueError, MagresFile, path, validation="thorough")
+
+        # A tensor referring to an atom that doesn't exist
+        bad = text.replace("  ms H 1 ", "  ms H 99 ", 1)
+
+        for backend in MagresFile.backends:
+            self.assertRaises(InvalidMagres, MagresFile, bad, backend=backend, validation="structural")
+            self.assertRaises(InvalidMagres, MagresFile, bad, backend=backend)
+
+            f = MagresFile(bad, backend=backend, validation="off")
+            self.assertRaises(InvalidMagres, f.validate, "structural")
+
+        # Bad lattice shape
+        f = MagresFile(path)
+        f.data_dict['atoms']['lattice'] = [[[1.0, 0.0], [0.0, 1.0]]]
+
+        self.assertRaises(InvalidMagres, f.validate, "structural")
+
+        # Tensors and positions that aren't numbers, which the full mode checks as arrays rather than by the schema
+        f = MagresFile(path)
+        f.data_dict['magres']['ms'][0]['sigma'][0][0] = "1.0"
+
+        self.assertRaises(InvalidMagres, f.validate, "full")
+
+        f = MagresFile(path)
+        f.data_dict['atoms']['atom'][0]['position'] = [True, 0.0, 0.0]
+
+        self.assertRaises(InvalidMagres, f.validate, "full")
+
+    def test_sniff(self):
+        self.assertEqual(sniff(os.path.join(DATA_DIR, "ethanol-all.magres")), ('magres', (1, 0)))
+        self.assertEqual(sniff(os.path.join(DATA_DIR, "badversion.magres")), ('magres', (2, 0)))
+        self.assertEqual(sniff(os.path.join(DATA_DIR, "noversion.magres")), (None, None))
+
+        tmp_dir = tempfile.mkdtemp()
+
+        try:
+            f = MagresFile(os.path.join(DATA_DIR, "ethanol-all.magres"))
+
+            with open(os.path.join(tmp_dir, "ethanol.magres.json"), 'w') as out:
+                out.write(f.as_json())
+
+            with gzip.open(os.path.join(tmp_dir, "ethanol.magres.gz"), 'wt') as out:
+                out.write(str(f))
+
+            with open(os.path.join(tmp_dir, "old.magres"), 'w') as out:
+                out.write("\n =====\n Atom: H        1\n =====\n H        1 Shielding Tensor\n")
+
+            shutil.copy(os.path.join(DATA_DIR, "ethanol-all.magres"), tmp_dir)
+            shutil.copy(os.path.join(DATA_DIR, "badversion.magres"), tmp_dir)
+
+            self.assertEqual(sniff(os.path.join(tmp_dir, "ethanol.magres.json")), ('json', None))
+            self.assertEqual(sniff(os.path.join(tmp_dir, "ethanol.magres.gz")), ('gzip', None))
+            self.assertEqual(sniff(os.path.join(tmp_dir, "old.magres")), ('oldmagres', None))
+
+            self.assertEqual(len(find_all_magres(tmp_dir)), 5)
+            self.assertEqual(sorted(find_all_magres(tmp_dir, check=True)),
+                             [os.path.join(tmp_dir, "ethanol-all.magres"), os.path.join(tmp_dir, "ethanol.magres.gz")])
+        finally:
+            shutil.rmtree(tmp_dir)
+
+    def test_compressed(self):
+        path = os.path.join(DATA_DIR, "ethanol-all.magres")
+        f = MagresFile(path)
+
+        with open(path, 'rb') as fp:
+            contents = fp.read()
+
+        tmp_dir = tempfile.mkdtemp()
+
+        try:
+            # The compression is recognised from the contents, whatever the file is called
+            for name, compress in [("ethanol.magres.gz", gzip.compress), ("ethanol.magres.bz2", bz2.compress),
+                                   ("ethanol.compressed.magres", gzip.compress)]:
+                with open(os.path.join(tmp_dir, name), 'wb') as out:
+                    out.write(compress(contents))
+
+            for name in sorted(os.listdir(tmp_dir)):
+                compressed_path = os.path.join(tmp_dir, name)
+
+                self.assertEqual(MagresFile(compressed_path).data_dict, f.data_dict)
+                self.assertEqual(len(MagresAtoms.load_magres(compressed_path)), len(f.data_dict['atoms']['atom']))
+                self.assertEqual(sniff(compressed_path, decompress=True), ('magres', (1, 0)))
+                self.assertEqual([record.data for record in iter_records(compressed_path, tags=['ms'])],
+                                 f.data_dict['magres']['ms'])
+
+            self.assertEqual(len(find_all_magres(tmp_dir, check=True)), 3)
+
+            # A file truncated after its first few bytes looks like a magres file, but is left out when loading
+            with open(os.path.join(tmp_dir, "truncated.magres.gz"), 'wb') as out:
+                out.write(gzip.compress(contents)[:-20])
+
+            self.assertEqual(len(find_all_magres(tmp_dir, check=True)), 4)
+            self.assertEqual(len(load_all_magres(tmp_dir)), 3)
+
+            # Corrupt and truncated files are left out rather than stopping the search
+            xz = lzma.compress(contents)
+
+            for name, data in [("corrupt.magres.gz", gzip.compress(contents)[:10] + b"\xff" * 64),
+                               ("corrupt.magres.xz", xz[:12] + b"\xff" * 64),
+                               ("truncated.magres.xz", xz[:40])]:
+                with open(os.path.join(tmp_dir, name), 'wb') as out:
+                    out.write(data)
+
+            self.assertEqual(len(find_all_magres(tmp_dir, check=True)), 4)
+        finally:
+            shutil.rmtree(tmp_dir)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -28,7 +28,8 @@ class GettingStartedTest(unittest.TestCase):
         self.assertEqual(len(atoms.species('H').ms.iso), 6)
 
         self.assertAlmostEqual(mean(atoms.C1.bonded.species('H').ms.iso), 29.9838078506)
-        self.assertAlmostEqual(mean(atoms.C2.bonded.species('H').ms.iso), 28.7851386496)
+        # C2 is bonded to H4 and H5, but not the hydroxyl H6 1.95 Angstroms away
+        self.assertAlmostEqual(mean(atoms.C2.bonded.species('H').ms.iso), 27.1852200996)
         self.assertAlmostEqual(mean(atoms.O1.bonded.species('H').ms.iso), 31.9849757497)
 
         self.assertEqual(atoms.C1.ms.sigma.shape, (3, 3))
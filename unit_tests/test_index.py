@@ -0,0 +1,72 @@
+import os
+import shutil
+import tempfile
+import gzip
+import unittest
+from magres.format import MagresFile, BadMagresFile
+from magres.index import MagresIndex
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), "test_data")
+
+
+class IndexTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, "ethanol-isc.magres")
+        shutil.copy(os.path.join(DATA_DIR, "ethanol-isc.magres"), self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_records(self):
+        f = MagresFile(self.path)
+
+        with MagresIndex.load(self.path) as index:
+            self.assertEqual(index.block('atoms'), f.data_dict['atoms'])
+            self.assertEqual(index.records('isc_fc'), f.data_dict['magres']['isc_fc'])
+
+            # Records are looked up by their perturbing atom
+            for record in f.data_dict['magres']['isc']:
+                atom2 = record['atom2']
+
+                if atom2 != record['atom1']:
+                    self.assertEqual(index.records('isc', atom2['label'], atom2['index']), [])
+
+            self.assertEqual(len(index.records('isc', 'C', 2)), len(f.data_dict['magres']['isc']))
+            self.assertEqual(index.records('atom', 'H', 1, block='atoms'), [f.data_dict['atoms']['atom'][0]])
+
+    def test_sidecar(self):
+        index = MagresIndex.load(self.path)
+
+        self.assertTrue(os.path.isfile(self.path + MagresIndex.suffix))
+        self.assertTrue(MagresIndex.load(self.path).is_current())
+
+        # Changing the magres file invalidates the index
+        with open(self.path, 'a') as f:
+            f.write("\n")
+
+        self.assertFalse(index.is_current())
+        self.assertTrue(MagresIndex.load(self.path).is_current())
+
+        # A corrupt or partially written sidecar is rebuilt
+        for contents in ['{"size": 12', '{}', '[]']:
+            with open(self.path + MagresIndex.suffix, 'w') as f:
+                f.write(contents)
+
+            self.assertTrue(MagresIndex.load(self.path).is_current())
+
+        self.assertEqual(sorted(os.listdir(self.tmp_dir)), ["ethanol-isc.magres", "ethanol-isc.magres" + MagresIndex.suffix])
+
+    def test_compressed(self):
+        with open(self.path, 'rb') as f:
+            contents = f.read()
+
+        with gzip.open(self.path + ".gz", 'wb') as f:
+            f.write(contents)
+
+        with self.assertRaises(BadMagresFile):
+            MagresIndex.build(self.path + ".gz")
+
+
+if __name__ == "__main__":
+    unittest.main()
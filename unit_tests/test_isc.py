@@ -4,6 +4,7 @@ import unittest
 import os
 from magres.format import MagresFile
 from magres.atoms import MagresAtoms
+from magres.tables import IscMatrix
 
 DATA_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), "test_data")
 
@@ -31,6 +32,13 @@ class MagresIscTest(unittest.TestCase):
             self.assertTrue(abs(isc.K_evals[2] - isc.K_iso) >= abs(isc.K_evals[0] - isc.K_iso))
             self.assertTrue(abs(isc.K_evals[0] - isc.K_iso) >= abs(isc.K_evals[1] - isc.K_iso))
 
+        # J's eigenvalues are those of K, scaled
+        for isc in atoms.C2.isc:
+            self.assertTrue(numpy.allclose(sorted(isc.J_evals), numpy.linalg.eigvalsh(isc.J_sym)))
+
+            for ev, evec in zip(isc.J_evals, isc.J_evecs):
+                self.assertTrue(numpy.allclose(numpy.dot(isc.J_sym, evec), ev * evec))
+
     def test_replace_isc(self):
         atoms = MagresAtoms.load_magres(os.path.join(DATA_DIR, "ethanol-isc.magres"))
 
@@ -63,6 +71,67 @@ class MagresIscTest(unittest.TestCase):
         for atom in atoms:
             self.assertEqual(len(atom.isc), len(atoms) - 1)
 
+    def test_isc_matrix(self):
+        atoms = MagresAtoms.load_magres(os.path.join(DATA_DIR, "ethanol-isc.magres"))
+        atoms.H1.isotope = 2
+
+        for tag in ['isc', 'isc_fc', 'isc_spin', 'isc_orbital_p', 'isc_orbital_d']:
+            matrix = atoms.isc_matrix(tag)
+
+            self.assertEqual(len(matrix), len(getattr(atoms, tag)))
+
+            for isc in getattr(atoms, tag):
+                i, j = atoms.rows([isc.atom1, isc.atom2])
+                p = matrix.pair(i, j)
+
+                self.assertEqual(matrix.pairs([i], [j]).tolist(), [p])
+                self.assertTrue(numpy.allclose(matrix.K[p], isc.K))
+                self.assertAlmostEqual(matrix.K_iso[p], isc.K_iso)
+                self.assertAlmostEqual(matrix.J_iso[p], isc.J_iso)
+                self.assertTrue(numpy.allclose(matrix.J[p], isc.J))
+
+        # Only C2 perturbs, so nothing couples H1 to C1
+        H1, C1, C2 = atoms.rows([atoms.H1, atoms.C1, atoms.C2])
+
+        with self.assertRaises(KeyError):
+            matrix.pair(H1, C1)
+
+        self.assertEqual(matrix.pairs([H1, C2], [C1, H1])[0], -1)
+
+        J = matrix.dense(matrix.J_iso)
+        self.assertEqual(J.shape, (len(atoms), len(atoms)))
+        self.assertAlmostEqual(J[C2, H1], atoms.C2.isc_orbital_d.receiving(atoms.H1)[0].J_iso)
+        self.assertTrue(numpy.isnan(J[H1, C1]))
+
+        # A view only has couplings between its own atoms
+        self.assertEqual(len(atoms.species('H').isc_matrix()), 0)
+        self.assertEqual(len(atoms.species('C', 'H').isc_matrix()), 7)
+
+        # Each tag's matrix is kept until the cache is cleared
+        self.assertTrue(atoms.isc_matrix('isc_orbital_d') is matrix)
+        self.assertFalse(atoms.isc_matrix('isc_fc') is matrix)
+
+        # and is worked out again when an isotope or a tensor changes
+        atoms.H1.isotope = 1
+        self.assertNotAlmostEqual(atoms.isc_matrix('isc_orbital_d').J_iso[matrix.pair(C2, H1)], J[C2, H1])
+
+        isc = atoms.C2.isc[0]
+        p = atoms.isc_matrix('isc').pair(*atoms.rows([isc.atom1, isc.atom2]))
+        self.assertNotAlmostEqual(atoms.isc_matrix('isc').K_iso[p], 0.0)
+
+        isc.K = 0.0 * isc.K
+        self.assertEqual(atoms.isc_matrix('isc').K_iso[p], 0.0)
+
+    def test_isc_matrix_repeats(self):
+        K = numpy.arange(3 * 9, dtype=float).reshape(3, 3, 3)
+        matrix = IscMatrix(2, [0, 0, 1], [1, 1, 0], K, numpy.ones(3), numpy.ones(3))
+
+        # The first of a repeated coupling is the one found and the one kept in the dense matrix
+        self.assertEqual(matrix.pair(0, 1), 0)
+        self.assertEqual(matrix.pairs([0, 1], [1, 0]).tolist(), [0, 2])
+        self.assertEqual(matrix.dense(matrix.K_iso)[0, 1], matrix.K_iso[0])
+        self.assertEqual(matrix.dense(matrix.K_iso)[1, 0], matrix.K_iso[2])
+
 
 if __name__ == "__main__":
     unittest.main()
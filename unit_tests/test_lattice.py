@@ -0,0 +1,69 @@
+import itertools
+import unittest
+import numpy
+from magres.format import MagresFile
+from magres.atoms import MagresAtoms
+from magres.lattice import ReducedLattice, selling_reduce
+
+
+class LatticeTest(unittest.TestCase):
+    def setUp(self):
+        rand = numpy.random.RandomState(0)
+
+        # A cubic lattice sheared far beyond the reach of a +-1 image search
+        shear = numpy.array([[1, 3, 12], [0, 1, 4], [-2, 0, 1]])
+        self.lattice = numpy.dot(shear, numpy.diag([3.0, 4.0, 5.0]))
+        self.displacements = rand.uniform(-30.0, 30.0, (100, 3))
+
+    def test_reduce(self):
+        reduced, transform = selling_reduce(self.lattice)
+
+        self.assertTrue(numpy.allclose(numpy.dot(transform, self.lattice), reduced))
+        self.assertAlmostEqual(numpy.linalg.det(transform), 1.0)
+
+        # Vectors of the reduced basis are no longer than face diagonals of the cell, the sheared ones are ~60 Angstrom
+        self.assertTrue((numpy.linalg.norm(reduced, axis=1) <= numpy.sqrt(4.0 ** 2 + 5.0 ** 2) + 1e-9).all())
+        self.assertGreater(numpy.linalg.norm(self.lattice, axis=1).max(), 50.0)
+
+        superbase = numpy.vstack([-reduced.sum(axis=0), reduced])
+        dots = numpy.dot(superbase, superbase.T)
+        self.assertTrue((dots[numpy.triu_indices(4, 1)] <= 1e-9).all())
+
+    def test_minimum_image(self):
+        reduced = ReducedLattice(self.lattice)
+
+        images = reduced.minimum_image(self.displacements)
+
+        # Brute force over the images of the diagonal cubic lattice
+        steps = numpy.array(list(itertools.product(range(-12, 13), repeat=3)))
+        translations = numpy.dot(steps, numpy.diag([3.0, 4.0, 5.0]))
+        brute = numpy.sqrt(((self.displacements[:, None, :] + translations) ** 2).sum(axis=2)).min(axis=1)
+
+        self.assertTrue(numpy.allclose(numpy.linalg.norm(images, axis=1), brute))
+
+        # Every image is the displacement plus a whole lattice vector
+        shifts = reduced.shifts(self.displacements, images)
+        self.assertTrue(numpy.allclose(self.displacements + numpy.dot(shifts, self.lattice), images))
+
+        self.assertTrue(numpy.allclose(reduced.minimum_image(self.displacements[0]), images[0]))
+        self.assertTrue(numpy.allclose(numpy.dot(self.lattice, reduced.reciprocal.T), numpy.eye(3)))
+
+    def test_atoms(self):
+        magres_file = MagresFile({'atoms': {
+            'units': [['atom', 'Angstrom'], ['lattice', 'Angstrom']],
+            'lattice': [self.lattice.tolist()],
+            'atom': [{'species': 'H', 'label': 'H', 'index': 1, 'position': [0.1, 0.2, 0.3]},
+                     {'species': 'H', 'label': 'H', 'index': 2, 'position': [14.9, -15.8, 0.3]}]}})
+
+        atoms = MagresAtoms(magres_file)
+
+        # An image of the second atom is 0.2 Angstrom from the first, many cubic cells away
+        self.assertAlmostEqual(atoms.dist(atoms[0], atoms[1]), 0.2)
+        self.assertTrue(numpy.allclose(atoms.distance_matrix(), [[0.0, 0.2], [0.2, 0.0]]))
+
+        self.assertTrue(numpy.allclose(atoms.fractional_positions(),
+                                       numpy.dot(atoms.positions(), numpy.linalg.inv(self.lattice))))
+
+
+if __name__ == "__main__":
+    unittest.main()
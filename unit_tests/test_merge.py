@@ -0,0 +1,55 @@
+import os
+import glob
+import json
+import unittest
+from magres.format import MagresFile
+from magres.atoms import MagresAtoms
+from magres.merge import merge, StructureMismatch
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), "test_data")
+
+
+class MergeTest(unittest.TestCase):
+    def setUp(self):
+        self.paths = sorted(glob.glob(os.path.join(DATA_DIR, "ethanol", "ethanol-jc-*.magres")))
+
+    def test_merge(self):
+        magres_files = [MagresFile(path) for path in self.paths]
+        before = [json.dumps(f.data_dict) for f in magres_files]
+
+        merged = MagresFile.merge(magres_files)
+
+        # The inputs are left alone
+        self.assertEqual([json.dumps(f.data_dict) for f in magres_files], before)
+
+        self.assertEqual(len(merged.data_dict['magres']['isc']),
+                         sum(len(f.data_dict['magres']['isc']) for f in magres_files))
+        self.assertEqual(merged.data_dict['atoms'], magres_files[0].data_dict['atoms'])
+
+        # Units, and records of files merged more than once, are de-duplicated
+        self.assertEqual(len(merged.data_dict['magres']['units']), len(magres_files[0].data_dict['magres']['units']))
+        self.assertEqual(merge(magres_files + magres_files[:2]).data_dict, merged.data_dict)
+
+        self.assertEqual(len(MagresAtoms(magres_files).isc), len(MagresAtoms(merged).isc))
+
+        self.assertEqual(MagresFile.merge(magres_files, validation="off").validation, "off")
+
+    def test_paths(self):
+        merged = merge([MagresFile(path) for path in self.paths])
+
+        self.assertEqual(merge(self.paths).data_dict, merged.data_dict)
+        self.assertEqual(merge(self.paths, processes=2).data_dict, merged.data_dict)
+
+    def test_structure_mismatch(self):
+        # ethanol-nmr.magres has the same molecule, but translated
+        paths = self.paths + [os.path.join(DATA_DIR, "ethanol", "ethanol-nmr.magres")]
+
+        self.assertRaises(StructureMismatch, merge, paths)
+
+        merged = merge(paths, check=False)
+
+        self.assertTrue('ms' in merged.data_dict['magres'])
+
+
+if __name__ == "__main__":
+    unittest.main()
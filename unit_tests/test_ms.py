@@ -36,6 +36,58 @@ class MagresMsTest(unittest.TestCase):
 
         self.assertEqual(atoms.C1.ms.iso, orig_iso * 2.0)
 
+    def test_evals(self):
+        atoms = MagresAtoms.load_magres(os.path.join(DATA_DIR, "ethanol/ethanol-nmr.magres"))
+
+        for ms in atoms.ms:
+            for evals, evecs in [ms.evalsvecs, ms.evalsvecs_mehring]:
+                for ev, evec in zip(evals, evecs):
+                    self.assertTrue(numpy.allclose(numpy.dot(ms.sym, evec), ev * evec))
+
+            self.assertEqual(tuple(sorted(ms.evals)), ms.evals_mehring)
+
+        # Eigenvalues are found once, until sigma is set again
+        ms = atoms.C1.ms
+        self.assertTrue(ms.evalsvecs is ms.evalsvecs)
+
+        # and can't be changed in place by callers
+        with self.assertRaises(TypeError):
+            ms.evals[0] = 0.0
+
+        with self.assertRaises(ValueError):
+            ms.evecs_mehring[0][0] = 0.0
+
+        evals = ms.evals
+        ms.sigma = ms.sigma * 2.0
+
+        self.assertTrue(numpy.allclose(ms.evals, numpy.multiply(evals, 2.0)))
+
+    def test_ms_table(self):
+        atoms = MagresAtoms.load_magres(os.path.join(DATA_DIR, "ethanol/ethanol-nmr.magres"))
+        atoms.species('H').set_reference(30.0)
+
+        table = atoms.ms_table()
+
+        self.assertEqual(len(table), len(atoms))
+
+        for i, atom in enumerate(atoms):
+            ms = atom.ms
+
+            for name in ['iso', 'cs', 'aniso', 'zeta', 'eta', 'span', 'skew']:
+                self.assertAlmostEqual(getattr(table, name)[i], getattr(ms, name))
+
+            self.assertTrue(numpy.allclose(table.evals[i], ms.evals))
+            self.assertTrue(numpy.allclose(table.evals_mehring[i], ms.evals_mehring))
+            self.assertTrue(numpy.allclose(table.evecs[i], ms.evecs))
+            self.assertTrue(numpy.allclose(table.evecs_mehring[i], ms.evecs_mehring))
+
+        # Atoms without a tensor give NaN
+        del atoms.C1.ms
+        table = atoms.species('C').ms_table()
+
+        self.assertTrue(numpy.isnan(table.iso[0]) and numpy.isnan(table.evals[0]).all())
+        self.assertAlmostEqual(table.iso[1], atoms.C2.ms.iso)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,130 @@
+import os
+import itertools
+import unittest
+import numpy
+from magres.atom import MagresAtom
+from magres.atoms import MagresAtoms
+from magres.neighbours import NeighbourSearch
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), "test_data")
+
+
+def brute_force(positions, lattice, centres, r, max_shift=8):
+    """
+      Every (centre, atom, shift) within r, trying all shifts up to max_shift.
+    """
+
+    if lattice is None:
+        shifts = numpy.zeros((1, 3), dtype=int)
+    else:
+        shifts = numpy.array(list(itertools.product(range(-max_shift, max_shift + 1), repeat=3)))
+
+    found = set()
+
+    for c, centre in enumerate(centres):
+        for a, position in enumerate(positions):
+            images = position + (numpy.dot(shifts, lattice) if lattice is not None else shifts)
+
+            for shift in shifts[numpy.linalg.norm(images - centre, axis=1) <= r]:
+                found.add((c, a, tuple(shift.tolist())))
+
+    return found
+
+
+class NeighbourSearchTest(unittest.TestCase):
+    def setUp(self):
+        rand = numpy.random.RandomState(0)
+
+        # A skewed cell, where searching outwards shell by shell can stop too early
+        self.lattice = numpy.array([[4.0, 0.0, 0.0], [3.1, 3.5, 0.0], [-1.2, 0.7, 3.9]])
+        self.positions = numpy.dot(rand.uniform(-0.5, 1.5, (20, 3)), self.lattice)
+        self.centres = rand.uniform(-5.0, 10.0, (6, 3))
+
+    def check(self, lattice, r):
+        search = NeighbourSearch(self.positions, lattice)
+        centre, atom, shift, distance = search.query(self.centres, r)
+
+        found = set(zip(centre.tolist(), atom.tolist(), [tuple(s) for s in shift.tolist()]))
+
+        self.assertEqual(found, brute_force(self.positions, lattice, self.centres, r))
+        self.assertEqual(len(found), len(centre))
+
+        images = self.positions[atom] + (numpy.dot(shift, lattice) if lattice is not None else 0.0)
+        numpy.testing.assert_allclose(numpy.linalg.norm(images - self.centres[centre], axis=1), distance)
+
+        # Sorted by centre, atom then distance
+        keys = list(zip(centre.tolist(), atom.tolist(), distance.tolist()))
+        self.assertEqual(keys, sorted(keys))
+
+    def test_periodic(self):
+        for r in [0.5, 2.0, 4.5]:
+            self.check(self.lattice, r)
+
+    def test_not_periodic(self):
+        for r in [0.5, 2.0, 6.0]:
+            self.check(None, r)
+
+    def test_chunks(self):
+        search = NeighbourSearch(self.positions, self.lattice)
+        expected = search.query(self.centres, 3.0)
+
+        search.max_candidates = 7
+        for x, y in zip(expected, search.query(self.centres, 3.0)):
+            numpy.testing.assert_array_equal(x, y)
+
+    def test_atoms(self):
+        atoms = MagresAtoms.load_magres(os.path.join(DATA_DIR, "ethanol-all.magres"))
+
+        for atom in atoms:
+            near = atoms.within(atom, 3.0)
+
+            for other in atoms:
+                for image in atoms._all_images_within(other.position, atom.position, 3.0):
+                    self.assertTrue(any(x.atom is other and (x.position == image[1]).all() for x in near))
+
+            self.assertTrue(all(x.dist(atom) <= 3.0 for x in near))
+
+        atoms.calculate_bonds()
+
+        C1 = atoms.get('C', 1)
+        self.assertEqual(sorted((a.species, a.index) for a in C1.bonded), [('C', 2), ('H', 1), ('H', 2), ('H', 3)])
+
+    def test_bonds(self):
+        atoms = MagresAtoms.load_magres(os.path.join(DATA_DIR, "ethanol-all.magres"))
+
+        # Nothing is found until it's asked for
+        self.assertTrue(atoms._bonds is None)
+
+        bonded = dict((str(atom), sorted(str(x) for x in atom.bonded)) for atom in atoms)
+
+        self.assertEqual(bonded['13C2'], ['13C1', '17O1', '1H4', '1H5'])
+        self.assertEqual(bonded['1H6'], ['17O1'])
+        self.assertEqual(atoms.bonds.degrees().tolist(), [1, 1, 1, 1, 1, 1, 4, 4, 2])
+
+        # Bonds are symmetric
+        pairs = set((i, j) for i in range(len(atoms)) for j in atoms.bonds[i][0].tolist())
+        self.assertEqual(pairs, set((j, i) for i, j in pairs))
+
+        # A collection of some of the atoms leaves their bonds to the collection they came from
+        MagresAtoms(atoms.species('H').atoms)
+        self.assertEqual(sorted(str(x) for x in atoms.get('H', 1).bonded), bonded['1H1'])
+
+        # Bonds that have been set take precedence
+        atoms.calculate_bonds(2.0)
+        self.assertEqual(len(atoms.get('C', 2).bonded), 5)
+
+    def test_bonds_periodic(self):
+        # A chain of carbon atoms bonded across the cell boundary
+        lattice = numpy.array([[3.0, 0.0, 0.0], [0.0, 10.0, 0.0], [0.0, 0.0, 10.0]])
+        magres_atoms = [{'species': 'C', 'label': 'C', 'index': i + 1, 'position': [1.5 * i + 0.2, 5.0, 5.0]}
+                        for i in range(2)]
+
+        atoms = MagresAtoms([MagresAtom(a) for a in magres_atoms], lattice)
+
+        for atom in atoms:
+            self.assertEqual(len(atom.bonded), 2)
+            self.assertTrue(all(abs(x.dist(atom) - 1.5) < 1e-9 for x in atom.bonded))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+import os
+import unittest
+import numpy
+from magres.format import MagresFile
+from magres.atom import MagresAtom
+from magres.atoms import MagresAtoms
+from magres.store import AtomStore
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), "test_data")
+
+
+class AtomStoreTest(unittest.TestCase):
+    def test_rows(self):
+        magres_file = MagresFile(os.path.join(DATA_DIR, "ethanol-all.magres"))
+        atoms = MagresAtoms.load_magres(magres_file)
+        records = magres_file.data_dict['atoms']['atom']
+
+        self.assertEqual(len(atoms.store), len(atoms))
+
+        for i, atom in enumerate(atoms):
+            self.assertTrue(atom.store is atoms.store)
+            self.assertEqual(atom.row, i)
+            self.assertTrue(atom.magres_atom is records[i])
+            self.assertEqual((atom.species, atom.label, atom.index), (records[i]['species'], records[i]['label'],
+                                                                      records[i]['index']))
+            self.assertEqual(atom.position.tolist(), records[i]['position'])
+
+        # Positions are read from the store rather than copied
+        self.assertTrue(atoms.positions() is atoms.store.positions)
+        self.assertFalse(atoms[0].position.flags.writeable)
+
+        self.assertEqual(atoms.store.species_of(), [atom.species for atom in atoms])
+
+        atoms.species('H').set_reference(30.0)
+        self.assertEqual(atoms.store.references.tolist(), [30.0] * 6 + [0.0] * 3)
+
+    def test_write(self):
+        magres_file = MagresFile(os.path.join(DATA_DIR, "ethanol-all.magres"))
+        atoms = MagresAtoms.load_magres(magres_file)
+
+        H1 = atoms.get('H', 1)
+        self.assertEqual(len(H1.bonded), 1)
+
+        generation = atoms.store.generation
+        H1.position = [100.0, 100.0, 100.0]
+
+        self.assertEqual(atoms.store.generation, generation + 1)
+        self.assertEqual(magres_file.data_dict['atoms']['atom'][H1.row]['position'], [100.0, 100.0, 100.0])
+
+        # Bonds and distances are found again from the new position
+        self.assertEqual(len(H1.bonded), 0)
+        self.assertTrue(numpy.allclose(atoms.positions()[H1.row], 100.0))
+
+        H1.label = 'H1'
+        self.assertEqual(H1.label, 'H1')
+        self.assertEqual(magres_file.data_dict['atoms']['atom'][H1.row]['label'], 'H1')
+
+    def test_bind(self):
+        records = [{'species': 'H', 'label': 'H', 'index': i + 1, 'position': [float(i), 0.0, 0.0]} for i in range(3)]
+        loose = [MagresAtom(record) for record in records]
+
+        # Each atom has a store of its own until it joins a collection
+        self.assertEqual([len(atom.store) for atom in loose], [1, 1, 1])
+
+        loose[2].reference = 5.0
+        atoms = MagresAtoms(loose)
+
+        self.assertTrue(all(atom.store is atoms.store for atom in loose))
+        self.assertEqual([atom.row for atom in loose], [0, 1, 2])
+        self.assertEqual(loose[2].reference, 5.0)
+        self.assertEqual(atoms.positions()[:, 0].tolist(), [0.0, 1.0, 2.0])
+
+        # A collection of the same atoms keeps their store
+        self.assertTrue(MagresAtoms(list(loose)).store is atoms.store)
+
+        self.assertEqual(len(AtomStore()), 0)
+
+    def test_subset(self):
+        atoms = MagresAtoms.load_magres(os.path.join(DATA_DIR, "ethanol-all.magres"))
+        H1, C1 = atoms.get('H', 1), atoms.get('C', 1)
+
+        D = atoms.distances([[H1.row, C1.row]])[0]
+        atoms.positions()
+
+        # A collection of some of the atoms shares their rows rather than taking them away
+        sub = MagresAtoms(atoms.species('H').atoms)
+
+        self.assertTrue(sub.store is atoms.store)
+        self.assertTrue(H1.store is atoms.store)
+        self.assertEqual(H1.row, 0)
+
+        sub.get('H', 1).position = H1.position + [2.0, 0.0, 0.0]
+
+        self.assertAlmostEqual(atoms.distances([[H1.row, C1.row]])[0], atoms.dist(H1, C1))
+        self.assertNotAlmostEqual(atoms.distances([[H1.row, C1.row]])[0], D)
+        self.assertEqual(atoms.positions()[H1.row].tolist(), H1.position.tolist())
+        self.assertEqual(sub.positions()[0].tolist(), H1.position.tolist())
+
+
+if __name__ == "__main__":
+    unittest.main()